@@ -1,12 +1,117 @@
+import contextvars
+import hashlib
+import os
+import threading
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from django.conf import settings
-from typing import Optional, Dict, Any
+from api import live, metrics, replica, shared_snapshot
+from api.cache import CacheEntry, CacheKey, make_key, response_cache
+from api.pagination import clear_cached_counts
+from api.records import Customer, Rental, load
+from api.resilience import APIUnavailable, backoff, breaker
+from api.singleflight import inflight
+from api.streaming import iter_json_array
+from itertools import islice
+from typing import Optional, Dict, Any, Callable, Iterator, List, Tuple
 
 
-class APIClient:
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+_executors: Dict[str, Tuple[int, ThreadPoolExecutor]] = {}
+# Set while a call runs on the fan-out pool.
+_pooled: contextvars.ContextVar = contextvars.ContextVar(
+    "apiclient_pooled", default=False
+)
+
+RETRY_STATUSES = (502, 503, 504)
+
+
+def get_session() -> requests.Session:
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _session_lock:
+            if _session is None or _session_pid != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.API_POOL_CONNECTIONS,
+                    pool_maxsize=settings.API_POOL_MAXSIZE,
+                    pool_block=settings.API_POOL_BLOCK,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["Connection"] = "keep-alive"
+                _session = session
+                _session_pid = pid
+    return _session
+
+
+def _pool(name: str, workers: int) -> ThreadPoolExecutor:
+    pid = os.getpid()
+    entry = _executors.get(name)
+    if entry is None or entry[0] != pid:
+        with _session_lock:
+            entry = _executors.get(name)
+            if entry is None or entry[0] != pid:
+                entry = _executors[name] = (
+                    pid,
+                    ThreadPoolExecutor(
+                        max_workers=workers, thread_name_prefix=name
+                    ),
+                )
+    return entry[1]
+
+
+def get_executor() -> ThreadPoolExecutor:
+    # Calls a request is waiting for (gather()).
+    return _pool("apiclient", settings.API_FANOUT_WORKERS)
+
+
+def get_background_executor() -> ThreadPoolExecutor:
+    # Refreshes and rebuilds nobody waits for, kept off the fan-out pool so
+    # a long collection download can't delay the calls serving a page.
+    return _pool("apiclient-background", settings.API_BACKGROUND_WORKERS)
+
+
+def _run_pooled(call: Callable[[], Any]) -> Any:
+    _pooled.set(True)
+    return call()
+
+
+def token_scope(token: Optional[str]) -> str:
+    # Cache entries are partitioned by user without keeping the token.
+    if not token:
+        return "anonymous"
+    return hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def page_total(
+    headers: Any, offset: int, limit: int, count: int
+) -> Optional[int]:
+    total = headers.get(settings.API_TOTAL_COUNT_HEADER)
+    if total is not None:
+        return int(total)
+    if count < limit and (count or offset == 0):
+        return offset + count
+    return None
+
+
+class BaseAPIClient:
+    # Everything APIClient and AsyncAPIClient have in common: headers, the
+    # retry and breaker bookkeeping, the response cache, page decoding and
+    # the write-through to the cache, the replica and api.live. Subclasses
+    # only do the I/O (_send, _get, _fetch, _iter...). Methods that just
+    # forward to one of those return what it returns: the result for
+    # APIClient, an awaitable for AsyncAPIClient.
+
     def __init__(self, token: Optional[str] = None):
         self.base_url = settings.API_BASE_URL
         self.token = token
+        self.scope = token_scope(token)
         self.headers = self._get_headers()
 
     def _get_headers(self) -> Dict[str, str]:
@@ -15,48 +120,522 @@ class APIClient:
             headers["Authorization"] = f"Bearer {self.token}"
         return headers
 
-    def _request(
+    def _request_headers(
+        self, headers: Optional[Dict[str, str]], form: Optional[Dict]
+    ) -> Optional[Dict[str, str]]:
+        # Form posts (login) go without the JSON content type.
+        if form is not None:
+            return headers
+        return {**self.headers, **(headers or {})}
+
+    @staticmethod
+    def _attempts(method: str) -> int:
+        # Only GETs are retried: a POST or PUT that timed out may already
+        # have been applied by sakilaAPI.
+        return 1 + (settings.API_RETRIES if method == "GET" else 0)
+
+    @staticmethod
+    def _retrying(method: str, endpoint: str, attempt: int) -> float:
+        metrics.inc(
+            "sakila_upstream_retries_total",
+            endpoint=metrics.endpoint_label(endpoint),
+            method=method,
+        )
+        return backoff(attempt)
+
+    @staticmethod
+    def _record_status(status: int) -> None:
+        if status >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    @staticmethod
+    def _unavailable(error: Any) -> APIUnavailable:
+        breaker.record_failure()
+        return APIUnavailable(f"sakilaAPI no responde: {error}")
+
+    def _lookup(
+        self, endpoint: str, params: Optional[Dict] = None
+    ) -> Tuple[CacheKey, Optional[CacheEntry]]:
+        key = make_key(self.scope, endpoint, params)
+        entry = response_cache.get(key)
+        if entry is not None and entry.fresh:
+            metrics.record_cache("hit")
+        return key, entry
+
+    @staticmethod
+    def _serve_stale(entry: Optional[CacheEntry], stale_ok: bool) -> bool:
+        if stale_ok and entry is not None and response_cache.serve_stale(
+            entry
+        ):
+            metrics.record_cache("stale")
+            return True
+        return False
+
+    @staticmethod
+    def _validators(entry: Optional[CacheEntry]) -> Optional[Dict[str, str]]:
+        metrics.record_cache("miss" if entry is None else "revalidate")
+        return entry.validators if entry is not None else None
+
+    @staticmethod
+    def _not_modified(key: CacheKey, entry: CacheEntry) -> Any:
+        if not response_cache.revalidated(key):
+            response_cache.set(
+                key,
+                entry.payload,
+                entry.size,
+                etag=entry.etag,
+                last_modified=entry.last_modified,
+            )
+        return entry.payload
+
+    @staticmethod
+    def _store(
+        key: CacheKey,
+        endpoint: str,
+        payload: Any,
+        size: int,
+        headers: Any,
+        started: float,
+    ) -> Any:
+        metrics.record_decode(endpoint, size, time.perf_counter() - started)
+        response_cache.set(
+            key,
+            payload,
+            size,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+        )
+        return payload
+
+    @staticmethod
+    def _finish_refresh(key: CacheKey, result: str) -> None:
+        metrics.inc("sakila_background_refresh_total", result=result)
+        response_cache.end_refresh(key)
+
+    def _fresh(self, endpoint: str) -> Optional[List[Any]]:
+        # The cached collection for _iter(), if it can be used as is.
+        entry = response_cache.get(make_key(self.scope, endpoint))
+        if entry is not None and entry.fresh:
+            metrics.record_cache("hit")
+            return entry.payload
+        metrics.record_cache("stream")
+        return None
+
+    @staticmethod
+    def _page_params(offset: int, limit: int) -> Dict[str, int]:
+        return {
+            settings.API_PAGE_OFFSET_PARAM: offset,
+            settings.API_PAGE_LIMIT_PARAM: limit,
+        }
+
+    @staticmethod
+    def _page(
+        record: type, items: list, headers: Any, offset: int, limit: int
+    ) -> Tuple[list, Optional[int]]:
+        items = load(record, items)
+        return items, page_total(headers, offset, limit, len(items))
+
+    def _invalidate(self, *endpoints: str, prefixes: Tuple = ()) -> None:
+        response_cache.invalidate(endpoints, prefixes)
+        for endpoint in endpoints:
+            clear_cached_counts(endpoint)
+        shared_snapshot.invalidate(endpoints)
+
+    # Bookkeeping after each write. They return the replica write for the
+    # subclass to run, since the async client runs it in a thread.
+
+    def _customer_created(
+        self, customer: Dict[str, Any]
+    ) -> Tuple[Callable, tuple]:
+        self._invalidate("/api/v1/customers")
+        return replica.write_customer, (customer,)
+
+    def _customer_updated(
+        self, customer_id: int, data: Dict[str, Any], customer: Dict[str, Any]
+    ) -> Tuple[Callable, tuple]:
+        self._invalidate(
+            "/api/v1/customers",
+            f"/api/v1/customers/{customer_id}",
+        )
+        return replica.write_customer, (
+            {**data, **customer, "customer_id": customer_id},
+        )
+
+    def _customer_deleted(self, customer_id: int) -> Tuple[Callable, tuple]:
+        self._invalidate(
+            "/api/v1/customers",
+            f"/api/v1/customers/{customer_id}",
+            f"/api/v1/rentals/customer/{customer_id}",
+        )
+        return replica.delete_customer, (customer_id,)
+
+    def _rental_created(
+        self, data: Dict[str, Any], rental: Dict[str, Any]
+    ) -> Tuple[Callable, tuple]:
+        self._invalidate(
+            "/api/v1/rentals",
+            f"/api/v1/rentals/customer/{data.get('customer_id')}",
+        )
+        live.rental_created({**data, **rental})
+        return replica.write_rental, (rental,)
+
+    def _rental_returned(
+        self, rental_id: int, rental: Dict[str, Any]
+    ) -> Tuple[Callable, tuple]:
+        if rental.get("customer_id"):
+            self._invalidate(
+                "/api/v1/rentals",
+                f"/api/v1/rentals/{rental_id}",
+                f"/api/v1/rentals/customer/{rental['customer_id']}",
+            )
+        else:
+            self._invalidate(
+                "/api/v1/rentals",
+                f"/api/v1/rentals/{rental_id}",
+                prefixes=("/api/v1/rentals/customer/",),
+            )
+        live.rental_returned(rental_id, rental)
+        return replica.write_rental, ({**rental, "rental_id": rental_id},)
+
+    def register(self, username: str, email: str, password: str) -> Any:
+        return self._request(
+            "POST",
+            "/api/v1/auth/register",
+            data={
+                "username": username,
+                "email": email,
+                "password": password
+            }
+        )
+
+    def get_customers_page(self, offset: int, limit: int) -> Any:
+        return self._request_page(
+            "/api/v1/customers", offset, limit, Customer
+        )
+
+    def cached_customers(self) -> Optional[List[Customer]]:
+        key = make_key(self.scope, "/api/v1/customers")
+        entry = response_cache.peek(key)
+        return entry.payload if entry is not None else None
+
+    def iter_customers(self) -> Any:
+        return self._iter("/api/v1/customers", Customer)
+
+    def get_customer(self, customer_id: int) -> Any:
+        return self._get_one(
+            f"/api/v1/customers/{customer_id}", Customer
+        )
+
+    def get_rentals_page(self, offset: int, limit: int) -> Any:
+        return self._request_page("/api/v1/rentals", offset, limit, Rental)
+
+    def iter_rentals(self) -> Any:
+        return self._iter("/api/v1/rentals", Rental)
+
+    def get_rental(self, rental_id: int) -> Any:
+        return self._get_one(f"/api/v1/rentals/{rental_id}", Rental)
+
+    def get_customer_rentals(self, customer_id: int) -> Any:
+        return self._get_list(
+            f"/api/v1/rentals/customer/{customer_id}", Rental
+        )
+
+    def iter_customer_rentals(self, customer_id: int) -> Any:
+        return self._iter(
+            f"/api/v1/rentals/customer/{customer_id}", Rental
+        )
+
+
+class APIClient(BaseAPIClient):
+    def __init__(self, token: Optional[str] = None):
+        super().__init__(token)
+        self.session = get_session()
+
+    def _send(
         self,
         method: str,
         endpoint: str,
         data: Optional[Dict] = None,
         params: Optional[Dict] = None,
-    ) -> Dict[str, Any]:
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+        form: Optional[Dict] = None,
+    ) -> requests.Response:
         url = f"{self.base_url}{endpoint}"
-        try:
-            if method == "GET":
-                response = requests.get(
-                    url, headers=self.headers, params=params
+        breaker.check()
+        error = None
+        for attempt in range(self._attempts(method)):
+            if attempt:
+                time.sleep(self._retrying(method, endpoint, attempt))
+            started = time.perf_counter()
+            status = "error"
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    headers=self._request_headers(headers, form),
+                    params=params,
+                    json=data,
+                    data=form,
+                    stream=stream,
+                    timeout=(
+                        settings.API_CONNECT_TIMEOUT,
+                        settings.API_READ_TIMEOUT,
+                    ),
                 )
-            elif method == "POST":
-                response = requests.post(
-                    url, headers=self.headers, json=data
+                status = response.status_code
+            except (
+                requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout,
+            ) as e:
+                error = e
+                continue
+            except requests.exceptions.RequestException as e:
+                raise Exception(f"API Error: {str(e)}")
+            finally:
+                metrics.record_upstream(
+                    method, endpoint, status, time.perf_counter() - started
                 )
-            elif method == "PUT":
-                response = requests.put(
-                    url, headers=self.headers, json=data
-                )
-            elif method == "DELETE":
-                response = requests.delete(
-                    url, headers=self.headers
+            if status in RETRY_STATUSES:
+                error = f"{status} {response.reason}"
+                response.close()
+                continue
+            self._record_status(status)
+            try:
+                response.raise_for_status()
+            except requests.exceptions.HTTPError as e:
+                raise Exception(f"API Error: {str(e)}")
+            return response
+        raise self._unavailable(error)
+
+    def _request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> Dict[str, Any]:
+        if method == "GET":
+            return self._get(endpoint, params=params)
+        response = self._send(method, endpoint, data=data, params=params)
+        return response.json() if response.text else {}
+
+    def _get(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        decode: Optional[Callable[[requests.Response], Any]] = None,
+        stream: bool = False,
+        stale_ok: bool = False,
+    ) -> Any:
+        key, entry = self._lookup(endpoint, params)
+        if entry is not None and entry.fresh:
+            return entry.payload
+
+        def fetch():
+            return self._fetch(
+                key,
+                entry or response_cache.seed(key),
+                endpoint,
+                params,
+                decode,
+                stream,
+            )
+
+        if self._serve_stale(entry, stale_ok):
+            self._refresh(key, fetch)
+            return entry.payload
+        return self._coalesce(key, fetch)
+
+    def _coalesce(self, key: CacheKey, fetch: Callable[[], Any]) -> Any:
+        if not settings.API_COALESCE:
+            return fetch()
+        return inflight.do(key, fetch, settings.API_COALESCE_TIMEOUT)
+
+    def _refresh(self, key: CacheKey, fetch: Callable[[], Any]) -> None:
+        if not response_cache.begin_refresh(key):
+            return
+
+        def run():
+            try:
+                self._coalesce(key, fetch)
+            except Exception:
+                self._finish_refresh(key, "error")
+            else:
+                self._finish_refresh(key, "ok")
+
+        get_background_executor().submit(run)
+
+    def _fetch(
+        self,
+        key: CacheKey,
+        entry: Optional[CacheEntry],
+        endpoint: str,
+        params: Optional[Dict],
+        decode: Optional[Callable[[requests.Response], Any]],
+        stream: bool,
+    ) -> Any:
+        response = self._send(
+            "GET",
+            endpoint,
+            params=params,
+            headers=self._validators(entry),
+            stream=stream,
+        )
+        with response:
+            if response.status_code == 304 and entry is not None:
+                return self._not_modified(key, entry)
+            started = time.perf_counter()
+            if decode is not None:
+                payload = decode(response)
+            else:
+                payload = response.json() if response.text else {}
+            size = response.raw.tell() if stream else len(response.content)
+        return self._store(
+            key, endpoint, payload, size, response.headers, started
+        )
+
+    def _replicate(self, write: Callable, args: tuple) -> None:
+        write(*args)
+
+    def _get_one(self, endpoint: str, record: type) -> Any:
+        return self._get(
+            endpoint,
+            decode=lambda response: record.from_dict(response.json()),
+        )
+
+    def _get_list(self, endpoint: str, record: type) -> List[Any]:
+        return self._get(
+            endpoint,
+            decode=lambda response: load(
+                record, self._iter_rows(response)
+            ),
+            stream=True,
+            stale_ok=True,
+        )
+
+    def _request_page(
+        self, endpoint: str, offset: int, limit: int, record: type
+    ) -> Tuple[list, Optional[int]]:
+        return self._get(
+            endpoint,
+            params=self._page_params(offset, limit),
+            decode=lambda response: self._decode_page(
+                response, offset, limit, record
+            ),
+            stream=True,
+            stale_ok=True,
+        )
+
+    def _decode_page(
+        self,
+        response: requests.Response,
+        offset: int,
+        limit: int,
+        record: type,
+    ) -> Tuple[list, Optional[int]]:
+        rows = self._iter_rows(response)
+        items = list(islice(rows, limit + 1))
+        if len(items) > limit:
+            # sakilaAPI ignored the paging params and is sending the whole
+            # collection: keep the requested window and only count the rest.
+            page = load(record, items[offset:offset + limit])
+            seen = len(items)
+            for item in rows:
+                if offset <= seen < offset + limit:
+                    page.append(record.from_dict(item))
+                seen += 1
+            return page, seen
+        return self._page(record, items, response.headers, offset, limit)
+
+    def _iter_rows(self, response: requests.Response) -> Iterator[Any]:
+        try:
+            yield from iter_json_array(
+                response.iter_content(
+                    chunk_size=settings.API_STREAM_CHUNK_SIZE
                 )
-            response.raise_for_status()
-            return response.json() if response.text else {}
+            )
         except requests.exceptions.RequestException as e:
             raise Exception(f"API Error: {str(e)}")
 
-    def register(
-        self, username: str, email: str, password: str
-    ) -> Dict[str, Any]:
-        return self._request(
-            "POST",
-            "/api/v1/auth/register",
-            data={
-                "username": username,
-                "email": email,
-                "password": password
-            }
+    def _iter(self, endpoint: str, record: type) -> Iterator[Any]:
+        cached = self._fresh(endpoint)
+        if cached is not None:
+            yield from cached
+            return
+        with self._send("GET", endpoint, stream=True) as response:
+            yield from map(record.from_dict, self._iter_rows(response))
+
+    def stream_changes(
+        self,
+        endpoint: str,
+        record: type,
+        etag: Optional[str] = None,
+        params: Optional[Dict] = None,
+    ) -> Tuple[Optional[Iterator[Any]], Optional[str]]:
+        # Streams a collection past the response cache, for syncing the
+        # local replica. Returns (None, etag) if it hasn't changed since
+        # `etag`, otherwise the rows and the new ETag.
+        response = self._send(
+            "GET",
+            endpoint,
+            params=params,
+            headers={"If-None-Match": etag} if etag else None,
+            stream=True,
         )
+        if response.status_code == 304:
+            response.close()
+            return None, etag
+        return (
+            self._stream_rows(response, record),
+            response.headers.get("ETag"),
+        )
+
+    def _stream_rows(
+        self, response: requests.Response, record: type
+    ) -> Iterator[Any]:
+        with response:
+            yield from map(record.from_dict, self._iter_rows(response))
+
+    def gather(
+        self,
+        *calls: Callable[[], Any],
+        return_exceptions: bool = False,
+    ) -> List[Any]:
+        # Each call runs in a copy of the request context so its upstream
+        # timings still end up in the request's Server-Timing header.
+        if not calls:
+            return []
+        if _pooled.get():
+            # Already on a pool thread: waiting for the pool from here
+            # could deadlock it, so the calls run one after another.
+            inline, futures = calls, []
+        else:
+            inline = calls[:1]
+            futures = [
+                get_executor().submit(
+                    contextvars.copy_context().run, _run_pooled, call
+                )
+                for call in calls[1:]
+            ]
+        results = []
+        for call in inline:
+            try:
+                results.append(call())
+            except Exception as e:
+                results.append(e)
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        if not return_exceptions:
+            for result in results:
+                if isinstance(result, Exception):
+                    raise result
+        return results
 
     def login(
         self, username: str, password: str
@@ -65,78 +644,67 @@ class APIClient:
             "username": username,
             "password": password
         }
-        url = f"{self.base_url}/api/v1/auth/token"
-        response = requests.post(url, data=data)
-        response.raise_for_status()
+        response = self._send("POST", "/api/v1/auth/token", form=data)
         return response.json()
 
-    def get_customers(self) -> list:
-        return self._request(
-            "GET",
-            "/api/v1/customers"
-        )
-
-    def get_customer(self, customer_id: int) -> Dict[str, Any]:
-        return self._request(
-            "GET",
-            f"/api/v1/customers/{customer_id}"
-        )
+    def get_customers(
+        self, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[Customer]:
+        if limit is not None:
+            return self.get_customers_page(offset or 0, limit)[0]
+        return self._get_list("/api/v1/customers", Customer)
 
     def create_customer(
         self, data: Dict[str, Any]
     ) -> Dict[str, Any]:
-        return self._request(
+        customer = self._request(
             "POST",
             "/api/v1/customers",
             data=data
         )
+        self._replicate(*self._customer_created(customer))
+        return customer
 
     def update_customer(
         self, customer_id: int, data: Dict[str, Any]
     ) -> Dict[str, Any]:
-        return self._request(
+        customer = self._request(
             "PUT",
             f"/api/v1/customers/{customer_id}",
             data=data
         )
+        self._replicate(*self._customer_updated(customer_id, data, customer))
+        return customer
 
     def delete_customer(self, customer_id: int) -> None:
         self._request(
             "DELETE",
             f"/api/v1/customers/{customer_id}"
         )
+        self._replicate(*self._customer_deleted(customer_id))
 
-    def get_rentals(self) -> list:
-        return self._request(
-            "GET",
-            "/api/v1/rentals"
-        )
-
-    def get_rental(self, rental_id: int) -> Dict[str, Any]:
-        return self._request(
-            "GET",
-            f"/api/v1/rentals/{rental_id}"
-        )
+    def get_rentals(
+        self, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[Rental]:
+        if limit is not None:
+            return self.get_rentals_page(offset or 0, limit)[0]
+        return self._get_list("/api/v1/rentals", Rental)
 
     def create_rental(
         self, data: Dict[str, Any]
     ) -> Dict[str, Any]:
-        return self._request(
+        rental = self._request(
             "POST",
             "/api/v1/rentals",
             data=data
         )
+        self._replicate(*self._rental_created(data, rental))
+        return rental
 
     def return_rental(self, rental_id: int) -> Dict[str, Any]:
-        return self._request(
+        rental = self._request(
             "PUT",
             f"/api/v1/rentals/{rental_id}/return"
         )
-
-    def get_customer_rentals(
-        self, customer_id: int
-    ) -> list:
-        return self._request(
-            "GET",
-            f"/api/v1/rentals/customer/{customer_id}"
-        )
\ No newline at end of file
+        self._replicate(*self._rental_returned(rental_id, rental))
+        return rental
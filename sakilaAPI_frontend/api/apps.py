@@ -1,4 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        if settings.API_CACHE_WARM_FILE:
+            from api.cache import response_cache
+
+            response_cache.load_seeds(settings.API_CACHE_WARM_FILE)
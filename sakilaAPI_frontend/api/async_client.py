@@ -0,0 +1,370 @@
+import asyncio
+import time
+import weakref
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from api import metrics, replica
+from api.api_client import RETRY_STATUSES, BaseAPIClient
+from api.cache import CacheEntry, CacheKey, response_cache
+from api.records import Customer, RecordList, Rental, load
+from api.resilience import breaker
+from api.singleflight import ainflight
+from api.streaming import aiter_json_array
+from typing import (
+    Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+)
+
+
+# Async counterpart of APIClient for the async views. Everything but the
+# transport comes from BaseAPIClient. httpx connections belong to the event
+# loop that opened them, so each loop gets its own pool: under an ASGI
+# server that is one per process, and the pool is closed when the loop
+# shuts down (asyncio.run() and async_to_sync() both do that), so loops
+# created per request don't leave connections behind.
+
+_clients: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_background: Set[asyncio.Task] = set()
+
+
+async def _close_on_shutdown(client: httpx.AsyncClient) -> AsyncIterator[None]:
+    # Kept suspended at the yield; the loop's shutdown_asyncgens() closes
+    # it, which runs the finally clause.
+    try:
+        yield
+    finally:
+        await client.aclose()
+
+
+async def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    pool = _clients.get(loop)
+    if pool is None:
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.API_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.API_POOL_MAXSIZE,
+            ),
+            timeout=httpx.Timeout(
+                settings.API_READ_TIMEOUT,
+                connect=settings.API_CONNECT_TIMEOUT,
+            ),
+        )
+        closer = _close_on_shutdown(client)
+        await closer.__anext__()
+        # The loop only holds its async generators weakly.
+        pool = _clients[loop] = (client, closer)
+    return pool[0]
+
+
+class AsyncAPIClient(BaseAPIClient):
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+        stream: bool = False,
+        form: Optional[Dict] = None,
+    ) -> httpx.Response:
+        url = f"{self.base_url}{endpoint}"
+        breaker.check()
+        client = await get_async_client()
+        error = None
+        for attempt in range(self._attempts(method)):
+            if attempt:
+                await asyncio.sleep(self._retrying(method, endpoint, attempt))
+            started = time.perf_counter()
+            status = "error"
+            try:
+                request = client.build_request(
+                    method,
+                    url,
+                    headers=self._request_headers(headers, form),
+                    params=params,
+                    json=data,
+                    data=form,
+                )
+                response = await client.send(request, stream=stream)
+                status = response.status_code
+            except httpx.TransportError as e:
+                error = e
+                continue
+            except httpx.HTTPError as e:
+                raise Exception(f"API Error: {str(e)}")
+            finally:
+                metrics.record_upstream(
+                    method, endpoint, status, time.perf_counter() - started
+                )
+            if status in RETRY_STATUSES:
+                error = f"{status} {response.reason_phrase}"
+                await response.aclose()
+                continue
+            self._record_status(status)
+            if response.is_error:
+                await response.aclose()
+                try:
+                    response.raise_for_status()
+                except httpx.HTTPStatusError as e:
+                    raise Exception(f"API Error: {str(e)}")
+            return response
+        raise self._unavailable(error)
+
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        params: Optional[Dict] = None,
+    ) -> Dict[str, Any]:
+        if method == "GET":
+            return await self._get(endpoint, params=params)
+        response = await self._send(method, endpoint, data=data, params=params)
+        return response.json() if response.content else {}
+
+    async def _get(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        decode: Optional[Callable[[httpx.Response], Awaitable[Any]]] = None,
+        stream: bool = False,
+        stale_ok: bool = False,
+    ) -> Any:
+        key, entry = self._lookup(endpoint, params)
+        if entry is not None and entry.fresh:
+            return entry.payload
+
+        def fetch():
+            return self._fetch(
+                key,
+                entry or response_cache.seed(key),
+                endpoint,
+                params,
+                decode,
+                stream,
+            )
+
+        if self._serve_stale(entry, stale_ok):
+            self._refresh(key, fetch)
+            return entry.payload
+        return await self._coalesce(key, fetch)
+
+    async def _coalesce(
+        self, key: CacheKey, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        if not settings.API_COALESCE:
+            return await fetch()
+        return await ainflight.do(key, fetch, settings.API_COALESCE_TIMEOUT)
+
+    def _refresh(
+        self, key: CacheKey, fetch: Callable[[], Awaitable[Any]]
+    ) -> None:
+        if not response_cache.begin_refresh(key):
+            return
+
+        async def run():
+            try:
+                await self._coalesce(key, fetch)
+            except Exception:
+                self._finish_refresh(key, "error")
+            else:
+                self._finish_refresh(key, "ok")
+
+        # The event loop only keeps weak references to its tasks.
+        task = asyncio.get_running_loop().create_task(run())
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+    async def _fetch(
+        self,
+        key: CacheKey,
+        entry: Optional[CacheEntry],
+        endpoint: str,
+        params: Optional[Dict],
+        decode: Optional[Callable[[httpx.Response], Awaitable[Any]]],
+        stream: bool,
+    ) -> Any:
+        response = await self._send(
+            "GET",
+            endpoint,
+            params=params,
+            headers=self._validators(entry),
+            stream=stream,
+        )
+        try:
+            if response.status_code == 304 and entry is not None:
+                return self._not_modified(key, entry)
+            started = time.perf_counter()
+            if decode is not None:
+                payload = await decode(response)
+            else:
+                payload = response.json() if response.content else {}
+            size = response.num_bytes_downloaded
+        finally:
+            await response.aclose()
+        return self._store(
+            key, endpoint, payload, size, response.headers, started
+        )
+
+    async def _replicate(self, write: Callable, args: tuple) -> None:
+        # The ORM call runs in a thread.
+        if replica.enabled():
+            await sync_to_async(write)(*args)
+
+    async def _get_one(self, endpoint: str, record: type) -> Any:
+        async def decode(response):
+            return record.from_dict(response.json())
+
+        return await self._get(endpoint, decode=decode)
+
+    async def _get_list(self, endpoint: str, record: type) -> List[Any]:
+        async def decode(response):
+            records = RecordList()
+            async for row in self._iter_rows(response):
+                records.append(record.from_dict(row))
+            return records
+
+        return await self._get(
+            endpoint, decode=decode, stream=True, stale_ok=True
+        )
+
+    async def _request_page(
+        self, endpoint: str, offset: int, limit: int, record: type
+    ) -> Tuple[list, Optional[int]]:
+        async def decode(response):
+            return await self._decode_page(response, offset, limit, record)
+
+        return await self._get(
+            endpoint,
+            params=self._page_params(offset, limit),
+            decode=decode,
+            stream=True,
+            stale_ok=True,
+        )
+
+    async def _decode_page(
+        self,
+        response: httpx.Response,
+        offset: int,
+        limit: int,
+        record: type,
+    ) -> Tuple[list, Optional[int]]:
+        rows = self._iter_rows(response)
+        items = []
+        async for item in rows:
+            items.append(item)
+            if len(items) > limit:
+                break
+        if len(items) > limit:
+            # sakilaAPI ignored the paging params and is sending the whole
+            # collection: keep the requested window and only count the rest.
+            page = load(record, items[offset:offset + limit])
+            seen = len(items)
+            async for item in rows:
+                if offset <= seen < offset + limit:
+                    page.append(record.from_dict(item))
+                seen += 1
+            return page, seen
+        return self._page(record, items, response.headers, offset, limit)
+
+    async def _iter_rows(self, response: httpx.Response) -> AsyncIterator[Any]:
+        try:
+            async for row in aiter_json_array(
+                response.aiter_bytes(settings.API_STREAM_CHUNK_SIZE)
+            ):
+                yield row
+        except httpx.HTTPError as e:
+            raise Exception(f"API Error: {str(e)}")
+
+    async def _iter(self, endpoint: str, record: type) -> AsyncIterator[Any]:
+        cached = self._fresh(endpoint)
+        if cached is not None:
+            for row in cached:
+                yield row
+            return
+        response = await self._send("GET", endpoint, stream=True)
+        try:
+            async for row in self._iter_rows(response):
+                yield record.from_dict(row)
+        finally:
+            await response.aclose()
+
+    async def gather(
+        self, *calls: Awaitable[Any], return_exceptions: bool = False
+    ) -> List[Any]:
+        return await asyncio.gather(*calls, return_exceptions=return_exceptions)
+
+    async def login(
+        self, username: str, password: str
+    ) -> Dict[str, Any]:
+        data = {
+            "username": username,
+            "password": password
+        }
+        response = await self._send("POST", "/api/v1/auth/token", form=data)
+        return response.json()
+
+    async def get_customers(
+        self, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[Customer]:
+        if limit is not None:
+            return (await self.get_customers_page(offset or 0, limit))[0]
+        return await self._get_list("/api/v1/customers", Customer)
+
+    async def create_customer(
+        self, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        customer = await self._request(
+            "POST",
+            "/api/v1/customers",
+            data=data
+        )
+        await self._replicate(*self._customer_created(customer))
+        return customer
+
+    async def update_customer(
+        self, customer_id: int, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        customer = await self._request(
+            "PUT",
+            f"/api/v1/customers/{customer_id}",
+            data=data
+        )
+        await self._replicate(
+            *self._customer_updated(customer_id, data, customer)
+        )
+        return customer
+
+    async def delete_customer(self, customer_id: int) -> None:
+        await self._request(
+            "DELETE",
+            f"/api/v1/customers/{customer_id}"
+        )
+        await self._replicate(*self._customer_deleted(customer_id))
+
+    async def get_rentals(
+        self, offset: Optional[int] = None, limit: Optional[int] = None
+    ) -> List[Rental]:
+        if limit is not None:
+            return (await self.get_rentals_page(offset or 0, limit))[0]
+        return await self._get_list("/api/v1/rentals", Rental)
+
+    async def create_rental(
+        self, data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        rental = await self._request(
+            "POST",
+            "/api/v1/rentals",
+            data=data
+        )
+        await self._replicate(*self._rental_created(data, rental))
+        return rental
+
+    async def return_rental(self, rental_id: int) -> Dict[str, Any]:
+        rental = await self._request(
+            "PUT",
+            f"/api/v1/rentals/{rental_id}/return"
+        )
+        await self._replicate(*self._rental_returned(rental_id, rental))
+        return rental
@@ -0,0 +1,569 @@
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.contrib import messages
+from django.views.decorators.http import require_http_methods
+from api import dashboard, open_rentals, replica, shared_snapshot
+from api.async_client import AsyncAPIClient
+from api.cache import response_cache
+from api.exports import aexport_response, check_format
+from api.lookups import aresolve_customers
+from api.metrics import render
+from api.pagination import WindowedPaginator
+from api.records import Customer, Rental
+from api.resilience import APIUnavailable
+from api.views import (
+    api_paginator,
+    customer_context,
+    customer_data,
+    customer_initial,
+    delete_error,
+    find_customers,
+    find_rentals,
+    get_criteria,
+    home_context,
+    outstanding_context,
+    render_list,
+    rental_data,
+    rental_rows,
+    returned_rental,
+    snapshot_customer,
+    snapshot_rental,
+    wants_fragment,
+)
+from api.forms import (
+    LoginForm,
+    RegisterForm,
+    CustomerForm,
+    RentalForm,
+    CustomerFilterForm,
+    RentalFilterForm,
+)
+
+# Async versions of the views in api/views.py, used when API_ASYNC_VIEWS is
+# enabled and the app runs under an ASGI server. Each view waits on
+# sakilaAPI without holding a thread; everything else comes from the
+# helpers in api/views.py.
+
+# Template rendering, the shared snapshot (a stat() and reads from the
+# mapped file) and the dashboard math run in a worker thread, so they
+# don't hold up the event loop.
+arender = sync_to_async(render, thread_sensitive=False)
+arender_list = sync_to_async(render_list, thread_sensitive=False)
+current_snapshot = sync_to_async(
+    shared_snapshot.current, thread_sensitive=False
+)
+asnapshot_customer = sync_to_async(snapshot_customer, thread_sensitive=False)
+asnapshot_rental = sync_to_async(snapshot_rental, thread_sensitive=False)
+
+async def get_token_from_session(request):
+    # Also loads the session, so templates can read it without blocking.
+    return await request.session.aget("access_token")
+
+async def returned_row(client, rental_id, result):
+    rental = returned_rental(rental_id, result)
+    if rental is None:
+        rental = await client.get_rental(rental_id)
+    customer = (await aresolve_customers(
+        client, [rental.customer_id]
+    )).get(rental.customer_id)
+    return {"rental": rental, "customer": customer}
+
+async def search_customers(client, criteria):
+    return find_customers(await client.get_customers(), criteria)
+
+async def search_rentals(client, criteria):
+    return find_rentals(await client.get_rentals(), criteria)
+
+async def home(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return await arender(request, "home.html")
+
+    try:
+        client = AsyncAPIClient(token)
+        stats = await sync_to_async(
+            (await dashboard.aget(client)).summary, thread_sensitive=False
+        )()
+        customers = await aresolve_customers(
+            client, (customer_id for customer_id, _ in stats["top_customers"])
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return await arender(request, "home.html")
+
+    return await arender(request, "home.html", home_context(stats, customers))
+
+@require_http_methods(["GET", "POST"])
+async def login(request):
+    await get_token_from_session(request)
+    if request.method == "POST":
+        form = LoginForm(request.POST)
+        if form.is_valid():
+            try:
+                client = AsyncAPIClient()
+                response = await client.login(
+                    form.cleaned_data["username"],
+                    form.cleaned_data["password"]
+                )
+                await request.session.aset(
+                    "access_token", response["access_token"]
+                )
+                await request.session.aset(
+                    "username", form.cleaned_data["username"]
+                )
+                messages.success(request, "Sesión iniciada correctamente")
+                return redirect("home")
+            except APIUnavailable:
+                raise
+            except Exception as e:
+                messages.error(request, f"Error: {str(e)}")
+    else:
+        form = LoginForm()
+    return await arender(request, "login.html", {"form": form})
+
+@require_http_methods(["GET", "POST"])
+async def register(request):
+    await get_token_from_session(request)
+    if request.method == "POST":
+        form = RegisterForm(request.POST)
+        if form.is_valid():
+            try:
+                client = AsyncAPIClient()
+                await client.register(
+                    form.cleaned_data["username"],
+                    form.cleaned_data["email"],
+                    form.cleaned_data["password"]
+                )
+                messages.success(
+                    request,
+                    "Usuario registrado correctamente. Ya puedes iniciar sesión"
+                )
+                return redirect("login")
+            except APIUnavailable:
+                raise
+            except Exception as e:
+                messages.error(request, f"Error: {str(e)}")
+    else:
+        form = RegisterForm()
+    return await arender(request, "register.html", {"form": form})
+
+async def cache_stats(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    return JsonResponse(response_cache.stats())
+
+async def logout(request):
+    await request.session.aflush()
+    messages.success(request, "Sesión cerrada correctamente. ¡Hasta pronto!")
+    return redirect("home")
+
+
+async def customers_list(request):
+    token = await get_token_from_session(request)
+    if not token:
+        messages.warning(request, "Acceso denegado. Por favor, inicia sesión con tu usuario")
+        return redirect("login")
+
+    filters = CustomerFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+
+    try:
+        client = AsyncAPIClient(token)
+        page_number = request.GET.get('page')
+        snapshot = None
+        if not criteria:
+            snapshot = await current_snapshot("customers", token)
+        if snapshot is not None:
+            paginator = WindowedPaginator(snapshot, 100)
+            customers = await sync_to_async(
+                paginator.get_page, thread_sensitive=False
+            )(page_number)
+        elif replica.enabled() and await sync_to_async(replica.available)(
+            "customers"
+        ):
+            paginator = WindowedPaginator(replica.customers(criteria), 100)
+            customers = await sync_to_async(paginator.get_page)(page_number)
+        elif criteria:
+            paginator = WindowedPaginator(
+                await search_customers(client, criteria), 100
+            )
+            customers = paginator.get_page(page_number)
+        else:
+            paginator = api_paginator(
+                client,
+                client.get_customers_page,
+                100,
+                "/api/v1/customers",
+            )
+            customers = await paginator.aget_page(page_number)
+
+        return await arender_list(
+            request,
+            "customers/list.html",
+            "customers/_rows.html",
+            {"customers": customers, "filters": filters},
+            customers,
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("home")
+
+async def customers_export(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    filters = CustomerFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+    fmt = request.GET.get("format", "csv")
+    check_format(fmt)
+
+    try:
+        client = AsyncAPIClient(token)
+        if criteria:
+            customers = await search_customers(client, criteria)
+        else:
+            customers = client.iter_customers()
+        return await aexport_response(
+            customers,
+            Customer,
+            fmt,
+            "clientes",
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("customers_list")
+
+async def customer_detail(request, customer_id):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        customer = rentals = None
+        found = await asnapshot_customer(token, customer_id)
+        if found is not None:
+            customer, rentals = found
+        elif replica.enabled() and await sync_to_async(replica.available)(
+            "customers", "rentals"
+        ):
+            customer = await sync_to_async(replica.customer)(customer_id)
+            rentals = await sync_to_async(replica.customer_rentals)(
+                customer_id
+            )
+        if customer is None:
+            client = AsyncAPIClient(token)
+            customer, rentals = await client.gather(
+                client.get_customer(customer_id),
+                client.get_customer_rentals(customer_id),
+            )
+
+        return await arender(
+            request,
+            "customers/detail.html",
+            customer_context(token, customer_id, customer, rentals),
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("customers_list")
+
+@require_http_methods(["GET", "POST"])
+async def customer_create(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    if request.method == "POST":
+        form = CustomerForm(request.POST)
+        if form.is_valid():
+            try:
+                client = AsyncAPIClient(token)
+                await client.create_customer(customer_data(form))
+                messages.success(request, "Cliente creado correctamente")
+                return redirect("customers_list")
+            except APIUnavailable:
+                raise
+            except Exception as e:
+                messages.error(request, f"Error: {str(e)}")
+    else:
+        form = CustomerForm()
+
+    return await arender(request, "customers/form.html", {"form": form})
+
+
+@require_http_methods(["GET", "POST"])
+async def customer_update(request, customer_id):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        client = AsyncAPIClient(token)
+
+        if request.method == "POST":
+            form = CustomerForm(request.POST)
+            if form.is_valid():
+                await client.update_customer(customer_id, customer_data(form))
+                messages.success(request, "Cliente actualizado correctamente")
+                return redirect(
+                    "customer_detail",
+                    customer_id=customer_id
+                )
+            customer = await client.get_customer(customer_id)
+        else:
+            customer = await client.get_customer(customer_id)
+            form = CustomerForm(initial=customer_initial(customer))
+
+        return await arender(
+            request,
+            "customers/form.html",
+            {"form": form, "customer": customer}
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("customers_list")
+
+
+@require_http_methods(["GET", "POST"])
+async def customer_delete(request, customer_id):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        client = AsyncAPIClient(token)
+
+        if request.method == "POST":
+            try:
+                await client.delete_customer(customer_id)
+                messages.success(request, "Cliente eliminado")
+                return redirect("customers_list")
+            except APIUnavailable:
+                raise
+            except Exception as e:
+                messages.error(request, delete_error(e))
+                return redirect("customers_list")
+
+        customer = await client.get_customer(customer_id)
+        return await arender(
+            request,
+            "customers/delete.html",
+            {"customer": customer}
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("customers_list")
+
+async def rentals_list(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    filters = RentalFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+
+    try:
+        client = AsyncAPIClient(token)
+        page_number = request.GET.get('page')
+        snapshot = customers_snapshot = None
+        if not criteria:
+            snapshot = await current_snapshot("rentals", token)
+            customers_snapshot = await current_snapshot("customers", token)
+        local = (
+            snapshot is None
+            and replica.enabled()
+            and await sync_to_async(replica.available)("rentals", "customers")
+        )
+        if snapshot is not None:
+            paginator = WindowedPaginator(snapshot, 50)
+            rentals = await sync_to_async(
+                paginator.get_page, thread_sensitive=False
+            )(page_number)
+        elif local:
+            paginator = WindowedPaginator(replica.rentals(criteria), 50)
+            rentals = await sync_to_async(paginator.get_page)(page_number)
+        elif criteria:
+            paginator = WindowedPaginator(
+                await search_rentals(client, criteria), 50
+            )
+            rentals = paginator.get_page(page_number)
+        else:
+            paginator = api_paginator(
+                client,
+                client.get_rentals_page,
+                50,
+                "/api/v1/rentals",
+            )
+            rentals = await paginator.aget_page(page_number)
+        customer_ids = (rental.customer_id for rental in rentals)
+        if customers_snapshot is not None:
+            customers = await sync_to_async(
+                customers_snapshot.get_many, thread_sensitive=False
+            )(customer_ids)
+        elif local:
+            customers = await sync_to_async(replica.customers_by_id)(
+                customer_ids
+            )
+        else:
+            customers = await aresolve_customers(client, customer_ids)
+        return await arender_list(
+            request,
+            "rentals/list.html",
+            "rentals/_rows.html",
+            {
+                "rentals": rentals,
+                "rows": rental_rows(rentals, customers),
+                "filters": filters,
+            },
+            rentals,
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("home")
+
+async def rentals_export(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    filters = RentalFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+    fmt = request.GET.get("format", "csv")
+    check_format(fmt)
+
+    try:
+        client = AsyncAPIClient(token)
+        if criteria:
+            rentals = await search_rentals(client, criteria)
+        else:
+            rentals = client.iter_rentals()
+        return await aexport_response(
+            rentals,
+            Rental,
+            fmt,
+            "reservas",
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
+
+async def rental_detail(request, rental_id):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        found = await asnapshot_rental(token, rental_id)
+        if found is not None:
+            rental, customer = found
+        else:
+            client = AsyncAPIClient(token)
+            rental = await client.get_rental(rental_id)
+            customer = (await aresolve_customers(
+                client, [rental.customer_id]
+            )).get(rental.customer_id)
+
+        return await arender(
+            request,
+            "rentals/detail.html",
+            {"rental": rental, "customer": customer}
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
+
+async def rentals_outstanding(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    overdue = request.GET.get("overdue") == "1"
+    try:
+        client = AsyncAPIClient(token)
+        index = await open_rentals.aget(client)
+        paginator = WindowedPaginator(index.oldest(overdue=overdue), 50)
+        rentals = paginator.get_page(request.GET.get('page'))
+        customers = await aresolve_customers(
+            client, (rental.customer_id for rental in rentals)
+        )
+        return await arender(
+            request,
+            "rentals/outstanding.html",
+            outstanding_context(index, rentals, customers, overdue),
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
+
+@require_http_methods(["GET", "POST"])
+async def rental_create(request):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    if request.method == "POST":
+        form = RentalForm(request.POST)
+        if form.is_valid():
+            try:
+                client = AsyncAPIClient(token)
+                await client.create_rental(rental_data(form))
+                messages.success(request, "Reserva creada correctamente")
+                return redirect("rentals_list")
+            except APIUnavailable:
+                raise
+            except Exception as e:
+                messages.error(request, f"Error: {str(e)}")
+    else:
+        form = RentalForm()
+
+    return await arender(request, "rentals/form.html", {"form": form})
+
+@require_http_methods(["POST"])
+async def rental_return(request, rental_id):
+    token = await get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        client = AsyncAPIClient(token)
+        result = await client.return_rental(rental_id)
+        if wants_fragment(request):
+            return await arender(
+                request,
+                "rentals/_row.html",
+                await returned_row(client, rental_id, result),
+            )
+        messages.success(request, "Reserva devuelta correctamente")
+        return redirect("rental_detail", rental_id=rental_id)
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
@@ -0,0 +1,217 @@
+import math
+import random
+import re
+import resource
+import threading
+import time
+from django.test import Client
+from django.urls import reverse
+from requests import Session
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+# Each scenario returns the request to send (method, path, data) and the
+# status and redirect target a successful response is expected to have.
+
+Request = Tuple[str, str, Optional[Dict], int, Optional[str]]
+
+_CALLS = re.compile(r'upstream;[^,]*desc="(\d+) calls"')
+
+
+def _home(rng: random.Random) -> Request:
+    return "GET", reverse("home"), None, 200, None
+
+
+def _customers_list(rng: random.Random) -> Request:
+    page = rng.randint(1, 6)
+    return "GET", f"{reverse('customers_list')}?page={page}", None, 200, None
+
+
+def _customers_search(rng: random.Random) -> Request:
+    query = rng.choice(["MAR", "SMITH", "JO", "LINDA W", "THOMAS"])
+    path = f"{reverse('customers_list')}?q={query}&sort=last_name"
+    return "GET", path, None, 200, None
+
+
+def _customer_detail(rng: random.Random) -> Request:
+    path = reverse("customer_detail", args=[rng.randint(1, 599)])
+    return "GET", path, None, 200, None
+
+
+def _rentals_list(rng: random.Random) -> Request:
+    page = rng.randint(1, 320)
+    return "GET", f"{reverse('rentals_list')}?page={page}", None, 200, None
+
+
+def _rental_detail(rng: random.Random) -> Request:
+    path = reverse("rental_detail", args=[rng.randint(1, 16044)])
+    return "GET", path, None, 200, None
+
+
+def _rental_create(rng: random.Random) -> Request:
+    data = {
+        "inventory_id": rng.randint(1, 4581),
+        "customer_id": rng.randint(1, 599),
+        "staff_id": rng.randint(1, 2),
+    }
+    return "POST", reverse("rental_create"), data, 302, reverse("rentals_list")
+
+
+def _rental_return(rng: random.Random) -> Request:
+    rental_id = rng.randint(1, 16044)
+    return (
+        "POST",
+        reverse("rental_return", args=[rental_id]),
+        None,
+        302,
+        reverse("rental_detail", args=[rental_id]),
+    )
+
+
+SCENARIOS: Dict[str, Callable[[random.Random], Request]] = {
+    "home": _home,
+    "customers_list": _customers_list,
+    "customers_search": _customers_search,
+    "customer_detail": _customer_detail,
+    "rentals_list": _rentals_list,
+    "rental_detail": _rental_detail,
+    "rental_create": _rental_create,
+    "rental_return": _rental_return,
+}
+
+
+def peak_rss() -> int:
+    # ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered)) - 1
+    return ordered[max(0, min(len(ordered) - 1, rank))]
+
+
+class _HTTPResponse:
+    def __init__(self, response):
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def get(self, header: str, alternate: Optional[str] = None):
+        return self.headers.get(header, alternate)
+
+
+class HTTPClient:
+    # Sends the scenarios to a real server over HTTP. Mirrors the parts of
+    # django.test.Client used by run_scenario().
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = Session()
+
+    def get(self, path: str) -> _HTTPResponse:
+        return _HTTPResponse(
+            self.session.get(self.base_url + path, allow_redirects=False)
+        )
+
+    def post(self, path: str, data: Dict) -> _HTTPResponse:
+        if "csrftoken" not in self.session.cookies:
+            self.get(reverse("login"))
+        return _HTTPResponse(self.session.post(
+            self.base_url + path,
+            data,
+            headers={"X-CSRFToken": self.session.cookies["csrftoken"]},
+            allow_redirects=False,
+        ))
+
+
+def logged_in_client(
+    base_url: Optional[str] = None,
+) -> Union[Client, HTTPClient]:
+    if base_url:
+        client = HTTPClient(base_url)
+    else:
+        client = Client(raise_request_exception=False)
+    response = client.post(
+        reverse("login"), {"username": "bench", "password": "bench"}
+    )
+    location = response.get("Location")
+    if response.status_code != 302 or location != reverse("home"):
+        raise RuntimeError("No se pudo iniciar sesión en el stub de la API")
+    return client
+
+
+def run_scenario(
+    name: str,
+    concurrency: int,
+    requests: int,
+    seed: int = 0,
+    base_url: Optional[str] = None,
+) -> Dict:
+    # With base_url the requests go to a server listening there; otherwise
+    # they run in this process through django.test.Client.
+    build = SCENARIOS[name]
+    clients = [logged_in_client(base_url) for _ in range(concurrency)]
+    latencies: List[float] = []
+    upstream_calls: List[int] = []
+    errors: List[str] = []
+    counter = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker(worker_id: int, client: Union[Client, HTTPClient]) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            method, path, data, status, location = build(rng)
+            started = time.perf_counter()
+            if method == "POST":
+                response = client.post(path, data or {})
+            else:
+                response = client.get(path)
+            elapsed = time.perf_counter() - started
+            calls = _CALLS.search(response.get("Server-Timing", ""))
+            ok = response.status_code == status and (
+                location is None or response.get("Location") == location
+            )
+            with lock:
+                latencies.append(elapsed)
+                if calls:
+                    upstream_calls.append(int(calls.group(1)))
+                if not ok:
+                    errors.append(
+                        f"{method} {path} -> {response.status_code} "
+                        f"{response.get('Location', '')}".strip()
+                    )
+
+    threads = [
+        threading.Thread(target=worker, args=(i, client))
+        for i, client in enumerate(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2)
+            if latencies else 0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        "upstream_calls_per_request": round(
+            sum(upstream_calls) / len(upstream_calls), 2
+        ) if upstream_calls else None,
+        "peak_rss_bytes": peak_rss(),
+    }
@@ -0,0 +1,279 @@
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+# A stand-in for sakilaAPI with a Sakila-sized synthetic dataset, used by
+# the bench command. It runs in its own process so the benchmark's peak
+# RSS only measures the Django side.
+
+FIRST_NAMES = [
+    "MARY", "PATRICIA", "LINDA", "BARBARA", "ELIZABETH", "JENNIFER",
+    "MARIA", "SUSAN", "MARGARET", "DOROTHY", "JAMES", "JOHN", "ROBERT",
+    "MICHAEL", "WILLIAM", "DAVID", "RICHARD", "CHARLES", "JOSEPH", "THOMAS",
+]
+LAST_NAMES = [
+    "SMITH", "JOHNSON", "WILLIAMS", "JONES", "BROWN", "DAVIS", "MILLER",
+    "WILSON", "MOORE", "TAYLOR", "ANDERSON", "THOMAS", "JACKSON", "WHITE",
+    "HARRIS", "MARTIN", "THOMPSON", "GARCIA", "MARTINEZ", "ROBINSON",
+]
+
+
+def build_dataset(customers: int, rentals: int, seed: int = 1) -> Dict:
+    rng = random.Random(seed)
+    customer_rows = []
+    for i in range(1, customers + 1):
+        first = rng.choice(FIRST_NAMES)
+        last = rng.choice(LAST_NAMES)
+        customer_rows.append({
+            "customer_id": i,
+            "store_id": 1 + i % 2,
+            "first_name": first,
+            "last_name": last,
+            "email": f"{first}.{last}{i}@sakilacustomer.org",
+            "address_id": i + 4,
+            "active": rng.random() > 0.03,
+            "create_date": "2006-02-14T22:04:36",
+            "last_update": "2006-02-15T04:57:20",
+        })
+    rental_rows = []
+    for i in range(1, rentals + 1):
+        day = 1 + rng.randrange(28)
+        rental_rows.append({
+            "rental_id": i,
+            "rental_date": f"2005-{5 + rng.randrange(4):02d}-{day:02d}T"
+                           f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:00",
+            "inventory_id": 1 + rng.randrange(4581),
+            "customer_id": 1 + rng.randrange(customers),
+            "return_date": (
+                None if rng.random() < 0.01
+                else f"2005-08-{day:02d}T10:00:00"
+            ),
+            "staff_id": 1 + rng.randrange(2),
+            "last_update": "2006-02-15T21:30:53",
+        })
+    return {"customers": customer_rows, "rentals": rental_rows}
+
+
+class StubAPI:
+    def __init__(
+        self,
+        customers: int = 599,
+        rentals: int = 16044,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        paginate: bool = True,
+    ):
+        dataset = build_dataset(customers, rentals)
+        self.customers: Dict[int, Dict] = {
+            row["customer_id"]: row for row in dataset["customers"]
+        }
+        self.rentals: Dict[int, Dict] = {
+            row["rental_id"]: row for row in dataset["rentals"]
+        }
+        self.latency = latency
+        self.jitter = jitter
+        self.paginate = paginate
+        self.calls = 0
+        self.lock = threading.Lock()
+        self._bodies: Dict[str, bytes] = {}
+
+    def body(self, name: str, rows: List[Dict]) -> bytes:
+        # Collections are serialized once and kept until the next write.
+        body = self._bodies.get(name)
+        if body is None:
+            body = self._bodies[name] = json.dumps(rows).encode()
+        return body
+
+    def changed(self) -> None:
+        self._bodies.clear()
+
+    def customer_rentals(self, customer_id: int) -> List[Dict]:
+        return [
+            row for row in self.rentals.values()
+            if row["customer_id"] == customer_id
+        ]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without TCP_NODELAY every
+    # response waits for the client's delayed ACK (~40 ms).
+    disable_nagle_algorithm = True
+    api: StubAPI
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self) -> None:
+        with self.api.lock:
+            self.api.calls += 1
+        wait = self.api.latency + random.uniform(0, self.api.jitter)
+        if wait:
+            time.sleep(wait)
+
+    def read_json(self) -> Any:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def reply(
+        self,
+        status: int,
+        payload: Any = None,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        if body is None:
+            body = json.dumps(payload).encode() if payload is not None else b""
+        headers = dict(headers or {})
+        if self.command == "GET" and status == 200:
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def collection(self, name: str, rows: List[Dict], query: Dict) -> None:
+        if not self.api.paginate or not (
+            "skip" in query or "limit" in query
+        ):
+            return self.reply(200, body=self.api.body(name, rows))
+        skip = int(query.get("skip", ["0"])[0])
+        limit = int(query.get("limit", ["100"])[0])
+        self.reply(
+            200,
+            rows[skip:skip + limit],
+            headers={"X-Total-Count": str(len(rows))},
+        )
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/_stub/stats":
+            return self.reply(200, {"calls": self.api.calls})
+        self.delay()
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")[2:]
+        api = self.api
+        if parts == ["customers"]:
+            return self.collection(
+                "customers", list(api.customers.values()), query
+            )
+        if parts == ["rentals"]:
+            return self.collection(
+                "rentals", list(api.rentals.values()), query
+            )
+        if len(parts) == 2 and parts[0] == "customers":
+            customer = api.customers.get(int(parts[1]))
+            if customer is None:
+                return self.reply(404, {"detail": "Customer not found"})
+            return self.reply(200, customer)
+        if len(parts) == 3 and parts[:2] == ["rentals", "customer"]:
+            customer_id = int(parts[2])
+            return self.collection(
+                f"rentals/customer/{customer_id}",
+                api.customer_rentals(customer_id),
+                query,
+            )
+        if len(parts) == 2 and parts[0] == "rentals":
+            rental = api.rentals.get(int(parts[1]))
+            if rental is None:
+                return self.reply(404, {"detail": "Rental not found"})
+            return self.reply(200, rental)
+        self.reply(404, {"detail": "Not Found"})
+
+    def do_POST(self):
+        self.delay()
+        path = urlparse(self.path).path
+        api = self.api
+        if path == "/api/v1/auth/token":
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            return self.reply(
+                200, {"access_token": "bench", "token_type": "bearer"}
+            )
+        if path == "/api/v1/auth/register":
+            return self.reply(201, self.read_json())
+        data = self.read_json()
+        with api.lock:
+            if path == "/api/v1/customers":
+                data["customer_id"] = max(api.customers) + 1
+                api.customers[data["customer_id"]] = data
+            elif path == "/api/v1/rentals":
+                data["rental_id"] = max(api.rentals) + 1
+                data["return_date"] = None
+                api.rentals[data["rental_id"]] = data
+            else:
+                return self.reply(404, {"detail": "Not Found"})
+            api.changed()
+        self.reply(201, data)
+
+    def do_PUT(self):
+        self.delay()
+        parts = urlparse(self.path).path.strip("/").split("/")[2:]
+        api = self.api
+        data = self.read_json()
+        with api.lock:
+            if len(parts) == 3 and parts[0] == "rentals":
+                row = api.rentals.get(int(parts[1]))
+                if row is not None:
+                    row["return_date"] = "2006-02-23T09:00:00"
+            elif len(parts) == 2 and parts[0] == "customers":
+                row = api.customers.get(int(parts[1]))
+                if row is not None:
+                    row.update(data)
+            else:
+                row = None
+            api.changed()
+        if row is None:
+            return self.reply(404, {"detail": "Not Found"})
+        self.reply(200, row)
+
+    def do_DELETE(self):
+        self.delay()
+        parts = urlparse(self.path).path.strip("/").split("/")[2:]
+        with self.api.lock:
+            self.api.customers.pop(int(parts[1]), None)
+            self.api.changed()
+        self.reply(204)
+
+
+def serve(port: int, api: StubAPI) -> ThreadingHTTPServer:
+    handler = type("StubHandler", (Handler,), {"api": api})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub de sakilaAPI")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--customers", type=int, default=599)
+    parser.add_argument("--rentals", type=int, default=16044)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--no-pagination", action="store_true")
+    args = parser.parse_args()
+    api = StubAPI(
+        args.customers,
+        args.rentals,
+        latency=args.latency,
+        jitter=args.jitter,
+        paginate=not args.no_pagination,
+    )
+    serve(args.port, api).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from api.records import RecordList
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+
+CacheKey = Tuple[str, str, tuple]
+
+
+def make_key(
+    scope: str, endpoint: str, params: Optional[Dict] = None
+) -> CacheKey:
+    return (scope, endpoint, tuple(sorted((params or {}).items())))
+
+
+class CacheEntry:
+    __slots__ = ("payload", "size", "expires", "etag", "last_modified")
+
+    def __init__(
+        self,
+        payload: Any,
+        size: int,
+        expires: float,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ):
+        self.payload = payload
+        self.size = size
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires >= time.monotonic()
+
+    @property
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    def __init__(self, ttl: float, max_bytes: int, max_stale: float = 0):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.revalidations = 0
+        self.stale_hits = 0
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._refreshing: Set[CacheKey] = set()
+        # Responses fetched by warm_cache. They are never served directly,
+        # only used as validators for the first conditional request of the
+        # user they were fetched for: a 304 sent to someone else says
+        # nothing about whether that user may see the payload.
+        self._seeds: Dict[CacheKey, CacheEntry] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: CacheKey) -> Optional[CacheEntry]:
+        # Expired entries are still returned so that their validators can
+        # be used for a conditional request; callers check entry.fresh.
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            if entry.fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def peek(self, key: CacheKey) -> Optional[CacheEntry]:
+        # Like get() but only for fresh entries and without touching the
+        # counters or the LRU order.
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not entry.fresh:
+            return None
+        return entry
+
+    def serve_stale(self, entry: CacheEntry) -> bool:
+        if self.ttl <= 0 or entry.expires + self.max_stale < time.monotonic():
+            return False
+        self.stale_hits += 1
+        return True
+
+    def begin_refresh(self, key: CacheKey) -> bool:
+        # Only one background refresh per key at a time.
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: CacheKey) -> None:
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def seed(self, key: CacheKey) -> Optional[CacheEntry]:
+        return self._seeds.get(key)
+
+    def set(
+        self,
+        key: CacheKey,
+        payload: Any,
+        size: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        if size > self.max_bytes:
+            return
+        if self.ttl <= 0 and not (etag or last_modified):
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = CacheEntry(
+                payload,
+                size,
+                time.monotonic() + self.ttl,
+                etag,
+                last_modified,
+            )
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def revalidated(self, key: CacheKey) -> bool:
+        with self._lock:
+            self.revalidations += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.expires = time.monotonic() + self.ttl
+            return True
+
+    def invalidate(
+        self, endpoints: Iterable[str] = (), prefixes: Iterable[str] = ()
+    ) -> None:
+        endpoints = set(endpoints)
+        prefixes = tuple(prefixes)
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if key[1] in endpoints
+                or (prefixes and key[1].startswith(prefixes))
+            ]
+            for key in stale:
+                self._remove(key)
+            for key in [
+                key for key in self._seeds
+                if key[1] in endpoints
+                or (prefixes and key[1].startswith(prefixes))
+            ]:
+                del self._seeds[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "revalidations": self.revalidations,
+            "stale_hits": self.stale_hits,
+            "refreshing": len(self._refreshing),
+            "seeds": len(self._seeds),
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def export(self, scope: str) -> List[tuple]:
+        # Entries of one scope that carry validators, as written by the
+        # warm_cache command.
+        with self._lock:
+            return [
+                (key, _detach(entry.payload), entry.size, entry.etag,
+                 entry.last_modified)
+                for key, entry in self._entries.items()
+                if key[0] == scope and (entry.etag or entry.last_modified)
+            ]
+
+    def load_seeds(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            rows = pickle.load(f)
+        with self._lock:
+            for key, payload, size, etag, last_modified in rows:
+                self._seeds[key] = CacheEntry(
+                    _attach(payload), size, 0, etag, last_modified
+                )
+        return len(rows)
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key)
+        self.size -= entry.size
+
+
+def _detach(payload: Any) -> Any:
+    # Search indexes attached to cached lists are not written to disk.
+    if isinstance(payload, RecordList):
+        return list(payload)
+    if isinstance(payload, tuple) and payload and isinstance(
+        payload[0], RecordList
+    ):
+        return (list(payload[0]),) + payload[1:]
+    return payload
+
+
+def _attach(payload: Any) -> Any:
+    if isinstance(payload, list):
+        return RecordList(payload)
+    if isinstance(payload, tuple) and payload and isinstance(
+        payload[0], list
+    ):
+        return (RecordList(payload[0]),) + payload[1:]
+    return payload
+
+
+response_cache = ResponseCache(
+    ttl=settings.API_CACHE_TTL,
+    max_bytes=settings.API_CACHE_MAX_BYTES,
+    max_stale=settings.API_CACHE_MAX_STALE,
+)
@@ -0,0 +1,161 @@
+import secrets
+import zlib
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+from typing import AsyncIterator, Iterator, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+)
+
+
+class _Encoder:
+    # Incremental gzip/brotli encoder for streaming responses. Every chunk
+    # is flushed as soon as it is compressed, so a streamed export starts
+    # reaching the browser with its first row; the compressor keeps its
+    # window between flushes, so later rows still compress against earlier
+    # ones.
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(
+                quality=settings.COMPRESS_BROTLI_QUALITY
+            )
+            self._compress = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits 16 + MAX_WBITS writes a gzip header and trailer.
+            self._compressor = zlib.compressobj(
+                settings.COMPRESS_GZIP_LEVEL,
+                zlib.DEFLATED,
+                16 + zlib.MAX_WBITS,
+            )
+            self._compress = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+
+    def compress(self, chunk) -> bytes:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        return self._compress(chunk) + self._flush()
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def _compress_iter(chunks, encoding: str) -> Iterator[bytes]:
+    encoder = _Encoder(encoding)
+    for chunk in chunks:
+        data = encoder.compress(chunk)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+async def _acompress_iter(chunks, encoding: str) -> AsyncIterator[bytes]:
+    encoder = _Encoder(encoding)
+    async for chunk in chunks:
+        data = encoder.compress(chunk)
+        if data:
+            yield data
+    yield encoder.finish()
+
+
+def accepted_encoding(request) -> Optional[str]:
+    accepted = {
+        value.split(";")[0].strip()
+        for value in request.META.get("HTTP_ACCEPT_ENCODING", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    # Like django.middleware.gzip.GZipMiddleware, but only for text
+    # responses of at least COMPRESS_MIN_BYTES, with brotli when the
+    # package is installed and the browser accepts it, and without
+    # splitting streamed exports into one gzip member per row. Static files
+    # never get here: WhiteNoise serves its own pre-compressed copies.
+    #
+    # Against BREACH, gzip gets random padding in its header as with
+    # GZipMiddleware. The brotli format has no such field, so HTML pages,
+    # the responses that carry the CSRF token, get a random-length comment
+    # instead.
+
+    max_random_bytes = 100
+
+    def process_response(self, request, response):
+        if not settings.COMPRESS_RESPONSES:
+            return response
+        if response.has_header("Content-Encoding"):
+            return response
+        if not response.get("Content-Type", "").startswith(COMPRESSIBLE_TYPES):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESS_MIN_BYTES
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = _acompress_iter(
+                    response.streaming_content, encoding
+                )
+            else:
+                response.streaming_content = _compress_iter(
+                    response.streaming_content, encoding
+                )
+            del response.headers["Content-Length"]
+        else:
+            if encoding == "br":
+                compressed = brotli.compress(
+                    self.pad(response),
+                    quality=settings.COMPRESS_BROTLI_QUALITY,
+                )
+            else:
+                # Random padding in the gzip header, as GZipMiddleware does
+                # against BREACH.
+                compressed = compress_string(
+                    response.content, max_random_bytes=self.max_random_bytes
+                )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers["Content-Length"] = str(len(compressed))
+
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = encoding
+        return response
+
+    def pad(self, response) -> bytes:
+        content = response.content
+        if not response.get("Content-Type", "").startswith("text/html"):
+            return content
+        # Random characters, so the padding doesn't compress away.
+        length = secrets.randbelow(self.max_random_bytes + 1)
+        padding = secrets.token_urlsafe(length)[:length]
+        return content + f"<!-- {padding} -->".encode()
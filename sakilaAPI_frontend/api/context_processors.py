@@ -0,0 +1,5 @@
+from django.conf import settings
+
+
+def assets(request):
+    return {"SELF_HOSTED_ASSETS": settings.SELF_HOSTED_ASSETS}
@@ -0,0 +1,199 @@
+import threading
+import numpy as np
+from api.live import LiveRentals
+from api.records import Rental
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Aggregates for the dashboard on home. The rental collection is turned
+# into NumPy columns once per process, and grouping is done with bincount
+# over day, customer and staff numbers. New and returned rentals update the
+# counts in place (api.live), and summary() is cached until they change.
+# As with every api.live structure, the figures are the same for every
+# user: they come from the rentals of whoever's request built them.
+
+DAYS = 30
+WEEKS = 12
+TOP_CUSTOMERS = 10
+
+def _timestamps(values: Iterable[Optional[str]]) -> np.ndarray:
+    # "YYYY-MM-DDTHH:MM:SS" with any fraction or offset cut off; missing
+    # dates become NaT.
+    return np.array(
+        [(value or "")[:19] for value in values], dtype="datetime64[s]"
+    )
+
+
+def _epoch_days(timestamps: np.ndarray) -> np.ndarray:
+    return timestamps.astype("datetime64[D]").astype(np.int64)
+
+
+def _bump(counts: np.ndarray, index: int, value: int = 1) -> np.ndarray:
+    if index >= len(counts):
+        counts = np.concatenate(
+            [counts, np.zeros(index + 1 - len(counts), dtype=counts.dtype)]
+        )
+    counts[index] += value
+    return counts
+
+
+class RentalStats:
+    def __init__(self, rentals: Iterable[Rental]):
+        rentals = list(rentals)
+        count = len(rentals)
+        ids = np.fromiter((r.rental_id for r in rentals), np.int64, count)
+        customers = np.fromiter(
+            (r.customer_id or -1 for r in rentals), np.int64, count
+        )
+        staff = np.fromiter(
+            (r.staff_id or -1 for r in rentals), np.int64, count
+        )
+        rented = _timestamps(r.rental_date for r in rentals)
+        returned = _timestamps(r.return_date for r in rentals)
+
+        order = np.argsort(ids, kind="stable")
+        self.ids = ids[order]
+        self.rented = rented[order]
+        self.open = np.isnat(returned[order])
+        # Rentals created after the build: id -> (rental_date, open).
+        self.added: Dict[int, Tuple[np.datetime64, bool]] = {}
+        self.total = count
+
+        dated = ~np.isnat(rented)
+        days = _epoch_days(rented[dated])
+        self.first_day = int(days.min()) if len(days) else 0
+        self.per_day = np.bincount(days - self.first_day).astype(np.int64)
+        self.per_customer = np.bincount(customers[customers >= 0])
+        self.per_staff = np.bincount(staff[staff >= 0])
+
+        closed = dated & ~np.isnat(returned)
+        seconds = (returned[closed] - rented[closed]).astype(np.int64)
+        self.returned_count = int(closed.sum())
+        self.duration_seconds = float(seconds.sum())
+
+        self._lock = threading.Lock()
+        self._summary: Optional[Dict[str, Any]] = None
+
+    def _position(self, rental_id: int) -> Optional[int]:
+        # Index of a rental read at build time, or None.
+        position = int(np.searchsorted(self.ids, rental_id))
+        if position < len(self.ids) and self.ids[position] == rental_id:
+            return position
+        return None
+
+    def add(self, rental: Rental) -> None:
+        with self._lock:
+            # A write replayed after a build may already be in it.
+            if (
+                rental.rental_id in self.added
+                or self._position(rental.rental_id) is not None
+            ):
+                return
+            rented = _timestamps([rental.rental_date])[0]
+            self.added[rental.rental_id] = (rented, not rental.return_date)
+            self.total += 1
+            if not np.isnat(rented):
+                day = int(_epoch_days(rented)) - self.first_day
+                if day >= 0:
+                    self.per_day = _bump(self.per_day, day)
+            if rental.customer_id:
+                self.per_customer = _bump(
+                    self.per_customer, rental.customer_id
+                )
+            if rental.staff_id:
+                self.per_staff = _bump(self.per_staff, rental.staff_id)
+            self._summary = None
+
+    def mark_returned(self, rental_id: int, return_date: str) -> None:
+        with self._lock:
+            position = self._position(rental_id)
+            if position is not None:
+                if not self.open[position]:
+                    return
+                self.open[position] = False
+                rented = self.rented[position]
+            elif rental_id in self.added:
+                rented, is_open = self.added[rental_id]
+                if not is_open:
+                    return
+                self.added[rental_id] = (rented, False)
+            else:
+                return
+            returned = _timestamps([return_date])[0]
+            if not np.isnat(rented) and not np.isnat(returned):
+                self.returned_count += 1
+                self.duration_seconds += float(
+                    (returned - rented).astype(np.int64)
+                )
+            self._summary = None
+
+    @property
+    def open_count(self) -> int:
+        return int(self.open.sum()) + sum(
+            is_open for _, is_open in self.added.values()
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        summary = self._summary
+        if summary is None:
+            with self._lock:
+                summary = self._summary = self._summarize()
+        return summary
+
+    def _summarize(self) -> Dict[str, Any]:
+        open_count = self.open_count
+        days = np.arange(len(self.per_day)) + self.first_day
+        # The window ends on the last day with rentals, so a dataset that
+        # stops in the past (Sakila's ends in 2006) still shows something.
+        active = np.flatnonzero(self.per_day)
+        end = int(active[-1]) + 1 if len(active) else 0
+        start = max(0, end - DAYS)
+
+        # Mondays: 1970-01-01 was a Thursday.
+        mondays = days - (days + 3) % 7
+        weeks, week_index = np.unique(mondays[:end], return_inverse=True)
+        per_week = np.bincount(week_index, weights=self.per_day[:end])
+
+        top = np.argsort(self.per_customer, kind="stable")[::-1]
+        top = top[self.per_customer[top] > 0][:TOP_CUSTOMERS]
+        staff = np.flatnonzero(self.per_staff)
+
+        return {
+            "total": self.total,
+            "open": open_count,
+            "returned": self.total - open_count,
+            "average_days": (
+                self.duration_seconds / self.returned_count / 86400
+                if self.returned_count else None
+            ),
+            "per_day": _bars(days[start:end], self.per_day[start:end]),
+            "per_week": _bars(weeks[-WEEKS:], per_week[-WEEKS:]),
+            "top_customers": [
+                (int(customer), int(self.per_customer[customer]))
+                for customer in top
+            ],
+            "per_staff": [
+                (int(staff_id), int(self.per_staff[staff_id]))
+                for staff_id in staff
+            ],
+        }
+
+
+def _bars(days: np.ndarray, counts: np.ndarray) -> List[Tuple[str, int, int]]:
+    # (ISO date, count, percentage of the highest count) for the template.
+    highest = counts.max() if len(counts) else 0
+    percents = counts * 100 // highest if highest else counts * 0
+    dates = days.astype("datetime64[D]").astype(str).tolist()
+    return [
+        (date, int(count), int(percent))
+        for date, count, percent in zip(dates, counts, percents)
+    ]
+
+
+_live = LiveRentals(
+    RentalStats,
+    "DASHBOARD_REBUILD_INTERVAL",
+    "sakila_dashboard_build_seconds",
+)
+get = _live.get
+aget = _live.aget
@@ -0,0 +1,108 @@
+import csv
+import json
+from itertools import chain
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from django.http import Http404, StreamingHttpResponse
+
+
+class Echo:
+    def write(self, value: str) -> str:
+        return value
+
+
+def csv_lines(records: Iterable[Any], record: type) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(record._fields)
+    for row in records:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(records: Iterable[Any]) -> Iterator[str]:
+    for row in records:
+        yield json.dumps(row._asdict(), ensure_ascii=False) + "\n"
+
+
+async def acsv_lines(
+    records: AsyncIterable[Any], record: type
+) -> AsyncIterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(record._fields)
+    async for row in records:
+        yield writer.writerow(row)
+
+
+async def andjson_lines(records: AsyncIterable[Any]) -> AsyncIterator[str]:
+    async for row in records:
+        yield json.dumps(row._asdict(), ensure_ascii=False) + "\n"
+
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+def check_format(fmt: str) -> None:
+    # Called before anything is read from sakilaAPI.
+    if fmt not in CONTENT_TYPES:
+        raise Http404("Formato de exportación no soportado")
+
+
+def _attachment(lines: Any, fmt: str, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[fmt])
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    return response
+
+
+def export_response(
+    records: Iterable[Any], record: type, fmt: str, filename: str
+) -> StreamingHttpResponse:
+    check_format(fmt)
+    # Read the first record before answering so that upstream errors can
+    # still be reported with a redirect instead of a truncated download.
+    records = iter(records)
+    first = next(records, None)
+    if first is not None:
+        records = chain([first], records)
+
+    if fmt == "csv":
+        lines = csv_lines(records, record)
+    else:
+        lines = ndjson_lines(records)
+    return _attachment(lines, fmt, filename)
+
+
+async def aexport_response(
+    records: Any, record: type, fmt: str, filename: str
+) -> StreamingHttpResponse:
+    # export_response() for the async views: records may be a list or an
+    # async iterator, and the response is streamed asynchronously.
+    check_format(fmt)
+    records = _aiter(records)
+    first = await anext(records, None)
+
+    async def rows():
+        if first is not None:
+            yield first
+            async for row in records:
+                yield row
+
+    if fmt == "csv":
+        lines = acsv_lines(rows(), record)
+    else:
+        lines = andjson_lines(rows())
+    return _attachment(lines, fmt, filename)
+
+
+def _aiter(records: Any) -> AsyncIterator[Any]:
+    if hasattr(records, "__anext__"):
+        return records
+
+    async def rows():
+        for row in records:
+            yield row
+
+    return rows()
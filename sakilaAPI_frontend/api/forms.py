@@ -175,4 +175,122 @@ class RentalForm(forms.Form):
                 "required": "required"
             }
         )
-    )
\ No newline at end of file
+    )
+
+
+class CustomerFilterForm(forms.Form):
+    q = forms.CharField(
+        required=False,
+        max_length=91,
+        widget=forms.TextInput(
+            attrs={
+                "class": "input",
+                "placeholder": "Nombre o apellidos"
+            }
+        )
+    )
+
+    email = forms.CharField(
+        required=False,
+        max_length=50,
+        widget=forms.TextInput(
+            attrs={
+                "class": "input",
+                "placeholder": "E-mail"
+            }
+        )
+    )
+
+    store_id = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                "class": "input",
+                "placeholder": "Tienda"
+            }
+        )
+    )
+
+    active = forms.TypedChoiceField(
+        required=False,
+        choices=[
+            ("", "Todos"),
+            ("1", "Activos"),
+            ("0", "Inactivos"),
+        ],
+        coerce=lambda value: value == "1",
+        empty_value=None,
+    )
+
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[
+            ("customer_id", "ID"),
+            ("last_name", "Apellidos (A-Z)"),
+            ("-last_name", "Apellidos (Z-A)"),
+            ("first_name", "Nombre (A-Z)"),
+            ("-first_name", "Nombre (Z-A)"),
+            ("email", "E-mail"),
+            ("-customer_id", "ID (descendente)"),
+        ]
+    )
+
+
+class RentalFilterForm(forms.Form):
+    customer_id = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                "class": "input",
+                "placeholder": "Cliente"
+            }
+        )
+    )
+
+    inventory_id = forms.IntegerField(
+        required=False,
+        min_value=1,
+        widget=forms.NumberInput(
+            attrs={
+                "class": "input",
+                "placeholder": "Inventario"
+            }
+        )
+    )
+
+    status = forms.ChoiceField(
+        required=False,
+        choices=[
+            ("", "Todas"),
+            ("outstanding", "Pendientes"),
+            ("returned", "Devueltas"),
+        ]
+    )
+
+    date_from = forms.DateField(
+        required=False,
+        widget=forms.DateInput(
+            attrs={"class": "input", "type": "date"}
+        )
+    )
+
+    date_to = forms.DateField(
+        required=False,
+        widget=forms.DateInput(
+            attrs={"class": "input", "type": "date"}
+        )
+    )
+
+    sort = forms.ChoiceField(
+        required=False,
+        choices=[
+            ("rental_id", "ID"),
+            ("-rental_date", "Más recientes"),
+            ("rental_date", "Más antiguas"),
+            ("-return_date", "Devolución (recientes)"),
+            ("customer_id", "Cliente"),
+            ("-rental_id", "ID (descendente)"),
+        ]
+    )
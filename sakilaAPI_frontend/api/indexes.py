@@ -0,0 +1,202 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from api.records import Customer, RecordList, Rental
+
+
+# Secondary indexes over a cached collection snapshot. They are built the
+# first time a snapshot is filtered and stored on it, so every request that
+# reads the same cached list reuses them.
+
+
+class PrefixIndex:
+    def __init__(self, values: Iterable[Optional[str]]):
+        pairs = sorted(
+            ((value or "").casefold(), position)
+            for position, value in enumerate(values)
+        )
+        self.keys = [key for key, _ in pairs]
+        self.positions = [position for _, position in pairs]
+
+    def search(self, prefix: str) -> Set[int]:
+        prefix = prefix.casefold()
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + "\uffff", start)
+        return set(self.positions[start:end])
+
+    def between(self, low: Optional[str], high: Optional[str]) -> Set[int]:
+        start = bisect_left(self.keys, low) if low else 0
+        end = bisect_right(self.keys, high) if high else len(self.keys)
+        return set(self.positions[start:end])
+
+
+class SnapshotIndex:
+    sort_keys: Dict[str, Callable] = {}
+
+    def __init__(self, records: List):
+        self.records = records
+        self._orders: Dict[str, List[int]] = {}
+
+    @classmethod
+    def for_snapshot(cls, records: RecordList) -> "SnapshotIndex":
+        index = getattr(records, "search_index", None)
+        if index is None:
+            index = records.search_index = cls(records)
+        return index
+
+    def order(self, sort: str) -> List[int]:
+        order = self._orders.get(sort)
+        if order is None:
+            if sort.startswith("-"):
+                order = self.order(sort[1:])[::-1]
+            else:
+                key = self.sort_keys[sort]
+                order = sorted(
+                    range(len(self.records)),
+                    key=lambda position: key(self.records[position]),
+                )
+            self._orders[sort] = order
+        return order
+
+    def select(self, matches: Optional[Set[int]], sort: str) -> List:
+        order = self.order(sort)
+        records = self.records
+        if matches is None:
+            return [records[position] for position in order]
+        if len(matches) * 8 < len(order):
+            rank = self._rank(sort.lstrip("-"))
+            positions = sorted(
+                matches,
+                key=rank.__getitem__,
+                reverse=sort.startswith("-"),
+            )
+            return [records[position] for position in positions]
+        return [
+            records[position] for position in order if position in matches
+        ]
+
+    def _rank(self, field: str) -> List[int]:
+        ranks = self._orders.get(f"rank:{field}")
+        if ranks is None:
+            ranks = [0] * len(self.records)
+            for rank, position in enumerate(self.order(field)):
+                ranks[position] = rank
+            self._orders[f"rank:{field}"] = ranks
+        return ranks
+
+
+def _intersect(matches: Optional[Set[int]], found: Set[int]) -> Set[int]:
+    return found if matches is None else matches & found
+
+
+def _text(value: Optional[str]) -> str:
+    return (value or "").casefold()
+
+
+class CustomerIndex(SnapshotIndex):
+    sort_keys = {
+        "customer_id": lambda customer: customer.customer_id,
+        "first_name": lambda customer: _text(customer.first_name),
+        "last_name": lambda customer: _text(customer.last_name),
+        "email": lambda customer: _text(customer.email),
+    }
+
+    def __init__(self, records: List[Customer]):
+        super().__init__(records)
+        self.by_id = {customer.customer_id: customer for customer in records}
+        self.first_names = PrefixIndex(c.first_name for c in records)
+        self.last_names = PrefixIndex(c.last_name for c in records)
+        self.emails = PrefixIndex(c.email for c in records)
+        self.by_store: Dict[int, Set[int]] = defaultdict(set)
+        self.by_active: Dict[bool, Set[int]] = defaultdict(set)
+        for position, customer in enumerate(records):
+            self.by_store[customer.store_id].add(position)
+            self.by_active[bool(customer.active)].add(position)
+
+    def search(
+        self,
+        name: Optional[str] = None,
+        email: Optional[str] = None,
+        store_id: Optional[int] = None,
+        active: Optional[bool] = None,
+        sort: str = "customer_id",
+    ) -> List[Customer]:
+        matches = None
+        if name:
+            words = name.split()
+            if len(words) > 1:
+                found = (
+                    self.first_names.search(words[0])
+                    & self.last_names.search(" ".join(words[1:]))
+                )
+            else:
+                found = (
+                    self.first_names.search(name)
+                    | self.last_names.search(name)
+                )
+            matches = _intersect(matches, found)
+        if email:
+            matches = _intersect(matches, self.emails.search(email))
+        if store_id is not None:
+            matches = _intersect(matches, self.by_store.get(store_id, set()))
+        if active is not None:
+            matches = _intersect(matches, self.by_active.get(active, set()))
+        return self.select(matches, sort)
+
+
+class RentalIndex(SnapshotIndex):
+    sort_keys = {
+        "rental_id": lambda rental: rental.rental_id,
+        "rental_date": lambda rental: rental.rental_date or "",
+        "return_date": lambda rental: rental.return_date or "",
+        "customer_id": lambda rental: rental.customer_id or 0,
+    }
+
+    def __init__(self, records: List[Rental]):
+        super().__init__(records)
+        self.by_id = {rental.rental_id: rental for rental in records}
+        self.rental_dates = PrefixIndex(r.rental_date for r in records)
+        self.by_customer: Dict[int, Set[int]] = defaultdict(set)
+        self.by_inventory: Dict[int, Set[int]] = defaultdict(set)
+        self.outstanding: Set[int] = set()
+        self.returned: Set[int] = set()
+        for position, rental in enumerate(records):
+            self.by_customer[rental.customer_id].add(position)
+            self.by_inventory[rental.inventory_id].add(position)
+            if rental.return_date:
+                self.returned.add(position)
+            else:
+                self.outstanding.add(position)
+
+    def search(
+        self,
+        customer_id: Optional[int] = None,
+        inventory_id: Optional[int] = None,
+        status: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        sort: str = "rental_id",
+    ) -> List[Rental]:
+        matches = None
+        if customer_id is not None:
+            matches = _intersect(
+                matches, self.by_customer.get(customer_id, set())
+            )
+        if inventory_id is not None:
+            matches = _intersect(
+                matches, self.by_inventory.get(inventory_id, set())
+            )
+        if status == "outstanding":
+            matches = _intersect(matches, self.outstanding)
+        elif status == "returned":
+            matches = _intersect(matches, self.returned)
+        if date_from or date_to:
+            matches = _intersect(
+                matches,
+                self.rental_dates.between(
+                    date_from,
+                    f"{date_to}\uffff" if date_to else None,
+                ),
+            )
+        return self.select(matches, sort)
@@ -0,0 +1,75 @@
+from functools import partial
+from typing import Dict, Iterable, List, Optional, Set
+
+from api.api_client import APIClient
+from api.async_client import AsyncAPIClient
+from api.indexes import CustomerIndex
+from api.records import Customer
+
+
+def _ids(customer_ids: Iterable[Optional[int]]) -> Set[int]:
+    return {customer_id for customer_id in customer_ids if customer_id}
+
+
+def _in_snapshot(
+    snapshot: Optional[List[Customer]], ids: Set[int]
+) -> Dict[int, Customer]:
+    if snapshot is None:
+        return {}
+    by_id = CustomerIndex.for_snapshot(snapshot).by_id
+    return {i: by_id[i] for i in ids if i in by_id}
+
+
+def _add_fetched(found: Dict[int, Customer], results: list) -> None:
+    # Customers that couldn't be read are left out.
+    for customer in results:
+        if isinstance(customer, Customer):
+            found[customer.customer_id] = customer
+
+
+def resolve_customers(
+    client: APIClient,
+    customer_ids: Iterable[Optional[int]],
+    max_single_fetches: int = 10,
+) -> Dict[int, Customer]:
+    ids = _ids(customer_ids)
+    if not ids:
+        return {}
+
+    snapshot = client.cached_customers()
+    if snapshot is None and len(ids) > max_single_fetches:
+        # One collection read is cheaper than many item reads, and it
+        # leaves a snapshot in the cache for the next page.
+        snapshot = client.get_customers()
+    found = _in_snapshot(snapshot, ids)
+
+    missing = sorted(ids - found.keys())
+    if missing:
+        _add_fetched(found, client.gather(
+            *(partial(client.get_customer, i) for i in missing),
+            return_exceptions=True,
+        ))
+    return found
+
+
+async def aresolve_customers(
+    client: AsyncAPIClient,
+    customer_ids: Iterable[Optional[int]],
+    max_single_fetches: int = 10,
+) -> Dict[int, Customer]:
+    ids = _ids(customer_ids)
+    if not ids:
+        return {}
+
+    snapshot = client.cached_customers()
+    if snapshot is None and len(ids) > max_single_fetches:
+        snapshot = await client.get_customers()
+    found = _in_snapshot(snapshot, ids)
+
+    missing = sorted(ids - found.keys())
+    if missing:
+        _add_fetched(found, await client.gather(
+            *(client.get_customer(i) for i in missing),
+            return_exceptions=True,
+        ))
+    return found
@@ -0,0 +1,297 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from typing import Dict, List
+from api.bench.runner import SCENARIOS, peak_rss, run_scenario
+from api.cache import response_cache
+from api.pagination import clear_cached_counts
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise CommandError(f"No hay respuesta en {url}")
+            time.sleep(0.2)
+
+
+def process_tree(pid: int) -> List[int]:
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields follow ")".
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    pids = [pid]
+    for parent in pids:
+        pids.extend(children.get(parent, []))
+    return pids
+
+
+def tree_peak_rss(pid: int) -> int:
+    # Sum of the peak RSS (VmHWM) of a server and its workers. Linux only.
+    total = 0
+    for child in process_tree(pid):
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+def server_command(server: str, port: int, options) -> List[str]:
+    bind = f"127.0.0.1:{port}"
+    if server == "wsgi":
+        return [
+            sys.executable, "-m", "gunicorn",
+            "sakilaAPI_frontend.wsgi:application",
+            "--bind", bind,
+            "--workers", str(options["workers"]),
+            "--threads", str(options["threads"]),
+            "--log-level", "warning",
+        ]
+    return [
+        sys.executable, "-m", "uvicorn",
+        "sakilaAPI_frontend.asgi:application",
+        "--host", "127.0.0.1",
+        "--port", str(port),
+        "--workers", str(options["workers"]),
+        "--log-level", "warning",
+        "--no-access-log",
+    ]
+
+
+def stub_calls(base_url: str) -> int:
+    with urllib.request.urlopen(f"{base_url}/_stub/stats") as response:
+        return json.load(response)["calls"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Lanza un stub local de sakilaAPI y mide las vistas con varios "
+        "clientes concurrentes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help="Escenarios separados por comas",
+        )
+        parser.add_argument("--concurrency", type=int, default=4)
+        parser.add_argument(
+            "--requests", type=int, default=200,
+            help="Peticiones por escenario",
+        )
+        parser.add_argument(
+            "--latency", type=float, default=20,
+            help="Latencia añadida por el stub en milisegundos",
+        )
+        parser.add_argument(
+            "--jitter", type=float, default=5,
+            help="Latencia aleatoria extra del stub en milisegundos",
+        )
+        parser.add_argument("--customers", type=int, default=599)
+        parser.add_argument("--rentals", type=int, default=16044)
+        parser.add_argument(
+            "--no-pagination", action="store_true",
+            help="El stub ignora skip/limit, como la sakilaAPI original",
+        )
+        parser.add_argument(
+            "--cold", action="store_true",
+            help="Vacía la caché de APIClient antes de cada escenario",
+        )
+        parser.add_argument(
+            "--server",
+            choices=["client", "wsgi", "asgi"],
+            default="client",
+            help=(
+                "client ejecuta las vistas en este proceso; wsgi y asgi "
+                "lanzan gunicorn o uvicorn (con las vistas async) y les "
+                "envían peticiones HTTP"
+            ),
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Procesos del servidor con --server wsgi/asgi",
+        )
+        parser.add_argument(
+            "--threads", type=int, default=1,
+            help="Hilos por proceso de gunicorn con --server wsgi",
+        )
+        parser.add_argument(
+            "--output",
+            default=f"bench-{datetime.now():%Y%m%d-%H%M%S}.json",
+        )
+        parser.add_argument(
+            "--compare", help="Resultados anteriores con los que comparar"
+        )
+
+    def handle(self, *args, **options):
+        names = [name for name in options["scenarios"].split(",") if name]
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(
+                f"Escenarios desconocidos: {', '.join(sorted(unknown))}"
+            )
+        if options["cold"] and options["server"] != "client":
+            raise CommandError("--cold solo se puede usar con --server client")
+
+        port = free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        command = [
+            sys.executable, "-m", "api.bench.stub",
+            "--port", str(port),
+            "--customers", str(options["customers"]),
+            "--rentals", str(options["rentals"]),
+            "--latency", str(options["latency"] / 1000),
+            "--jitter", str(options["jitter"] / 1000),
+        ]
+        if options["no_pagination"]:
+            command.append("--no-pagination")
+        stub = subprocess.Popen(command, cwd=settings.BASE_DIR)
+        server = None
+        try:
+            wait_for(f"{base_url}/_stub/stats")
+            if options["server"] == "client":
+                with override_settings(
+                    API_BASE_URL=base_url,
+                    ALLOWED_HOSTS=["testserver"],
+                    SESSION_ENGINE=(
+                        "django.contrib.sessions.backends.signed_cookies"
+                    ),
+                ):
+                    results = self.run(names, base_url, None, options)
+            else:
+                server_port = free_port()
+                server_url = f"http://127.0.0.1:{server_port}"
+                server = subprocess.Popen(
+                    server_command(options["server"], server_port, options),
+                    cwd=settings.BASE_DIR,
+                    env={
+                        **os.environ,
+                        "API_BASE_URL": base_url,
+                        "SESSION_BACKEND": "signed_cookies",
+                        "API_ASYNC_VIEWS": str(options["server"] == "asgi"),
+                    },
+                )
+                wait_for(f"{server_url}/login/")
+                results = self.run(names, base_url, server_url, options)
+                results["server_peak_rss_bytes"] = tree_peak_rss(server.pid)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+            stub.terminate()
+            stub.wait()
+
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2)
+        self.report(results)
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                self.compare(json.load(f), results)
+        self.stdout.write(f"Resultados guardados en {options['output']}")
+
+    def run(self, names, base_url, server_url, options):
+        scenarios = {}
+        for name in names:
+            if options["cold"]:
+                response_cache.clear()
+                clear_cached_counts()
+            calls = stub_calls(base_url)
+            result = run_scenario(
+                name,
+                options["concurrency"],
+                options["requests"],
+                base_url=server_url,
+            )
+            # Includes the login of each client; the Server-Timing based
+            # upstream_calls_per_request does not.
+            result["stub_calls"] = stub_calls(base_url) - calls
+            scenarios[name] = result
+        return {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "config": {
+                key: options[key] for key in (
+                    "concurrency", "requests", "latency", "jitter",
+                    "customers", "rentals", "no_pagination", "cold",
+                    "server", "workers", "threads",
+                )
+            },
+            "settings": {
+                "API_CACHE_TTL": settings.API_CACHE_TTL,
+                "API_FANOUT_WORKERS": settings.API_FANOUT_WORKERS,
+                "API_POOL_MAXSIZE": settings.API_POOL_MAXSIZE,
+                "API_COUNT_FREE_PAGINATION": (
+                    settings.API_COUNT_FREE_PAGINATION
+                ),
+            },
+            "scenarios": scenarios,
+            "peak_rss_bytes": peak_rss(),
+        }
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'escenario':<18}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+            f"{'upstream':>10}{'errores':>9}"
+        )
+        for name, result in results["scenarios"].items():
+            latency = result["latency_ms"]
+            calls = result["upstream_calls_per_request"]
+            self.stdout.write(
+                f"{name:<18}{result['throughput_rps']:>9.1f}"
+                f"{latency['p50']:>9.1f}{latency['p95']:>9.1f}"
+                f"{latency['p99']:>9.1f}"
+                f"{calls if calls is not None else '-':>10}"
+                f"{result['errors']:>9}"
+            )
+        self.stdout.write(
+            f"RSS máximo: {results['peak_rss_bytes'] / 1024 / 1024:.1f} MB"
+        )
+        if "server_peak_rss_bytes" in results:
+            self.stdout.write(
+                "RSS máximo del servidor: "
+                f"{results['server_peak_rss_bytes'] / 1024 / 1024:.1f} MB"
+            )
+
+    def compare(self, previous, results):
+        self.stdout.write("Comparación con la ejecución anterior:")
+        for name, result in results["scenarios"].items():
+            before = previous["scenarios"].get(name)
+            if not before or not before["throughput_rps"]:
+                continue
+            throughput = result["throughput_rps"] / before["throughput_rps"]
+            p95 = (
+                result["latency_ms"]["p95"] / before["latency_ms"]["p95"]
+                if before["latency_ms"]["p95"] else 0
+            )
+            self.stdout.write(
+                f"{name:<18} req/s x{throughput:.2f}  p95 x{p95:.2f}"
+            )
@@ -0,0 +1,68 @@
+import gc
+import json
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from api.records import Rental, load
+from api.streaming import iter_json_array
+
+
+def synthetic_rentals(count):
+    return [
+        {
+            "rental_id": i,
+            "rental_date": f"2005-{5 + i % 4:02d}-{1 + i % 28:02d}T"
+                           f"{i % 24:02d}:{i % 60:02d}:00",
+            "inventory_id": 1 + i % 4581,
+            "customer_id": 1 + i % 599,
+            "return_date": None if i % 90 == 0 else "2005-08-01T10:00:00",
+            "staff_id": 1 + i % 2,
+            "last_update": "2006-02-15T21:30:53",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {
+        "retained_bytes": current,
+        "peak_bytes": peak,
+        "seconds": round(elapsed, 4),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la memoria de la lista de reservas como lista de dicts "
+        "frente a registros Rental"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=16044)
+        parser.add_argument("--chunk-size", type=int, default=64 * 1024)
+
+    def handle(self, *args, **options):
+        body = json.dumps(synthetic_rentals(options["rows"])).encode()
+        chunk_size = options["chunk_size"]
+
+        def chunks():
+            for start in range(0, len(body), chunk_size):
+                yield body[start:start + chunk_size]
+
+        results = {
+            "rows": options["rows"],
+            "payload_bytes": len(body),
+            "dicts": measure(lambda: json.loads(body.decode())),
+            "records": measure(
+                lambda: load(Rental, iter_json_array(chunks()))
+            ),
+        }
+        self.stdout.write(json.dumps(results, indent=2))
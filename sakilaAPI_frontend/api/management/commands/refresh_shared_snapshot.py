@@ -0,0 +1,72 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api import shared_snapshot
+from api.api_client import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe la instantánea compartida de clientes y reservas en "
+        "SHARED_SNAPSHOT_DIR, una vez o cada --interval segundos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username", default=os.getenv("SHARED_SNAPSHOT_USERNAME")
+        )
+        parser.add_argument(
+            "--password", default=os.getenv("SHARED_SNAPSHOT_PASSWORD")
+        )
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Reescribe los ficheros aunque sakilaAPI no haya cambiado",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Segundos entre refrescos; 0 refresca una vez",
+        )
+
+    def handle(self, *args, **options):
+        if not shared_snapshot.enabled():
+            raise CommandError("Configura SHARED_SNAPSHOT_DIR")
+        if not options["username"] or not options["password"]:
+            raise CommandError(
+                "Indica --username y --password (o SHARED_SNAPSHOT_USERNAME "
+                "y SHARED_SNAPSHOT_PASSWORD)"
+            )
+
+        full = options["full"]
+        while True:
+            started = time.monotonic()
+            try:
+                self.refresh(options, full)
+            except Exception as e:
+                if not options["interval"]:
+                    raise CommandError(str(e))
+                self.stderr.write(f"Error al refrescar: {e}")
+            if not options["interval"]:
+                return
+            full = False
+            time.sleep(
+                max(0, options["interval"] - (time.monotonic() - started))
+            )
+
+    def refresh(self, options, full):
+        # A new token each round, so a long-running loop survives expiry.
+        client = APIClient(APIClient().login(
+            options["username"], options["password"]
+        )["access_token"])
+        for name in shared_snapshot.COLLECTIONS:
+            started = time.perf_counter()
+            rows = shared_snapshot.refresh(client, name, full=full)
+            elapsed = time.perf_counter() - started
+            if rows is None:
+                self.stdout.write(f"{name}: sin cambios ({elapsed:.2f}s)")
+            else:
+                size = os.path.getsize(shared_snapshot.path(name))
+                self.stdout.write(
+                    f"{name}: {rows} filas, {size} bytes ({elapsed:.2f}s) "
+                    f"en {settings.SHARED_SNAPSHOT_DIR}"
+                )
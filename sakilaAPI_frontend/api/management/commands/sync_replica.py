@@ -0,0 +1,67 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api import replica
+from api.api_client import APIClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia los clientes y las reservas de sakilaAPI a la réplica local "
+        "en SQLite, una vez o cada --interval segundos"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--username", default=os.getenv("REPLICA_USERNAME")
+        )
+        parser.add_argument(
+            "--password", default=os.getenv("REPLICA_PASSWORD")
+        )
+        parser.add_argument(
+            "--full", action="store_true",
+            help="Descarga las colecciones completas aunque no hayan cambiado",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Segundos entre sincronizaciones; 0 sincroniza una vez",
+        )
+
+    def handle(self, *args, **options):
+        if not options["username"] or not options["password"]:
+            raise CommandError(
+                "Indica --username y --password (o REPLICA_USERNAME y "
+                "REPLICA_PASSWORD)"
+            )
+
+        full = options["full"]
+        while True:
+            started = time.monotonic()
+            try:
+                self.sync(options, full)
+            except Exception as e:
+                if not options["interval"]:
+                    raise CommandError(str(e))
+                self.stderr.write(f"Error al sincronizar: {e}")
+            if not options["interval"]:
+                return
+            full = False
+            time.sleep(
+                max(0, options["interval"] - (time.monotonic() - started))
+            )
+
+    def sync(self, options, full):
+        # A new token each round, so a long-running loop survives expiry.
+        token = APIClient().login(
+            options["username"], options["password"]
+        )["access_token"]
+        started = time.perf_counter()
+        results = replica.sync(APIClient(token), full=full)
+        summary = ", ".join(
+            f"{name}: {written} escritos, {deleted} borrados"
+            for name, (written, deleted) in results.items()
+        )
+        self.stdout.write(
+            f"Réplica sincronizada en {time.perf_counter() - started:.2f}s "
+            f"({summary})"
+        )
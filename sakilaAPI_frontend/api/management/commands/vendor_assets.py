@@ -0,0 +1,88 @@
+import os
+import posixpath
+import re
+import urllib.request
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from typing import Dict
+
+
+# Stylesheets base.html loads from CDNs, and where they are stored under
+# api/static/vendor/. The fonts they reference are downloaded next to them.
+ASSETS = {
+    "bulma/bulma.min.css": (
+        "https://cdn.jsdelivr.net/npm/bulma@0.9.4/css/bulma.min.css"
+    ),
+    "inter/inter.css": "https://rsms.me/inter/inter.css",
+    "fontawesome/css/all.min.css": (
+        "https://cdn.jsdelivr.net/npm/@fortawesome/fontawesome-free@6.5.2"
+        "/css/all.min.css"
+    ),
+}
+
+_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+_SOURCE_MAP = re.compile(r"/\*[#@] sourceMappingURL=[^*]*\*/")
+
+
+def download(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga Bulma, Inter y Font Awesome a api/static/vendor/ para "
+        "servirlos con SELF_HOSTED_ASSETS=True"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default=(
+                Path(apps.get_app_config("api").path) / "static" / "vendor"
+            ),
+        )
+
+    def handle(self, *args, **options):
+        output = Path(options["output"])
+        for name, url in ASSETS.items():
+            try:
+                files = self.fetch_stylesheet(name, url)
+            except OSError as e:
+                raise CommandError(f"No se pudo descargar {url}: {e}")
+            for path, content in files.items():
+                target = output / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp = target.with_name(f"{target.name}.tmp")
+                tmp.write_bytes(content)
+                os.replace(tmp, target)
+            self.stdout.write(f"{name}: {len(files)} ficheros")
+        self.stdout.write(
+            "Ejecuta collectstatic y arranca con SELF_HOSTED_ASSETS=True"
+        )
+
+    def fetch_stylesheet(self, name: str, url: str) -> Dict[str, bytes]:
+        css = download(url).decode("utf-8")
+        # collectstatic would fail on a source map that is not downloaded.
+        css = _SOURCE_MAP.sub("", css)
+        files = {}
+        folder = posixpath.dirname(name)
+
+        def localize(match):
+            quote, ref = match.groups()
+            if ref.startswith(("data:", "#")) or urlsplit(ref).scheme:
+                return match.group(0)
+            # Query strings are cache busters; collectstatic hashes instead.
+            path = urlsplit(ref).path
+            local = posixpath.normpath(posixpath.join(folder, path))
+            if local.startswith(("../", "/")):
+                raise CommandError(f"{url} apunta fuera de vendor/: {ref}")
+            if local not in files:
+                files[local] = download(urljoin(url, ref))
+            return f"url({quote}{path}{quote})"
+
+        css = _URL.sub(localize, css)
+        files[name] = css.encode("utf-8")
+        return files
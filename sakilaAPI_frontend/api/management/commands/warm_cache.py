@@ -0,0 +1,67 @@
+import os
+import pickle
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.api_client import APIClient
+from api.cache import response_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Descarga los listados de sakilaAPI y los guarda en "
+        "API_CACHE_WARM_FILE para que los workers arranquen con la caché "
+        "precargada"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--token", default=os.getenv("API_WARM_TOKEN")
+        )
+        parser.add_argument(
+            "--username", default=os.getenv("API_WARM_USERNAME")
+        )
+        parser.add_argument(
+            "--password", default=os.getenv("API_WARM_PASSWORD")
+        )
+        parser.add_argument(
+            "--output", default=settings.API_CACHE_WARM_FILE
+        )
+
+    def handle(self, *args, **options):
+        if not options["token"] and not (
+            options["username"] and options["password"]
+        ):
+            raise CommandError(
+                "Indica --token o --username y --password (o API_WARM_TOKEN, "
+                "API_WARM_USERNAME y API_WARM_PASSWORD)"
+            )
+        if not options["output"]:
+            raise CommandError("Indica --output o API_CACHE_WARM_FILE")
+
+        try:
+            token = options["token"] or APIClient().login(
+                options["username"], options["password"]
+            )["access_token"]
+            client = APIClient(token)
+            client.gather(
+                client.get_customers,
+                client.get_rentals,
+                lambda: client.get_customers_page(0, 100),
+                lambda: client.get_rentals_page(0, 50),
+            )
+        except Exception as e:
+            raise CommandError(str(e))
+
+        rows = response_cache.export(client.scope)
+        if not rows:
+            raise CommandError(
+                "sakilaAPI no envía ETag ni Last-Modified: las respuestas "
+                "no se pueden revalidar"
+            )
+        tmp = f"{options['output']}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, options["output"])
+        self.stdout.write(
+            f"{len(rows)} respuestas guardadas en {options['output']}"
+        )
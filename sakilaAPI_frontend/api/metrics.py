@@ -0,0 +1,444 @@
+import contextvars
+import json
+import os
+import re
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.shortcuts import render as django_render
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Metrics are recorded into per-thread buffers so the hot path never takes
+# a lock; /metrics merges every thread's buffer, plus the files other
+# gunicorn workers flush to METRICS_DIR, when it is scraped. The files only
+# hold counters and histograms, so those of workers that have exited keep
+# being added: dropping them would make the totals go down, which
+# Prometheus reads as a counter reset. gunicorn.conf.py folds them into
+# one archive file as workers exit.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "sakila_upstream_requests_total": (
+        "counter", "Peticiones a sakilaAPI por endpoint, método y estado"
+    ),
+    "sakila_upstream_request_seconds": (
+        "histogram", "Latencia de las peticiones a sakilaAPI"
+    ),
+    "sakila_upstream_response_bytes_total": (
+        "counter", "Bytes recibidos de sakilaAPI"
+    ),
+    "sakila_json_decode_seconds": (
+        "histogram", "Tiempo de decodificación de las respuestas JSON"
+    ),
+    "sakila_cache_requests_total": (
+        "counter", "Lecturas de la caché de APIClient por resultado"
+    ),
+    "sakila_template_render_seconds": (
+        "histogram", "Tiempo de renderizado de plantillas por vista"
+    ),
+    "sakila_request_seconds": (
+        "histogram", "Duración de las peticiones por vista"
+    ),
+    "sakila_requests_total": (
+        "counter", "Peticiones atendidas por vista y estado"
+    ),
+    "sakila_background_refresh_total": (
+        "counter", "Refrescos en segundo plano de respuestas caducadas"
+    ),
+    "sakila_coalesce_timeouts_total": (
+        "counter", "Esperas a una petición idéntica en curso que caducaron"
+    ),
+    "sakila_upstream_retries_total": (
+        "counter", "Reintentos de peticiones GET a sakilaAPI"
+    ),
+    "sakila_circuit_breaker_opened_total": (
+        "counter", "Veces que se ha abierto el circuito hacia sakilaAPI"
+    ),
+    "sakila_circuit_breaker_rejections_total": (
+        "counter", "Peticiones rechazadas con el circuito abierto"
+    ),
+    "sakila_replica_reads_total": (
+        "counter", "Lecturas servidas desde la réplica local o desde sakilaAPI"
+    ),
+    "sakila_shared_snapshot_reads_total": (
+        "counter", "Lecturas de la instantánea compartida por resultado"
+    ),
+    "sakila_open_rentals_build_seconds": (
+        "histogram", "Tiempo de construcción del índice de reservas pendientes"
+    ),
+    "sakila_dashboard_build_seconds": (
+        "histogram", "Tiempo de cálculo de los agregados del panel de inicio"
+    ),
+    "sakila_shared_snapshot_refresh_total": (
+        "counter", "Refrescos de la instantánea compartida hechos por workers"
+    ),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+_ID = re.compile(r"/\d+(?=/|$)")
+_FILE = re.compile(r"metrics-.+\.json$")
+ARCHIVE = "metrics-archive.json"
+
+_local = threading.local()
+_recorders: List["Recorder"] = []
+_recorders_lock = threading.Lock()
+_current: contextvars.ContextVar = contextvars.ContextVar(
+    "sakila_request_timing", default=None
+)
+_last_flush = 0.0
+_gauges: Dict[str, Tuple[str, Callable[[], float]]] = {}
+
+
+class Recorder:
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+
+
+def _recorder() -> Recorder:
+    recorder = getattr(_local, "recorder", None)
+    if recorder is None:
+        recorder = _local.recorder = Recorder()
+        with _recorders_lock:
+            _recorders.append(recorder)
+    return recorder
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    counters = _recorder().counters
+    counters[key] = counters.get(key, 0) + value
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    key = (name, tuple(sorted(labels.items())))
+    histograms = _recorder().histograms
+    histogram = histograms.get(key)
+    if histogram is None:
+        histogram = histograms[key] = [0] * (len(BUCKETS) + 2)
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            histogram[i] += 1
+            break
+    histogram[-2] += seconds
+    histogram[-1] += 1
+
+
+def gauge(name: str, text: str, read: Callable[[], float]) -> None:
+    # Gauges are read when /metrics is scraped and describe the process
+    # that answers the scrape.
+    _gauges[name] = (text, read)
+
+
+def endpoint_label(endpoint: str) -> str:
+    return _ID.sub("/{id}", endpoint)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.events: List[Tuple[str, float]] = []
+
+    def total(self, kind: str) -> float:
+        return sum(seconds for event, seconds in self.events if event == kind)
+
+    def count(self, kind: str) -> int:
+        return sum(1 for event, _ in self.events if event == kind)
+
+    def header(self, elapsed: float) -> str:
+        upstream = self.count("upstream")
+        hits = self.count("cache_hit")
+        return ", ".join([
+            f'upstream;dur={self.total("upstream") * 1000:.1f};'
+            f'desc="{upstream} calls"',
+            f'decode;dur={self.total("decode") * 1000:.1f}',
+            f'render;dur={self.total("render") * 1000:.1f}',
+            f'cache;desc="{hits} hits"',
+            f"total;dur={elapsed * 1000:.1f}",
+        ])
+
+
+def timing_event(kind: str, seconds: float = 0.0) -> None:
+    timing = _current.get()
+    if timing is not None:
+        timing.events.append((kind, seconds))
+
+
+def record_upstream(
+    method: str, endpoint: str, status: Union[int, str], seconds: float
+) -> None:
+    endpoint = endpoint_label(endpoint)
+    inc(
+        "sakila_upstream_requests_total",
+        endpoint=endpoint, method=method, status=str(status),
+    )
+    observe(
+        "sakila_upstream_request_seconds",
+        seconds, endpoint=endpoint, method=method,
+    )
+    timing_event("upstream", seconds)
+
+
+def record_decode(endpoint: str, size: int, seconds: float) -> None:
+    endpoint = endpoint_label(endpoint)
+    inc("sakila_upstream_response_bytes_total", size, endpoint=endpoint)
+    observe("sakila_json_decode_seconds", seconds, endpoint=endpoint)
+    timing_event("decode", seconds)
+
+
+def record_cache(result: str) -> None:
+    inc("sakila_cache_requests_total", result=result)
+    if result == "hit":
+        timing_event("cache_hit")
+
+
+def render(request, template_name, context=None, *args, **kwargs):
+    started = time.perf_counter()
+    response = django_render(request, template_name, context, *args, **kwargs)
+    elapsed = time.perf_counter() - started
+    observe("sakila_template_render_seconds", elapsed, view=view_label(request))
+    timing_event("render", elapsed)
+    return response
+
+
+def view_label(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return (match.url_name if match else None) or "unknown"
+
+
+def snapshot() -> Dict[str, dict]:
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    with _recorders_lock:
+        recorders = list(_recorders)
+    for recorder in recorders:
+        for key, value in recorder.counters.copy().items():
+            counters[key] = counters.get(key, 0) + value
+        for key, values in recorder.histograms.copy().items():
+            merged = histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(list(values)):
+                merged[i] += value
+    return {"counters": counters, "histograms": histograms}
+
+
+def _serialize(data: Dict[str, dict]) -> Dict[str, list]:
+    return {
+        kind: [[name, list(labels), value] for (name, labels), value
+               in values.items()]
+        for kind, values in data.items()
+    }
+
+
+def _deserialize(data: Dict[str, list]) -> Dict[str, dict]:
+    return {
+        kind: {
+            (name, tuple(tuple(label) for label in labels)): value
+            for name, labels, value in values
+        }
+        for kind, values in data.items()
+    }
+
+
+def _path(directory: str, pid: int) -> str:
+    # The host name keeps apart workers of containers sharing METRICS_DIR.
+    return os.path.join(
+        directory, f"metrics-{socket.gethostname()}-{pid}.json"
+    )
+
+
+def _read(path: str) -> Optional[Dict[str, dict]]:
+    try:
+        with open(path) as f:
+            return _deserialize(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+
+def _write(path: str, data: Dict[str, dict]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(_serialize(data), f)
+    os.replace(tmp, path)
+
+
+def _merge(target: Dict[str, dict], data: Dict[str, dict]) -> None:
+    for key, value in data["counters"].items():
+        target["counters"][key] = target["counters"].get(key, 0) + value
+    for key, values in data["histograms"].items():
+        merged = target["histograms"].setdefault(key, [0] * len(values))
+        for i, value in enumerate(values):
+            merged[i] += value
+
+
+@contextmanager
+def _locked(directory: str, shared: bool = False):
+    # Scrapes read the directory while mark_process_dead() moves a file
+    # into the archive, so a worker is never counted twice or not at all.
+    # Without fcntl (Windows) there is no lock.
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory, "metrics.lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def flush(force: bool = False) -> None:
+    global _last_flush
+    directory = settings.METRICS_DIR
+    now = time.monotonic()
+    if not directory or (
+        not force and now - _last_flush < settings.METRICS_FLUSH_INTERVAL
+    ):
+        return
+    _last_flush = now
+    os.makedirs(directory, exist_ok=True)
+    _write(_path(directory, os.getpid()), snapshot())
+
+
+def collect() -> Dict[str, dict]:
+    directory = settings.METRICS_DIR
+    if not directory:
+        return snapshot()
+    flush(force=True)
+    merged: Dict[str, dict] = {"counters": {}, "histograms": {}}
+    with _locked(directory, shared=True):
+        for name in os.listdir(directory):
+            if not _FILE.match(name):
+                continue
+            data = _read(os.path.join(directory, name))
+            if data is not None:
+                _merge(merged, data)
+    return merged
+
+
+def mark_process_dead(pid: int, directory: Optional[str] = None) -> None:
+    # Adds the totals of a worker that has exited to the archive file and
+    # removes its own file, so the directory doesn't grow with every
+    # worker restart. Called by the gunicorn master (gunicorn.conf.py).
+    directory = directory or settings.METRICS_DIR
+    if not directory:
+        return
+    path = _path(directory, pid)
+    if not os.path.exists(path):
+        return
+    with _locked(directory):
+        data = _read(path)
+        if data is None:
+            return
+        archive = os.path.join(directory, ARCHIVE)
+        merged = _read(archive) or {"counters": {}, "histograms": {}}
+        _merge(merged, data)
+        _write(archive, merged)
+        os.remove(path)
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def _format_labels(labels: Labels, extra: Optional[str] = None) -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def exposition(data: Dict[str, dict]) -> str:
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described and name in HELP:
+            kind, text = HELP[name]
+            lines.append(f"# HELP {name} {text}")
+            lines.append(f"# TYPE {name} {kind}")
+            described.add(name)
+
+    for (name, labels), value in sorted(data["counters"].items()):
+        describe(name)
+        lines.append(f"{name}{_format_labels(labels)} {value}")
+    for (name, labels), values in sorted(data["histograms"].items()):
+        describe(name)
+        cumulative = 0
+        for bound, count in zip(BUCKETS, values):
+            cumulative += count
+            bucket = _format_labels(labels, f'le="{bound}"')
+            lines.append(f"{name}_bucket{bucket} {cumulative}")
+        bucket = _format_labels(labels, 'le="+Inf"')
+        lines.append(f"{name}_bucket{bucket} {values[-1]}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]}")
+        lines.append(f"{name}_count{_format_labels(labels)} {values[-1]}")
+    for name, (text, read) in sorted(_gauges.items()):
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {read()}")
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    return HttpResponse(
+        exposition(collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current.set(timing)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, timing, started)
+
+    def _finish(self, request, response, timing, started):
+        elapsed = time.perf_counter() - started
+        view = view_label(request)
+        observe("sakila_request_seconds", elapsed, view=view)
+        inc(
+            "sakila_requests_total",
+            view=view, status=str(response.status_code),
+        )
+        response["Server-Timing"] = timing.header(elapsed)
+        flush()
+        return response
@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaState',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('synced_at', models.DateTimeField(null=True)),
+                ('full_synced_at', models.DateTimeField(null=True)),
+                ('etag', models.CharField(blank=True, default='', max_length=200)),
+                ('high_water', models.CharField(blank=True, default='', max_length=32)),
+                ('rows', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=50, unique=True)),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Customer',
+            fields=[
+                ('customer_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('store_id', models.IntegerField(null=True)),
+                ('first_name', models.CharField(db_collation='NOCASE', max_length=45, null=True)),
+                ('last_name', models.CharField(db_collation='NOCASE', max_length=45, null=True)),
+                ('email', models.CharField(db_collation='NOCASE', max_length=50, null=True)),
+                ('address_id', models.IntegerField(null=True)),
+                ('active', models.BooleanField(null=True)),
+                ('create_date', models.CharField(max_length=32, null=True)),
+                ('last_update', models.CharField(max_length=32, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['first_name'], name='api_custome_first_n_f3ff40_idx'), models.Index(fields=['last_name', 'first_name'], name='api_custome_last_na_df9930_idx'), models.Index(fields=['email'], name='api_custome_email_5634b9_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Rental',
+            fields=[
+                ('rental_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('rental_date', models.CharField(max_length=32, null=True)),
+                ('inventory_id', models.IntegerField(null=True)),
+                ('customer_id', models.IntegerField(null=True)),
+                ('return_date', models.CharField(max_length=32, null=True)),
+                ('staff_id', models.IntegerField(null=True)),
+                ('last_update', models.CharField(max_length=32, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['customer_id', 'rental_id'], name='api_rental_custome_461e55_idx'), models.Index(fields=['return_date'], name='api_rental_return__d6329c_idx'), models.Index(fields=['rental_date'], name='api_rental_rental__54145f_idx'), models.Index(fields=['inventory_id'], name='api_rental_invento_1c7991_idx')],
+            },
+        ),
+    ]
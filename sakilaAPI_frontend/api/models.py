@@ -6,4 +6,72 @@ class User(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+
+# Local read replica of the sakilaAPI collections (see api/replica.py).
+# Field names match api.records so rows map straight onto Customer and
+# Rental; dates are kept as the ISO strings sakilaAPI sends. Text columns
+# use SQLite's NOCASE collation so case-insensitive prefix searches
+# (LIKE 'mar%') can use their indexes.
+
+class Customer(models.Model):
+    customer_id = models.IntegerField(primary_key=True)
+    store_id = models.IntegerField(null=True)
+    first_name = models.CharField(
+        max_length=45, null=True, db_collation="NOCASE"
+    )
+    last_name = models.CharField(
+        max_length=45, null=True, db_collation="NOCASE"
+    )
+    email = models.CharField(max_length=50, null=True, db_collation="NOCASE")
+    address_id = models.IntegerField(null=True)
+    active = models.BooleanField(null=True)
+    create_date = models.CharField(max_length=32, null=True)
+    last_update = models.CharField(max_length=32, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["first_name"]),
+            models.Index(fields=["last_name", "first_name"]),
+            models.Index(fields=["email"]),
+        ]
+
+    def __str__(self):
+        return f"{self.first_name} {self.last_name}"
+
+
+class Rental(models.Model):
+    rental_id = models.IntegerField(primary_key=True)
+    rental_date = models.CharField(max_length=32, null=True)
+    inventory_id = models.IntegerField(null=True)
+    # Not a ForeignKey: rows are copied as sakilaAPI sends them, and a
+    # rental may arrive before its customer.
+    customer_id = models.IntegerField(null=True)
+    return_date = models.CharField(max_length=32, null=True)
+    staff_id = models.IntegerField(null=True)
+    last_update = models.CharField(max_length=32, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["customer_id", "rental_id"]),
+            models.Index(fields=["return_date"]),
+            models.Index(fields=["rental_date"]),
+            models.Index(fields=["inventory_id"]),
+        ]
+
+    def __str__(self):
+        return f"Reserva {self.rental_id}"
+
+
+class ReplicaState(models.Model):
+    # One row per replicated collection ("customers", "rentals").
+    name = models.CharField(max_length=20, primary_key=True)
+    synced_at = models.DateTimeField(null=True)
+    full_synced_at = models.DateTimeField(null=True)
+    etag = models.CharField(max_length=200, blank=True, default="")
+    high_water = models.CharField(max_length=32, blank=True, default="")
+    rows = models.IntegerField(default=0)
+
+    def __str__(self):
+        return self.name
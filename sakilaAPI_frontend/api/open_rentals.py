@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.conf import settings
+from api.live import LiveRentals
+from api.records import Rental
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+# Rentals that haven't been returned, by customer and by age. Built once
+# per process and kept current by api.live, which also rebuilds it every
+# OPEN_RENTALS_REBUILD_INTERVAL seconds.
+
+
+class OpenRentalIndex:
+    def __init__(self, rentals: Iterable[Rental] = ()):
+        self.by_id: Dict[int, Rental] = {}
+        self.by_customer: Dict[int, Set[int]] = defaultdict(set)
+        # (rental_date, rental_id), oldest first.
+        self.by_age: List[Tuple[str, int]] = []
+        self._lock = threading.Lock()
+        for rental in rentals:
+            if not rental.return_date:
+                self._add(rental)
+                self.by_age.append(self._age_key(rental))
+        self.by_age.sort()
+
+    def add(self, rental: Rental) -> None:
+        with self._lock:
+            self._remove(rental.rental_id)
+            if not rental.return_date:
+                self._add(rental)
+                insort(self.by_age, self._age_key(rental))
+
+    def mark_returned(self, rental_id: int, return_date: str) -> None:
+        with self._lock:
+            self._remove(rental_id)
+
+    def _add(self, rental: Rental) -> None:
+        self.by_id[rental.rental_id] = rental
+        self.by_customer[rental.customer_id].add(rental.rental_id)
+
+    def _remove(self, rental_id: int) -> None:
+        rental = self.by_id.pop(rental_id, None)
+        if rental is None:
+            return
+        ids = self.by_customer.get(rental.customer_id)
+        if ids is not None:
+            ids.discard(rental_id)
+            if not ids:
+                del self.by_customer[rental.customer_id]
+        key = self._age_key(rental)
+        position = bisect_left(self.by_age, key)
+        if position < len(self.by_age) and self.by_age[position] == key:
+            del self.by_age[position]
+
+    @staticmethod
+    def _age_key(rental: Rental) -> Tuple[str, int]:
+        return (rental.rental_date or "", rental.rental_id)
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def count(self, customer_id: int) -> int:
+        return len(self.by_customer.get(customer_id, ()))
+
+    def overdue_count(self, customer_id: Optional[int] = None) -> int:
+        cutoff = overdue_cutoff()
+        with self._lock:
+            if customer_id is None:
+                return bisect_left(self.by_age, (cutoff,))
+            return sum(
+                1 for rental_id in self.by_customer.get(customer_id, ())
+                if (self.by_id[rental_id].rental_date or "") < cutoff
+            )
+
+    def for_customer(self, customer_id: int) -> List[Rental]:
+        with self._lock:
+            return sorted(
+                (self.by_id[i] for i in self.by_customer.get(customer_id, ())),
+                key=self._age_key,
+            )
+
+    def oldest(self, overdue: bool = False) -> "OpenRentals":
+        return OpenRentals(self, overdue_cutoff() if overdue else None)
+
+
+class OpenRentals:
+    # Sliceable, oldest-first view of the index for Paginator. With a
+    # cutoff, only the rentals taken out before it: a prefix of by_age.
+
+    def __init__(self, index: OpenRentalIndex, cutoff: Optional[str]):
+        self.index = index
+        self.cutoff = cutoff
+
+    def count(self) -> int:
+        if self.cutoff is None:
+            return len(self.index.by_age)
+        return bisect_left(self.index.by_age, (self.cutoff,))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index):
+        with self.index._lock:
+            keys = self.index.by_age[:self.count()][index]
+            if isinstance(index, slice):
+                return [self.index.by_id[rental_id] for _, rental_id in keys]
+            return self.index.by_id[keys[1]]
+
+
+def overdue_cutoff() -> str:
+    # Rentals taken out before this ISO date are overdue.
+    cutoff = datetime.now() - timedelta(days=settings.RENTAL_OVERDUE_DAYS)
+    return cutoff.isoformat(timespec="seconds")
+
+
+_live = LiveRentals(
+    OpenRentalIndex,
+    "OPEN_RENTALS_REBUILD_INTERVAL",
+    "sakila_open_rentals_build_seconds",
+)
+peek = _live.peek
+get = _live.get
+aget = _live.aget
@@ -0,0 +1,249 @@
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.utils.functional import cached_property
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+_counts: Dict[Tuple[str, str], Tuple[int, float]] = {}
+_counts_lock = threading.Lock()
+
+
+def get_cached_count(key: Tuple[str, str]) -> Optional[int]:
+    entry = _counts.get(key)
+    if entry is None or entry[1] < time.monotonic():
+        return None
+    return entry[0]
+
+
+def set_cached_count(key: Tuple[str, str], count: int) -> None:
+    with _counts_lock:
+        _counts[key] = (count, time.monotonic() + settings.API_COUNT_TTL)
+
+
+def clear_cached_counts(endpoint: Optional[str] = None) -> None:
+    with _counts_lock:
+        for key in [
+            key for key in _counts if endpoint is None or key[1] == endpoint
+        ]:
+            del _counts[key]
+
+
+class APICollection:
+    def __init__(
+        self,
+        fetch_page: Callable[[int, int], Tuple[list, Optional[int]]],
+        count_key: Tuple[str, str],
+    ):
+        self.fetch_page = fetch_page
+        self.count_key = count_key
+        self.total: Optional[int] = None
+        self._pages: Dict[int, Tuple[int, List[Any]]] = {}
+
+    def prefetch(self, offset: int, limit: int) -> List[Any]:
+        return self._store(offset, limit, *self.fetch_page(offset, limit))
+
+    async def aprefetch(self, offset: int, limit: int) -> List[Any]:
+        return self._store(offset, limit, *await self.fetch_page(offset, limit))
+
+    def _store(
+        self, offset: int, limit: int, items: List[Any], total: Optional[int]
+    ) -> List[Any]:
+        self._pages[offset] = (limit, items)
+        if total is not None:
+            self.total = total
+            set_cached_count(self.count_key, total)
+        return items
+
+    def count(self) -> int:
+        # APIPaginator only pages with a count once it knows the total.
+        if self.total is None:
+            self.total = get_cached_count(self.count_key) or 0
+        return self.total
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        offset = key.start or 0
+        limit = (key.stop if key.stop is not None else self.count()) - offset
+        if limit <= 0:
+            return []
+        fetched = self._pages.get(offset)
+        if fetched is not None and fetched[0] >= limit:
+            return fetched[1][:limit]
+        return self.prefetch(offset, limit)
+
+
+def page_window(
+    number: int, last: Optional[int], has_next: bool, size: int = 2
+) -> List[Optional[int]]:
+    # Page numbers around the current one plus the first and last pages;
+    # None marks an ellipsis. With an unknown last page the window ends at
+    # the next page.
+    end = min(last, number + size) if last else number + int(has_next)
+    numbers = [1] + list(range(max(2, number - size), end + 1))
+    if last and last > end:
+        numbers.append(last)
+    window = []
+    for num in numbers:
+        if window and num - window[-1] > 1:
+            window.append(None)
+        window.append(num)
+    if not last and has_next:
+        window.append(None)
+    return window
+
+
+class WindowedPage(Page):
+    @cached_property
+    def window(self) -> List[Optional[int]]:
+        return page_window(
+            self.number, self.paginator.num_pages, self.has_next()
+        )
+
+    @property
+    def last_number(self) -> Optional[int]:
+        return self.paginator.num_pages
+
+
+class OpenPage(WindowedPage):
+    # Page of a count-free paginator: it only knows whether there is a
+    # next page, from fetching one row more than it shows.
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    @cached_property
+    def window(self) -> List[Optional[int]]:
+        return page_window(self.number, None, self._has_next)
+
+    @property
+    def last_number(self) -> Optional[int]:
+        return None
+
+    def has_next(self) -> bool:
+        return self._has_next
+
+    def next_page_number(self) -> int:
+        return self.number + 1
+
+    def previous_page_number(self) -> int:
+        return self.number - 1
+
+    def start_index(self) -> int:
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self) -> int:
+        return self.start_index() + len(self.object_list) - 1
+
+
+class WindowedPaginator(Paginator):
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+
+class APIPaginator(WindowedPaginator):
+    # Pages a sakilaAPI collection with one request per page. The total
+    # comes with the page (see api_client.page_total); when sakilaAPI
+    # doesn't send it the page is shown as an OpenPage, so the collection
+    # is never read whole just to be counted.
+
+    def __init__(
+        self,
+        fetch_page: Callable[[int, int], Tuple[list, Optional[int]]],
+        per_page: int,
+        count_key: Tuple[str, str],
+        count_free: bool = False,
+        **kwargs,
+    ):
+        super().__init__(
+            APICollection(fetch_page, count_key),
+            per_page,
+            **kwargs,
+        )
+        self.count_free = count_free
+
+    def get_page(self, number):
+        number = _page_number(number)
+        if self.count_free:
+            return self._open_page(number)
+        collection = self.object_list
+        collection.total = get_cached_count(collection.count_key)
+        if collection.total is None:
+            # One row more than the page tells whether there is a next
+            # one if the total doesn't come with it.
+            items = collection.prefetch(
+                (number - 1) * self.per_page, self.per_page + 1
+            )
+            if collection.total is None:
+                return self._open_page(number, items)
+        return super().get_page(number)
+
+    async def aget_page(self, number):
+        # get_page() for an awaitable fetch_page: the page is fetched up
+        # front, so the Paginator code below only reads data that is
+        # already there.
+        number = _page_number(number)
+        if self.count_free:
+            return await self._aopen_page(number)
+        collection = self.object_list
+        collection.total = get_cached_count(collection.count_key)
+        if collection.total is None:
+            items = await collection.aprefetch(
+                (number - 1) * self.per_page, self.per_page + 1
+            )
+            if collection.total is None:
+                return await self._aopen_page(number, items)
+        last = max(1, math.ceil(collection.total / self.per_page))
+        number = min(number, last)
+        bottom = (number - 1) * self.per_page
+        fetched = collection._pages.get(bottom)
+        if fetched is None or fetched[0] < self.per_page:
+            await collection.aprefetch(bottom, self.per_page)
+        return super().get_page(number)
+
+    def _open_page(
+        self, number: int, items: Optional[List[Any]] = None
+    ) -> OpenPage:
+        if items is None:
+            items, _ = self.object_list.fetch_page(
+                (number - 1) * self.per_page, self.per_page + 1
+            )
+        if not items and number > 1:
+            return self._open_page(1)
+        return OpenPage(
+            items[:self.per_page],
+            number,
+            self,
+            has_next=len(items) > self.per_page,
+        )
+
+    async def _aopen_page(
+        self, number: int, items: Optional[List[Any]] = None
+    ) -> OpenPage:
+        if items is None:
+            items, _ = await self.object_list.fetch_page(
+                (number - 1) * self.per_page, self.per_page + 1
+            )
+        if not items and number > 1:
+            return await self._aopen_page(1)
+        return OpenPage(
+            items[:self.per_page],
+            number,
+            self,
+            has_next=len(items) > self.per_page,
+        )
+
+
+def _page_number(number: Any) -> int:
+    try:
+        return max(int(number), 1)
+    except (TypeError, ValueError):
+        return 1
@@ -0,0 +1,47 @@
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+
+
+# Rows coming from sakilaAPI are kept as named tuples: they have no
+# per-instance __dict__, can be shared safely through the API cache and
+# templates still read them by attribute (customer.email).
+
+
+class Customer(NamedTuple):
+    customer_id: int
+    store_id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[str] = None
+    address_id: Optional[int] = None
+    active: Optional[bool] = None
+    create_date: Optional[str] = None
+    last_update: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Customer":
+        return cls._make(map(data.get, cls._fields))
+
+
+class Rental(NamedTuple):
+    rental_id: int
+    rental_date: Optional[str] = None
+    inventory_id: Optional[int] = None
+    customer_id: Optional[int] = None
+    return_date: Optional[str] = None
+    staff_id: Optional[int] = None
+    last_update: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rental":
+        return cls._make(map(data.get, cls._fields))
+
+
+class RecordList(list):
+    # A plain list that, unlike list, accepts attributes. Search indexes
+    # are attached to the cached snapshot they were built from.
+    pass
+
+
+def load(record: type, rows: Iterable[Dict[str, Any]]) -> RecordList:
+    from_dict = record.from_dict
+    return RecordList(from_dict(row) for row in rows)
@@ -0,0 +1,288 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from api import metrics, models
+from api.records import Customer, Rental
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Local SQLite copy of the customers and rentals collections. sync() loads
+# it from sakilaAPI, the write methods of APIClient keep it up to date, and
+# the list and detail views read from it while its last sync is at most
+# REPLICA_MAX_STALENESS seconds old; otherwise they go to sakilaAPI.
+#
+# Unlike the response cache, which keeps each user's reads apart, the
+# replica is one copy for everyone: it holds what sakilaAPI returns to the
+# REPLICA_USERNAME account, and every signed-in user sees that. This is
+# only right because sakilaAPI serves the same customers and rentals to
+# every account; leave REPLICA_READS off if that ever changes.
+
+COLLECTIONS = {
+    "customers": ("/api/v1/customers", Customer, models.Customer),
+    "rentals": ("/api/v1/rentals", Rental, models.Rental),
+}
+
+BATCH_SIZE = 500
+
+
+def enabled() -> bool:
+    return settings.USE_DATABASE and settings.REPLICA_READS
+
+
+def available(*names: str) -> bool:
+    if not enabled():
+        return False
+    oldest = timezone.now() - timedelta(
+        seconds=settings.REPLICA_MAX_STALENESS
+    )
+    try:
+        fresh = models.ReplicaState.objects.filter(
+            name__in=names, synced_at__gte=oldest
+        ).count()
+    except DatabaseError:
+        fresh = 0
+    result = "replica" if fresh == len(names) else "api"
+    metrics.inc("sakila_replica_reads_total", result=result)
+    return result == "replica"
+
+
+class ReplicaRows:
+    # Sliceable view of a replica query for Paginator: the count and each
+    # page are one SQL query, and rows come back as api.records tuples.
+
+    def __init__(self, queryset, record: type):
+        self.queryset = queryset
+        self.record = record
+
+    def count(self) -> int:
+        return self.queryset.count()
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getitem__(self, index):
+        rows = self.queryset.values_list(*self.record._fields)[index]
+        if isinstance(index, slice):
+            return [self.record._make(row) for row in rows]
+        return self.record._make(rows)
+
+
+def customers(criteria: Optional[Dict[str, Any]] = None) -> ReplicaRows:
+    # Same filters and sort orders as CustomerIndex.search().
+    criteria = criteria or {}
+    queryset = models.Customer.objects.all()
+    name = criteria.get("q")
+    if name:
+        words = name.split()
+        if len(words) > 1:
+            queryset = queryset.filter(
+                first_name__istartswith=words[0],
+                last_name__istartswith=" ".join(words[1:]),
+            )
+        else:
+            queryset = queryset.filter(
+                Q(first_name__istartswith=name)
+                | Q(last_name__istartswith=name)
+            )
+    if criteria.get("email"):
+        queryset = queryset.filter(email__istartswith=criteria["email"])
+    if criteria.get("store_id") is not None:
+        queryset = queryset.filter(store_id=criteria["store_id"])
+    if criteria.get("active") is not None:
+        queryset = queryset.filter(active=criteria["active"])
+    return ReplicaRows(
+        _order(queryset, criteria.get("sort", "customer_id"), "customer_id"),
+        Customer,
+    )
+
+
+def rentals(criteria: Optional[Dict[str, Any]] = None) -> ReplicaRows:
+    # Same filters and sort orders as RentalIndex.search().
+    criteria = criteria or {}
+    queryset = models.Rental.objects.all()
+    if criteria.get("customer_id") is not None:
+        queryset = queryset.filter(customer_id=criteria["customer_id"])
+    if criteria.get("inventory_id") is not None:
+        queryset = queryset.filter(inventory_id=criteria["inventory_id"])
+    if criteria.get("status") == "outstanding":
+        queryset = queryset.filter(return_date__isnull=True)
+    elif criteria.get("status") == "returned":
+        queryset = queryset.filter(return_date__isnull=False)
+    if criteria.get("date_from"):
+        queryset = queryset.filter(rental_date__gte=criteria["date_from"])
+    if criteria.get("date_to"):
+        queryset = queryset.filter(
+            rental_date__lte=f"{criteria['date_to']}\uffff"
+        )
+    return ReplicaRows(
+        _order(queryset, criteria.get("sort", "rental_id"), "rental_id"),
+        Rental,
+    )
+
+
+def _order(queryset, sort: str, key: str):
+    # Ties keep sakilaAPI's order, reversed along with a descending sort,
+    # as in SnapshotIndex.order().
+    return queryset.order_by(sort, f"-{key}" if sort.startswith("-") else key)
+
+
+def customer(customer_id: int) -> Optional[Customer]:
+    rows = models.Customer.objects.filter(customer_id=customer_id)
+    return next(iter(ReplicaRows(rows, Customer)[:1]), None)
+
+
+def customer_rentals(customer_id: int) -> List[Rental]:
+    return rentals({"customer_id": customer_id})[:]
+
+
+def customers_by_id(ids: Iterable[int]) -> Dict[int, Customer]:
+    rows = models.Customer.objects.filter(customer_id__in=set(ids))
+    return {row.customer_id: row for row in ReplicaRows(rows, Customer)[:]}
+
+
+def write_customer(row: Dict[str, Any]) -> None:
+    _write("customers", row)
+
+
+def write_rental(row: Dict[str, Any]) -> None:
+    _write("rentals", row)
+
+
+def delete_customer(customer_id: int) -> None:
+    if not enabled():
+        return
+    try:
+        models.Customer.objects.filter(customer_id=customer_id).delete()
+    except DatabaseError:
+        mark_stale("customers")
+
+
+def mark_stale(name: str) -> None:
+    # Reads fall back to sakilaAPI until the next sync.
+    try:
+        models.ReplicaState.objects.filter(name=name).update(synced_at=None)
+    except DatabaseError:
+        pass
+
+
+def _write(name: str, row: Dict[str, Any]) -> None:
+    if not enabled():
+        return
+    _, record, model = COLLECTIONS[name]
+    key = record._fields[0]
+    fields = {
+        field: row[field]
+        for field in record._fields[1:]
+        if field in row
+    }
+    if row.get(key) is None or not fields:
+        # sakilaAPI didn't say what changed.
+        mark_stale(name)
+        return
+    try:
+        model.objects.update_or_create(**{key: row[key]}, defaults=fields)
+    except DatabaseError:
+        mark_stale(name)
+
+
+def sync(client, full: bool = False) -> Dict[str, Tuple[int, int]]:
+    return {
+        name: sync_collection(client, name, full) for name in COLLECTIONS
+    }
+
+
+def sync_collection(client, name: str, full: bool = False) -> Tuple[int, int]:
+    # Returns the number of rows written and deleted. With
+    # REPLICA_DELTA_PARAM set, only rows changed since the newest
+    # last_update are requested, and a full sync still runs every
+    # REPLICA_FULL_SYNC_INTERVAL seconds to pick up deletions. Otherwise a
+    # full sync sends the previous ETag and does nothing on a 304.
+    endpoint, record, model = COLLECTIONS[name]
+    state, _ = models.ReplicaState.objects.get_or_create(name=name)
+    started = timezone.now()
+    delta = (
+        not full
+        and settings.REPLICA_DELTA_PARAM
+        and state.high_water
+        and state.full_synced_at
+        and started - state.full_synced_at
+        < timedelta(seconds=settings.REPLICA_FULL_SYNC_INTERVAL)
+    )
+
+    if delta:
+        rows, _ = client.stream_changes(
+            endpoint,
+            record,
+            params={settings.REPLICA_DELTA_PARAM: state.high_water},
+        )
+        with transaction.atomic():
+            written = _save(model, record, rows)
+        deleted = 0
+    else:
+        rows, etag = client.stream_changes(
+            endpoint, record, etag=None if full else state.etag or None
+        )
+        written = deleted = 0
+        if rows is not None:
+            with transaction.atomic():
+                written, deleted = _replace(model, record, rows)
+            state.etag = etag or ""
+        state.full_synced_at = started
+
+    if written or deleted or not state.rows:
+        state.high_water = model.objects.aggregate(
+            high_water=Max("last_update")
+        )["high_water"] or ""
+        state.rows = model.objects.count()
+    state.synced_at = started
+    state.save()
+    return written, deleted
+
+
+def _replace(model, record: type, rows: Iterator) -> Tuple[int, int]:
+    # Diffs the full collection against the replica: only new or changed
+    # rows are written, and rows sakilaAPI no longer has are deleted.
+    existing = {
+        row[0]: row
+        for row in model.objects.values_list(*record._fields).iterator()
+    }
+    seen = set()
+
+    def changed():
+        for row in rows:
+            seen.add(row[0])
+            if existing.get(row[0]) != row:
+                yield row
+
+    written = _save(model, record, changed())
+    gone = [key for key in existing if key not in seen]
+    for start in range(0, len(gone), BATCH_SIZE):
+        model.objects.filter(
+            pk__in=gone[start:start + BATCH_SIZE]
+        ).delete()
+    return written, len(gone)
+
+
+def _save(model, record: type, rows: Iterable) -> int:
+    written = 0
+    batch = []
+    for row in rows:
+        batch.append(model(**row._asdict()))
+        if len(batch) == BATCH_SIZE:
+            written += _upsert(model, record, batch)
+            batch = []
+    if batch:
+        written += _upsert(model, record, batch)
+    return written
+
+
+def _upsert(model, record: type, batch: List) -> int:
+    model.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=[record._fields[0]],
+        update_fields=list(record._fields[1:]),
+    )
+    return len(batch)
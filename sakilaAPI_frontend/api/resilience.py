@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+from django.conf import settings
+from django.shortcuts import render
+from django.utils.deprecation import MiddlewareMixin
+from api import metrics
+
+
+class APIUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    # After `threshold` consecutive failed calls the breaker opens and every
+    # call fails fast for `reset_timeout` seconds. Then a single probe call
+    # is let through: success closes the breaker, failure re-opens it.
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started = 0.0
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        remaining = self.opened_at + self.reset_timeout - time.monotonic()
+        return max(1, round(remaining))
+
+    def check(self) -> None:
+        if self.state == self.CLOSED:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    metrics.inc("sakila_circuit_breaker_rejections_total")
+                    raise APIUnavailable("El circuito hacia sakilaAPI está abierto")
+                self.state = self.HALF_OPEN
+                self.probe_started = 0.0
+            if self.state == self.HALF_OPEN:
+                # A probe that never reported back must not block the
+                # breaker forever.
+                if now - self.probe_started < self.reset_timeout:
+                    metrics.inc("sakila_circuit_breaker_rejections_total")
+                    raise APIUnavailable("Comprobando si sakilaAPI ha vuelto")
+                self.probe_started = now
+
+    def record_success(self) -> None:
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                metrics.inc("sakila_circuit_breaker_opened_total")
+
+    def stats(self):
+        return {"state": self.state, "failures": self.failures}
+
+
+breaker = CircuitBreaker(
+    settings.API_BREAKER_THRESHOLD, settings.API_BREAKER_RESET_TIMEOUT
+)
+
+metrics.gauge(
+    "sakila_circuit_breaker_open",
+    "1 si el circuito hacia sakilaAPI de este proceso está abierto",
+    lambda: 0 if breaker.state == CircuitBreaker.CLOSED else 1,
+)
+
+
+def backoff(attempt: int) -> float:
+    # Full jitter: spread retries from concurrent workers over the window.
+    cap = settings.API_RETRY_BACKOFF * 2 ** (attempt - 1)
+    return random.uniform(0, min(cap, settings.API_RETRY_BACKOFF_MAX))
+
+
+class APIUnavailableMiddleware(MiddlewareMixin):
+    def process_exception(self, request, exception):
+        if not isinstance(exception, APIUnavailable):
+            return None
+        response = render(
+            request, "unavailable.html", {"error": exception}, status=503
+        )
+        response["Retry-After"] = str(breaker.retry_after())
+        return response
@@ -0,0 +1,409 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from django.conf import settings
+from api import metrics
+from api.records import Customer, Rental
+from typing import Any, Dict, Iterable, List, Optional, Tuple, get_type_hints
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+# Copy of the customers and rentals collections in one file per collection
+# under SHARED_SNAPSHOT_DIR, memory-mapped read-only by every worker so the
+# page cache holds a single copy. The file is column-oriented: a JSON
+# header followed by one fixed-width array per integer column and, per text
+# column, an offset array into a UTF-8 blob. Rows are sorted by primary key,
+# and only the rows of the page being shown become Python objects.
+#
+# `python manage.py refresh_shared_snapshot` (or the first worker that finds
+# it stale) rewrites a file next to the old one and swaps it in with
+# os.replace(); workers notice the new inode and map it on their next read.
+# The file's mtime is the time it was last known to be current.
+#
+# There is one snapshot for all users, not one per token like the response
+# cache: whoever refreshes it (the command's account or the signed-in user
+# whose request found it stale) reads the collections, and every user is
+# then served that copy. This relies on sakilaAPI returning the same
+# customers and rentals to every account; leave SHARED_SNAPSHOT_DIR empty
+# if it doesn't.
+
+COLLECTIONS = {
+    "customers": ("/api/v1/customers", Customer, ()),
+    "rentals": ("/api/v1/rentals", Rental, ("customer_id",)),
+}
+
+MAGIC = b"SAKSNAP1"
+_HEADER_SIZE = struct.Struct("<8sI")
+_NULL_INT = -2 ** 31
+_ALIGN = 8
+
+_COLUMN_TYPES = {
+    Optional[int]: "i",
+    int: "i",
+    Optional[bool]: "b",
+    Optional[str]: "s",
+}
+
+
+def enabled() -> bool:
+    return bool(settings.SHARED_SNAPSHOT_DIR)
+
+
+def path(name: str) -> str:
+    return os.path.join(settings.SHARED_SNAPSHOT_DIR, f"{name}.snap")
+
+
+def write(
+    target: str,
+    record: type,
+    rows: Iterable[Any],
+    etag: Optional[str] = None,
+    indexes: Iterable[str] = (),
+) -> int:
+    rows = sorted(rows, key=lambda row: row[0])
+    hints = get_type_hints(record)
+    sections: List[bytes] = []
+    offset = 0
+
+    def add(data) -> List[int]:
+        nonlocal offset
+        data = bytes(data)
+        padding = -len(data) % _ALIGN
+        sections.append(data + b"\0" * padding)
+        start = offset
+        offset += len(data) + padding
+        return [start, len(data)]
+
+    columns = []
+    for position, field in enumerate(record._fields):
+        kind = _COLUMN_TYPES[hints[field]]
+        values = [row[position] for row in rows]
+        column = {"name": field, "type": kind}
+        if kind == "i":
+            column["values"] = add(array("i", (
+                _NULL_INT if value is None else value for value in values
+            )))
+        elif kind == "b":
+            column["values"] = add(array("b", (
+                -1 if value is None else int(value) for value in values
+            )))
+        else:
+            blob = bytearray()
+            offsets = array("I", [0])
+            nulls = array("b")
+            for value in values:
+                nulls.append(value is None)
+                if value is not None:
+                    blob += value.encode("utf-8")
+                offsets.append(len(blob))
+            column["nulls"] = add(nulls)
+            column["offsets"] = add(offsets)
+            column["data"] = add(blob)
+        columns.append(column)
+
+    # Row positions ordered by another column, for lookups such as the
+    # rentals of one customer.
+    index_sections = {}
+    for field in indexes:
+        position = record._fields.index(field)
+        order = sorted(
+            range(len(rows)),
+            key=lambda row: (
+                _NULL_INT if rows[row][position] is None
+                else rows[row][position]
+            ),
+        )
+        index_sections[field] = add(array("i", order))
+
+    header = json.dumps({
+        "record": record.__name__,
+        "rows": len(rows),
+        "etag": etag,
+        "columns": columns,
+        "indexes": index_sections,
+    }).encode()
+    header += b" " * (-(len(header) + _HEADER_SIZE.size) % _ALIGN)
+
+    directory = os.path.dirname(target) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(_HEADER_SIZE.pack(MAGIC, len(header)))
+            f.write(header)
+            for section in sections:
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(rows)
+
+
+class _Column:
+    def __init__(self, view: memoryview, base: int, spec: Dict[str, Any]):
+        def section(key: str, fmt: str) -> memoryview:
+            start, length = spec[key]
+            return view[base + start:base + start + length].cast(fmt)
+
+        self.type = spec["type"]
+        if self.type == "s":
+            self.nulls = section("nulls", "b")
+            self.offsets = section("offsets", "I")
+            self.data = section("data", "B")
+        else:
+            self.values = section("values", self.type)
+
+    def __getitem__(self, row: int) -> Any:
+        if self.type == "i":
+            value = self.values[row]
+            return None if value == _NULL_INT else value
+        if self.type == "b":
+            value = self.values[row]
+            return None if value < 0 else bool(value)
+        if self.nulls[row]:
+            return None
+        return str(self.data[self.offsets[row]:self.offsets[row + 1]], "utf-8")
+
+
+class Snapshot:
+    # Sliceable, read-only view of a mapped file for Paginator. count() is
+    # read from the header and a slice only decodes the rows in it.
+
+    def __init__(self, filename: str, record: type):
+        with open(filename, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.inode = (stat.st_dev, stat.st_ino)
+        self.record = record
+        view = memoryview(self._mmap)
+        magic, size = _HEADER_SIZE.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} no es una instantánea compartida")
+        start = _HEADER_SIZE.size
+        header = json.loads(bytes(view[start:start + size]))
+        if header["record"] != record.__name__:
+            raise ValueError(f"{filename} no contiene {record.__name__}")
+        base = start + size
+        self.rows = header["rows"]
+        self.etag = header["etag"]
+        self._columns = [
+            _Column(view, base, spec) for spec in header["columns"]
+        ]
+        self._indexes = {
+            field: view[base + offset:base + offset + length].cast("i")
+            for field, (offset, length) in header["indexes"].items()
+        }
+
+    def count(self) -> int:
+        return self.rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.row(row) for row in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError(index)
+        return self.row(index)
+
+    def row(self, row: int) -> Any:
+        return self.record._make(column[row] for column in self._columns)
+
+    def get(self, key: int) -> Optional[Any]:
+        # Binary search on the primary key column, which is sorted.
+        keys = self._columns[0].values
+        row = bisect_left(keys, key)
+        if row < self.rows and keys[row] == key:
+            return self.row(row)
+        return None
+
+    def get_many(self, keys: Iterable[int]) -> Dict[int, Any]:
+        found = {}
+        for key in set(keys):
+            row = self.get(key)
+            if row is not None:
+                found[key] = row
+        return found
+
+    def where(self, field: str, value: int) -> List[Any]:
+        # Rows whose `field` equals `value`, in primary key order, through
+        # the index written for that field.
+        order = self._indexes[field]
+        values = self._columns[self.record._fields.index(field)].values
+        start = bisect_left(order, value, key=values.__getitem__)
+        rows = []
+        for row in order[start:]:
+            if values[row] != value:
+                break
+            rows.append(self.row(row))
+        return rows
+
+
+_lock = threading.Lock()
+_mapped: Dict[str, Tuple[Optional[Snapshot], float, float]] = {}
+_refreshing = set()
+
+
+def current(name: str, token: Optional[str] = None) -> Optional[Snapshot]:
+    # The mapped snapshot if its file was refreshed within
+    # SHARED_SNAPSHOT_MAX_AGE seconds. The file is only stat()ed every
+    # SHARED_SNAPSHOT_CHECK_INTERVAL seconds. When it is stale or missing
+    # and `token` is given, one worker refreshes it in the background.
+    if not enabled():
+        return None
+    now = time.time()
+    snapshot, mtime, checked = _mapped.get(name, (None, 0.0, 0.0))
+    if now - checked >= settings.SHARED_SNAPSHOT_CHECK_INTERVAL:
+        snapshot, mtime = _remap(name, snapshot)
+        _mapped[name] = (snapshot, mtime, now)
+
+    if snapshot is not None and now - mtime <= settings.SHARED_SNAPSHOT_MAX_AGE:
+        metrics.inc("sakila_shared_snapshot_reads_total", result="snapshot")
+        return snapshot
+    metrics.inc(
+        "sakila_shared_snapshot_reads_total",
+        result="missing" if snapshot is None else "stale",
+    )
+    if token:
+        schedule_refresh(name, token)
+    return None
+
+
+def _remap(
+    name: str, snapshot: Optional[Snapshot]
+) -> Tuple[Optional[Snapshot], float]:
+    try:
+        stat = os.stat(path(name))
+    except FileNotFoundError:
+        return None, 0.0
+    if snapshot is None or snapshot.inode != (stat.st_dev, stat.st_ino):
+        # The old mapping is released once no request uses it.
+        try:
+            snapshot = Snapshot(path(name), COLLECTIONS[name][1])
+        except (OSError, ValueError):
+            return None, 0.0
+    return snapshot, stat.st_mtime
+
+
+def _fresh(name: str) -> bool:
+    # Another worker may have refreshed the file while this one waited.
+    try:
+        mtime = os.stat(path(name)).st_mtime
+    except OSError:
+        return False
+    return time.time() - mtime <= settings.SHARED_SNAPSHOT_MAX_AGE
+
+
+def invalidate(endpoints: Iterable[str]) -> None:
+    # After a write to one of the collections its file stays current for
+    # at most SHARED_SNAPSHOT_WRITE_STALENESS more seconds. The snapshot is
+    # still served until then, and every write in that window is picked up
+    # by the same refresh instead of each one forcing a new download.
+    if not enabled():
+        return
+    expires = (
+        time.time()
+        - settings.SHARED_SNAPSHOT_MAX_AGE
+        + settings.SHARED_SNAPSHOT_WRITE_STALENESS
+    )
+    for name, (endpoint, _, _) in COLLECTIONS.items():
+        if endpoint not in endpoints:
+            continue
+        try:
+            if os.stat(path(name)).st_mtime > expires:
+                os.utime(path(name), (expires, expires))
+        except OSError:
+            continue
+        snapshot, mtime, checked = _mapped.get(name, (None, 0.0, 0.0))
+        if snapshot is not None:
+            _mapped[name] = (snapshot, min(mtime, expires), checked)
+
+
+def refresh(client, name: str, full: bool = False) -> Optional[int]:
+    # Rewrites the file from sakilaAPI and returns the number of rows, or
+    # None if the collection hasn't changed since the file was written.
+    endpoint, record, indexes = COLLECTIONS[name]
+    target = path(name)
+    etag = None
+    if not full:
+        try:
+            etag = Snapshot(target, record).etag
+        except (OSError, ValueError):
+            pass
+    rows, etag = client.stream_changes(endpoint, record, etag=etag)
+    if rows is None:
+        os.utime(target)
+        return None
+    return write(target, record, rows, etag, indexes)
+
+
+def schedule_refresh(name: str, token: str) -> None:
+    from api.api_client import APIClient, get_background_executor
+
+    with _lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def run():
+        try:
+            with _refresh_lock(name) as acquired:
+                if acquired and not _fresh(name):
+                    refresh(APIClient(token), name)
+                    metrics.inc(
+                        "sakila_shared_snapshot_refresh_total", result="ok"
+                    )
+        except Exception:
+            metrics.inc(
+                "sakila_shared_snapshot_refresh_total", result="error"
+            )
+        finally:
+            _mapped.pop(name, None)
+            with _lock:
+                _refreshing.discard(name)
+
+    get_background_executor().submit(run)
+
+
+class _refresh_lock:
+    # Non-blocking lock file shared by every worker, so only one of them
+    # downloads a collection at a time. Without fcntl (Windows) the lock is
+    # per process.
+
+    def __init__(self, name: str):
+        self.filename = f"{path(name)}.lock"
+        self.file = None
+
+    def __enter__(self) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        self.file = open(self.filename, "a")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.file.close()
+            self.file = None
+            return False
+        return True
+
+    def __exit__(self, *exc_info) -> None:
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
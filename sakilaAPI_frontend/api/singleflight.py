@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from api import metrics
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    # Concurrent callers asking for the same key share one execution of
+    # `fetch`: the first one runs it, the rest wait for its result. A
+    # follower that waits longer than `timeout` runs `fetch` itself.
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(
+        self, key: Hashable, fetch: Callable[[], Any], timeout: float
+    ) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if not call.done.wait(timeout):
+                metrics.inc("sakila_coalesce_timeouts_total")
+                return fetch()
+            metrics.record_cache("coalesced")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    # SingleFlight for coroutines. Calls are tracked per event loop, since a
+    # future can only be awaited from the loop that created it.
+
+    def __init__(self):
+        self._calls: Dict[Tuple[Any, Hashable], asyncio.Future] = {}
+
+    async def do(
+        self,
+        key: Hashable,
+        fetch: Callable[[], Awaitable[Any]],
+        timeout: float,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        slot = (loop, key)
+        future = self._calls.get(slot)
+        if future is not None:
+            try:
+                result = await asyncio.wait_for(
+                    asyncio.shield(future), timeout
+                )
+            except asyncio.TimeoutError:
+                metrics.inc("sakila_coalesce_timeouts_total")
+                return await fetch()
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The leader was cancelled, not us.
+                return await fetch()
+            metrics.record_cache("coalesced")
+            return result
+
+        future = self._calls[slot] = loop.create_future()
+        try:
+            result = await fetch()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody may be waiting; don't log it as never retrieved.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[slot]
+
+
+inflight = SingleFlight()
+ainflight = AsyncSingleFlight()
@@ -0,0 +1,176 @@
+// Partial updates for the list pages. Views return only the table rows
+// when the request carries "X-Fragment: 1" (see render_list in views.py).
+//
+// * tbody[data-next-page]: "Cargar más" appends the next page of rows,
+//   automatically when the button scrolls into view. The rows are fetched
+//   ahead of time once the button gets within a couple of screens, so
+//   pages nobody scrolls to are never requested. Without JavaScript the
+//   regular pagination stays.
+// * form[data-fragment]: the return button posts in the background and
+//   replaces its row with the updated one ("row") or removes it
+//   ("remove"), so the list keeps its place. A failed post is not sent
+//   again, since it may have been applied; the error is shown instead.
+
+(() => {
+    const fragmentHeaders = { 'X-Fragment': '1' };
+
+    async function fetchRows(url) {
+        const response = await fetch(url, {
+            headers: fragmentHeaders,
+            credentials: 'same-origin',
+        });
+        if (!response.ok || response.redirected) {
+            throw new Error(response.url);
+        }
+        return {
+            html: await response.text(),
+            next: response.headers.get('X-Next-Page') || '',
+        };
+    }
+
+    function parseRows(html) {
+        const template = document.createElement('template');
+        template.innerHTML = `<table><tbody>${html}</tbody></table>`;
+        return Array.from(template.content.querySelectorAll('tbody > tr'));
+    }
+
+    function showError(text) {
+        // Same markup as the messages in base.html.
+        const notification = document.createElement('div');
+        notification.className = 'notification is-danger';
+        const close = document.createElement('button');
+        close.className = 'delete';
+        close.addEventListener('click', () => notification.remove());
+        const paragraph = document.createElement('p');
+        paragraph.textContent = text;
+        notification.append(close, paragraph);
+        document.querySelector('.container').prepend(notification);
+        window.scrollTo({ top: 0 });
+    }
+
+    function setupLoadMore(tbody) {
+        const button = document.querySelector('[data-load-more]');
+        const pagination = document.querySelector('nav.pagination');
+        let next = tbody.dataset.nextPage;
+        let prefetched = null;
+        let loading = false;
+
+        if (!button || !next) {
+            return;
+        }
+        button.classList.remove('is-hidden');
+        if (pagination) {
+            pagination.classList.add('is-hidden');
+        }
+
+        const prefetch = () => {
+            if (prefetched || !next) {
+                return;
+            }
+            const request = fetchRows(next);
+            prefetched = request;
+            // A failed prefetch is retried when the rows are needed.
+            request.catch(() => {
+                if (prefetched === request) {
+                    prefetched = null;
+                }
+            });
+        };
+
+        const load = async () => {
+            if (loading || !next) {
+                return;
+            }
+            loading = true;
+            button.classList.add('is-loading');
+            try {
+                const request = prefetched || fetchRows(next);
+                prefetched = null;
+                const page = await request;
+                tbody.append(...parseRows(page.html));
+                next = page.next;
+            } catch (error) {
+                // Fall back to a full page load.
+                window.location.href = next;
+                return;
+            } finally {
+                loading = false;
+                button.classList.remove('is-loading');
+            }
+            for (const observer of observers) {
+                // Observing again reports where the button is now, in case
+                // the new rows did not push it out of range.
+                observer.unobserve(button);
+                if (next) {
+                    observer.observe(button);
+                }
+            }
+            if (!next) {
+                button.classList.add('is-hidden');
+            }
+        };
+
+        const whenNear = (callback, rootMargin) => {
+            const observer = new IntersectionObserver((entries) => {
+                if (entries.some((entry) => entry.isIntersecting)) {
+                    callback();
+                }
+            }, { rootMargin });
+            observer.observe(button);
+            return observer;
+        };
+
+        button.addEventListener('click', load);
+        const observers = [
+            whenNear(prefetch, '1200px'),
+            whenNear(load, '400px'),
+        ];
+    }
+
+    async function submitRowAction(event) {
+        const form = event.target.closest('form[data-fragment]');
+        if (!form) {
+            return;
+        }
+        event.preventDefault();
+        const row = form.closest('tr');
+        const button = form.querySelector('button');
+        button.classList.add('is-loading');
+        let response;
+        try {
+            response = await fetch(form.action, {
+                method: 'POST',
+                body: new FormData(form),
+                headers: fragmentHeaders,
+                credentials: 'same-origin',
+            });
+        } catch (error) {
+            button.classList.remove('is-loading');
+            showError('No se ha podido contactar con el servidor. Recarga la página para ver si la reserva se ha devuelto.');
+            return;
+        }
+        if (response.redirected) {
+            // Error messages and the login page come as redirects.
+            window.location.href = response.url;
+            return;
+        }
+        if (!response.ok) {
+            button.classList.remove('is-loading');
+            showError(`Error ${response.status}: no se ha podido devolver la reserva.`);
+            return;
+        }
+        if (form.dataset.fragment === 'remove') {
+            row.remove();
+        } else {
+            row.replaceWith(...parseRows(await response.text()));
+        }
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        const tbody = document.querySelector('tbody[data-next-page]');
+        if (tbody && 'IntersectionObserver' in window) {
+            setupLoadMore(tbody);
+        }
+        document.addEventListener('submit', submitRowAction);
+    });
+})();
@@ -0,0 +1,94 @@
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, List
+
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+class JSONArrayParser:
+    # Push parser for a top-level JSON array: feed() takes the next chunk of
+    # bytes and returns the items completed by it, so only the item being
+    # parsed has to be held in memory. Shared by the sync and async clients.
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self.done = False
+
+    def feed(self, chunk: bytes, final: bool = False) -> List[Any]:
+        if self.done:
+            return []
+        self._buffer = self._buffer[self._pos:] + self._text.decode(
+            chunk, final=final
+        )
+        self._pos = 0
+        return self._drain(final)
+
+    def _drain(self, eof: bool) -> List[Any]:
+        buffer = self._buffer
+        pos = self._pos
+        items = []
+        while True:
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError("Unexpected end of JSON array")
+                break
+
+            char = buffer[pos]
+            if not self._started:
+                if char != "[":
+                    raise ValueError("Expected a JSON array")
+                self._started = True
+                pos += 1
+                continue
+            if char == "]":
+                self.done = True
+                break
+            if char == ",":
+                pos += 1
+                continue
+
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                break
+            if end == len(buffer) or buffer[end] not in _DELIMITERS:
+                # A number such as "12" or "-500." may continue in the next
+                # chunk; wait until the value is followed by a delimiter.
+                if not eof:
+                    break
+                if end != len(buffer):
+                    raise ValueError("Invalid JSON array item")
+            pos = end
+            items.append(item)
+        self._pos = pos
+        return items
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    parser = JSONArrayParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            return
+    yield from parser.feed(b"", final=True)
+
+
+async def aiter_json_array(chunks: AsyncIterable[bytes]) -> AsyncIterator[Any]:
+    parser = JSONArrayParser()
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+        if parser.done:
+            return
+    for item in parser.feed(b"", final=True):
+        yield item
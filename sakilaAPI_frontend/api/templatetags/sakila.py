@@ -0,0 +1,57 @@
+from datetime import datetime
+from functools import lru_cache
+from django import template
+
+register = template.Library()
+
+
+@lru_cache(maxsize=8192)
+def _format_iso(iso_string):
+    # Fast path for the "YYYY-MM-DDTHH:MM..." strings sakilaAPI sends
+    if (
+        len(iso_string) >= 16
+        and iso_string[4] == "-"
+        and iso_string[7] == "-"
+        and iso_string[10] in "T "
+        and iso_string[13] == ":"
+        and iso_string[:4].isdigit()
+        and iso_string[5:7].isdigit()
+        and iso_string[8:10].isdigit()
+        and iso_string[11:13].isdigit()
+        and iso_string[14:16].isdigit()
+        and "01" <= iso_string[5:7] <= "12"
+        and "01" <= iso_string[8:10] <= "31"
+        and "00" <= iso_string[11:13] <= "23"
+        and "00" <= iso_string[14:16] <= "59"
+    ):
+        return (
+            f"{iso_string[8:10]}/{iso_string[5:7]}/{iso_string[:4]} "
+            f"{iso_string[11:16]}"
+        )
+    try:
+        dt = datetime.fromisoformat(iso_string.replace("Z", "+00:00"))
+    except ValueError:
+        return iso_string
+    return dt.strftime("%d/%m/%Y %H:%M")
+
+
+@register.filter
+def format_datetime(value):
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%d/%m/%Y %H:%M")
+    if not isinstance(value, str):
+        return value
+    return _format_iso(value)
+
+
+@register.filter
+def format_date(value):
+    # "YYYY-MM-DD" as DD/MM/YYYY.
+    if not value:
+        return None
+    value = str(value)
+    if len(value) >= 10 and value[4] == "-" and value[7] == "-":
+        return f"{value[8:10]}/{value[5:7]}/{value[:4]}"
+    return value
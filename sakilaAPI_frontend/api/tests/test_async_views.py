@@ -0,0 +1,93 @@
+import asyncio
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import path, reverse
+
+from api import async_views, dashboard, metrics, shared_snapshot, urls
+from api.tests.utils import StubAPIMixin
+
+# The project's URLs with the async views, as with API_ASYNC_VIEWS=True.
+urlpatterns = [
+    path(
+        str(pattern.pattern),
+        getattr(async_views, pattern.callback.__name__, pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in urls.urlpatterns
+]
+
+
+def on_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def spy(function, calls):
+    def wrapper(*args, **kwargs):
+        calls.append(on_loop())
+        return function(*args, **kwargs)
+    return wrapper
+
+
+@override_settings(ROOT_URLCONF="api.tests.test_async_views")
+class AsyncViewTests(StubAPIMixin, SimpleTestCase):
+    async def login(self):
+        response = await self.async_client.post(
+            reverse("login"), {"username": "test", "password": "test"}
+        )
+        self.assertRedirects(
+            response, reverse("home"), fetch_redirect_response=False
+        )
+
+    async def test_rentals_list(self):
+        await self.login()
+        response = await self.async_client.get(
+            reverse("rentals_list"), {"page": 2}
+        )
+        rentals = response.context["rentals"]
+        self.assertEqual(rentals.paginator.count, 200)
+        self.assertEqual(
+            [rental.rental_id for rental in rentals], list(range(51, 101))
+        )
+
+    async def test_templates_render_off_the_event_loop(self):
+        await self.login()
+        calls = []
+        with mock.patch(
+            "api.metrics.django_render", spy(metrics.django_render, calls)
+        ):
+            response = await self.async_client.get(reverse("customers_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calls, [False])
+
+    async def test_dashboard_is_built_off_the_event_loop(self):
+        await self.login()
+        calls = []
+        with mock.patch.object(
+            dashboard._live, "build", spy(dashboard._live.build, calls)
+        ):
+            response = await self.async_client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(calls, [False])
+        self.assertEqual(response.context["stats"]["total"], 200)
+
+    async def test_snapshot_is_read_off_the_event_loop(self):
+        await self.login()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        calls = []
+        with override_settings(
+            SHARED_SNAPSHOT_DIR=directory.name,
+            SHARED_SNAPSHOT_CHECK_INTERVAL=0,
+        ), mock.patch.object(
+            shared_snapshot, "_remap", spy(shared_snapshot._remap, calls)
+        ), mock.patch.object(shared_snapshot, "schedule_refresh"):
+            response = await self.async_client.get(reverse("rentals_list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(calls)
+        self.assertNotIn(True, calls)
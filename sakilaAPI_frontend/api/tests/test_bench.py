@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase
+
+from api.bench.runner import percentile, run_scenario
+from api.tests.utils import StubAPIMixin
+
+
+class PercentileTests(SimpleTestCase):
+    def test_empty(self):
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_single_value(self):
+        self.assertEqual(percentile([3.0], 50), 3.0)
+        self.assertEqual(percentile([3.0], 99), 3.0)
+
+    def test_nearest_rank(self):
+        values = [float(value) for value in range(100, 0, -1)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 95), 95.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile(values, 100), 100.0)
+
+    def test_bounds(self):
+        values = [1.0, 2.0, 3.0]
+        self.assertEqual(percentile(values, 0), 1.0)
+        self.assertEqual(percentile(values, 150), 3.0)
+
+
+class RunScenarioTests(StubAPIMixin, SimpleTestCase):
+    def test_customers_list(self):
+        result = run_scenario("customers_list", concurrency=2, requests=6)
+        self.assertEqual(result["requests"], 6)
+        self.assertEqual(result["errors"], 0, result["error_samples"])
+        latency = result["latency_ms"]
+        self.assertLessEqual(latency["p50"], latency["p95"])
+        self.assertLessEqual(latency["p95"], latency["p99"])
+        self.assertGreater(result["throughput_rps"], 0)
+        self.assertIsNotNone(result["upstream_calls_per_request"])
+
+    def test_writes_reach_the_stub(self):
+        rentals = len(self.api.rentals)
+        result = run_scenario("rental_create", concurrency=1, requests=3)
+        self.assertEqual(result["errors"], 0, result["error_samples"])
+        self.assertEqual(len(self.api.rentals), rentals + 3)
+
+    def test_failures_are_counted(self):
+        self.api.customers.clear()
+        self.api.changed()
+        result = run_scenario("customer_detail", concurrency=1, requests=2)
+        self.assertEqual(result["errors"], 2)
+        self.assertIn("/customers/", result["error_samples"][0])
+
+    def test_same_seed_same_requests(self):
+        run_scenario("rental_detail", concurrency=1, requests=4, seed=3)
+        first = self.api.calls
+        self.reset()
+        run_scenario("rental_detail", concurrency=1, requests=4, seed=3)
+        self.assertEqual(self.api.calls, 2 * first)
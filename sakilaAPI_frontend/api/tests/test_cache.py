@@ -0,0 +1,88 @@
+from django.test import SimpleTestCase
+
+from api.api_client import APIClient
+from api.cache import ResponseCache, make_key, response_cache
+from api.tests.utils import StubAPIMixin
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(ttl=60, max_bytes=10)
+        a, b, c = (make_key("s", endpoint) for endpoint in "abc")
+        cache.set(a, "A", 4)
+        cache.set(b, "B", 4)
+        cache.get(a)
+        cache.set(c, "C", 4)
+        self.assertIsNone(cache.get(b))
+        self.assertEqual(cache.get(a).payload, "A")
+        self.assertEqual(cache.get(c).payload, "C")
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.size, 8)
+
+    def test_replacing_an_entry_keeps_the_size(self):
+        cache = ResponseCache(ttl=60, max_bytes=10)
+        key = make_key("s", "a")
+        cache.set(key, "A", 4)
+        cache.set(key, "AA", 6)
+        self.assertEqual(cache.size, 6)
+        self.assertEqual(cache.evictions, 0)
+
+    def test_oversized_entry_is_not_stored(self):
+        cache = ResponseCache(ttl=60, max_bytes=10)
+        cache.set(make_key("s", "a"), "A", 11)
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_peek_leaves_counters_and_order(self):
+        cache = ResponseCache(ttl=60, max_bytes=8)
+        a, b, c = (make_key("s", endpoint) for endpoint in "abc")
+        cache.set(a, "A", 4)
+        cache.set(b, "B", 4)
+        self.assertEqual(cache.peek(a).payload, "A")
+        cache.set(c, "C", 4)
+        self.assertIsNone(cache.peek(a))
+        self.assertEqual(cache.hits + cache.misses, 0)
+
+    def test_expired_entries_are_not_peeked(self):
+        cache = ResponseCache(ttl=60, max_bytes=100)
+        key = make_key("s", "a")
+        cache.set(key, "A", 1)
+        cache.get(key).expires = 0
+        self.assertIsNone(cache.peek(key))
+
+    def test_invalidate_by_endpoint_and_prefix(self):
+        cache = ResponseCache(ttl=60, max_bytes=100)
+        for endpoint in ("/c", "/c/1", "/r", "/r/customer/1"):
+            cache.set(make_key("s", endpoint), endpoint, 1)
+        cache.invalidate(endpoints=["/c"], prefixes=["/r/customer/"])
+        self.assertEqual(cache.stats()["entries"], 2)
+        self.assertIsNotNone(cache.peek(make_key("s", "/c/1")))
+        self.assertIsNotNone(cache.peek(make_key("s", "/r")))
+
+
+class CachedClientTests(StubAPIMixin, SimpleTestCase):
+    def test_reads_are_cached_per_user(self):
+        client = APIClient("first")
+        client.get_customer(1)
+        calls = self.api.calls
+        client.get_customer(1)
+        self.assertEqual(self.api.calls, calls)
+
+        APIClient("second").get_customer(1)
+        self.assertEqual(self.api.calls, calls + 1)
+
+    def test_writes_invalidate_the_cached_reads(self):
+        client = APIClient("first")
+        customer_id = client.get_customers()[0].customer_id
+        before = len(client.get_customer_rentals(customer_id))
+        client.get_rentals()
+        client.create_rental({
+            "inventory_id": 1,
+            "customer_id": customer_id,
+            "staff_id": 1,
+        })
+        self.assertIsNone(
+            response_cache.peek(make_key(client.scope, "/api/v1/rentals"))
+        )
+        self.assertEqual(
+            len(client.get_customer_rentals(customer_id)), before + 1
+        )
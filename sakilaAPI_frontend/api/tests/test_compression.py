@@ -0,0 +1,100 @@
+import asyncio
+import gzip
+import zlib
+
+import brotli
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api.compression import CompressionMiddleware
+from api.tests.utils import StubAPIMixin
+
+PAGE = ("<p>" + "fila de la tabla " * 200 + "</p>").encode()
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    def process(self, response, encoding="gzip, br"):
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING=encoding)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_brotli_preferred(self):
+        response = self.process(HttpResponse(PAGE))
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        content = brotli.decompress(response.content)
+        # HTML gets a random-length comment against BREACH.
+        self.assertTrue(content.startswith(PAGE))
+        self.assertEqual(
+            response["Content-Length"], str(len(response.content))
+        )
+
+    def test_gzip(self):
+        response = self.process(HttpResponse(PAGE), encoding="gzip")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), PAGE)
+
+    def test_left_alone(self):
+        cases = [
+            (HttpResponse(b"corta"), "gzip"),
+            (HttpResponse(PAGE, content_type="image/png"), "gzip"),
+            (HttpResponse(PAGE), "identity"),
+        ]
+        for response, encoding in cases:
+            response = self.process(response, encoding)
+            self.assertFalse(response.has_header("Content-Encoding"))
+        with override_settings(COMPRESS_RESPONSES=False):
+            response = self.process(HttpResponse(PAGE))
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_etag_becomes_weak(self):
+        response = HttpResponse(PAGE)
+        response["ETag"] = '"v1"'
+        self.assertEqual(self.process(response)["ETag"], 'W/"v1"')
+
+    def test_streamed_chunks_are_flushed(self):
+        rows = [f"{i},fila\n" for i in range(50)]
+        response = self.process(
+            StreamingHttpResponse(iter(rows), content_type="text/csv"),
+            encoding="gzip",
+        )
+        chunks = iter(response.streaming_content)
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        # The first row can be decoded before the rest is produced.
+        self.assertEqual(decoder.decompress(next(chunks)), rows[0].encode())
+        rest = b"".join(decoder.decompress(chunk) for chunk in chunks)
+        self.assertEqual(rows[0].encode() + rest, "".join(rows).encode())
+
+    def test_async_stream(self):
+        async def rows():
+            for i in range(20):
+                yield f'{{"id": {i}}}\n'
+
+        response = self.process(
+            StreamingHttpResponse(
+                rows(), content_type="application/x-ndjson"
+            ),
+            encoding="br",
+        )
+
+        async def read():
+            return b"".join([
+                chunk async for chunk in response.streaming_content
+            ])
+
+        self.assertEqual(
+            brotli.decompress(asyncio.run(read())).decode().count("\n"), 20
+        )
+
+
+class CompressedViewTests(StubAPIMixin, SimpleTestCase):
+    def test_list_page(self):
+        self.login()
+        response = self.client.get(
+            reverse("customers_list"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn(
+            self.api.customers[1]["email"],
+            gzip.decompress(response.content).decode(),
+        )
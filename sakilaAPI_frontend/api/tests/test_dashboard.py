@@ -0,0 +1,78 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.dashboard import RentalStats
+from api.tests.utils import StubAPIMixin, rental
+
+
+class RentalStatsTests(SimpleTestCase):
+    def setUp(self):
+        self.stats = RentalStats([
+            rental(1, customer_id=1, rental_date="2005-05-24T00:00:00"),
+            rental(2, customer_id=2, rental_date="2005-05-25T00:00:00",
+                   return_date="2005-05-27T00:00:00"),
+        ])
+
+    def test_summary(self):
+        summary = self.stats.summary()
+        self.assertEqual(summary["total"], 2)
+        self.assertEqual(summary["open"], 1)
+        self.assertEqual(summary["average_days"], 2)
+        self.assertEqual(
+            [day[:2] for day in summary["per_day"]],
+            [("2005-05-24", 1), ("2005-05-25", 1)],
+        )
+
+    def test_add_and_return(self):
+        self.stats.summary()
+        self.stats.add(rental(3, customer_id=2,
+                              rental_date="2005-05-26T00:00:00"))
+        summary = self.stats.summary()
+        self.assertEqual((summary["total"], summary["open"]), (3, 2))
+        self.assertEqual(summary["top_customers"][0], (2, 2))
+
+        self.stats.mark_returned(3, "2005-05-28T00:00:00")
+        self.stats.mark_returned(1, "2005-05-26T00:00:00")
+        summary = self.stats.summary()
+        self.assertEqual(summary["open"], 0)
+        self.assertEqual(summary["average_days"], 2)
+
+    def test_replayed_writes_are_ignored(self):
+        row = rental(3, rental_date="2005-05-26T00:00:00")
+        self.stats.add(row)
+        self.stats.add(row)
+        self.stats.add(rental(1))
+        self.assertEqual(self.stats.total, 3)
+
+        self.stats.mark_returned(2, "2005-06-01T00:00:00")
+        self.stats.mark_returned(3, "2005-05-27T00:00:00")
+        self.stats.mark_returned(3, "2005-05-28T00:00:00")
+        self.assertEqual(self.stats.returned_count, 2)
+        self.assertEqual(self.stats.open_count, 1)
+
+
+class HomeDashboardTests(StubAPIMixin, SimpleTestCase):
+    def test_dashboard(self):
+        self.login()
+        response = self.client.get(reverse("home"))
+        stats = response.context["stats"]
+        self.assertEqual(stats["total"], 200)
+        self.assertEqual(
+            stats["open"],
+            sum(
+                row["return_date"] is None
+                for row in self.api.rentals.values()
+            ),
+        )
+        counts = {}
+        for row in self.api.rentals.values():
+            counts[row["customer_id"]] = counts.get(row["customer_id"], 0) + 1
+        customer, top_id, count = response.context["top_customers"][0]
+        self.assertEqual(count, max(counts.values()))
+        self.assertEqual(customer.customer_id, top_id)
+
+    def test_anonymous_home_has_no_dashboard(self):
+        response = self.client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("stats", response.context)
+        self.assertEqual(self.api.calls, 0)
@@ -0,0 +1,64 @@
+import csv
+import io
+import json
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.records import Customer, Rental
+from api.tests.utils import StubAPIMixin
+
+
+class ExportViewTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def download(self, name, **params):
+        response = self.client.get(reverse(name), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_customers_csv(self):
+        response, body = self.download("customers_export")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn(
+            'filename="clientes.csv"', response["Content-Disposition"]
+        )
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(tuple(rows[0]), Customer._fields)
+        self.assertEqual(
+            [int(row[0]) for row in rows[1:]], list(self.api.customers)
+        )
+
+    def test_rentals_ndjson(self):
+        response, body = self.download("rentals_export", format="ndjson")
+        self.assertTrue(
+            response["Content-Type"].startswith("application/x-ndjson")
+        )
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), len(self.api.rentals))
+        self.assertEqual(set(rows[0]), set(Rental._fields))
+
+    def test_filters_apply_to_the_export(self):
+        _, body = self.download("rentals_export", format="ndjson",
+                                customer_id=3)
+        self.assertEqual(
+            {json.loads(line)["customer_id"] for line in body.splitlines()},
+            {3},
+        )
+
+    def test_unsupported_format(self):
+        calls = self.api.calls
+        response = self.client.get(reverse("customers_export"),
+                                   {"format": "xlsx"})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.api.calls, calls)
+
+    def test_requires_login(self):
+        self.client.get(reverse("logout"))
+        response = self.client.get(reverse("rentals_export"))
+        self.assertRedirects(
+            response, reverse("login"), fetch_redirect_response=False
+        )
@@ -0,0 +1,90 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.api_client import APIClient, get_background_executor, get_executor
+from api.tests.utils import StubAPIMixin
+
+
+class GatherTests(SimpleTestCase):
+    def setUp(self):
+        self.client = APIClient("token")
+
+    def test_no_calls(self):
+        self.assertEqual(self.client.gather(), [])
+
+    def test_calls_run_concurrently_in_order(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def call(value):
+            barrier.wait()
+            return value
+
+        results = self.client.gather(*(partial(call, i) for i in range(3)))
+        self.assertEqual(results, [0, 1, 2])
+
+    def test_exceptions(self):
+        error = ValueError("boom")
+
+        def fail():
+            raise error
+
+        with self.assertRaises(ValueError):
+            self.client.gather(lambda: 1, fail)
+        self.assertEqual(
+            self.client.gather(fail, lambda: 2, return_exceptions=True),
+            [error, 2],
+        )
+
+    def test_nested_gather_does_not_wait_for_the_pool(self):
+        pool = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        results = []
+
+        def inner():
+            return self.client.gather(lambda: "a", lambda: "b")
+
+        def outer():
+            results.append(self.client.gather(lambda: 0, inner))
+
+        with mock.patch("api.api_client.get_executor", return_value=pool):
+            thread = threading.Thread(target=outer, daemon=True)
+            thread.start()
+            thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(results, [[0, ["a", "b"]]])
+
+    def test_background_work_has_its_own_pool(self):
+        self.assertIsNot(get_background_executor(), get_executor())
+
+
+class CustomerDetailTests(StubAPIMixin, SimpleTestCase):
+    def test_requires_login(self):
+        response = self.client.get(reverse("customer_detail", args=[5]))
+        self.assertRedirects(
+            response, reverse("login"), fetch_redirect_response=False
+        )
+
+    def test_customer_and_rentals(self):
+        self.login()
+        response = self.client.get(reverse("customer_detail", args=[5]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["customer"].customer_id, 5)
+        self.assertEqual(
+            sorted(rental.rental_id for rental in response.context["rentals"]),
+            sorted(row["rental_id"] for row in self.api.customer_rentals(5)),
+        )
+        self.assertContains(response, self.api.customers[5]["email"])
+        # The customer and the rentals are read in parallel.
+        self.assertIn('desc="2 calls"', response["Server-Timing"])
+
+    def test_missing_customer(self):
+        self.login()
+        response = self.client.get(reverse("customer_detail", args=[999]))
+        self.assertRedirects(
+            response, reverse("customers_list"), fetch_redirect_response=False
+        )
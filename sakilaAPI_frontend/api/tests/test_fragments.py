@@ -0,0 +1,88 @@
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.tests.utils import StubAPIMixin
+
+FRAGMENT = {"HTTP_X_FRAGMENT": "1"}
+
+
+class ListFragmentTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_rows_and_next_page(self):
+        response = self.client.get(
+            reverse("rentals_list"), {"page": 2}, **FRAGMENT
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "rentals/_rows.html")
+        self.assertTemplateNotUsed(response, "rentals/list.html")
+        self.assertNotIn(b"<html", response.content)
+        self.assertEqual(response.content.count(b"<tr"), 50)
+        self.assertEqual(response["X-Next-Page"], "?page=3")
+        self.assertIn("X-Fragment", response["Vary"])
+
+    def test_customer_rows(self):
+        response = self.client.get(reverse("customers_list"), **FRAGMENT)
+        self.assertTemplateUsed(response, "customers/_rows.html")
+        self.assertEqual(response.content.count(b"<tr"), 30)
+        self.assertNotIn("X-Next-Page", response)
+
+    def test_next_page_keeps_the_filters(self):
+        response = self.client.get(
+            reverse("rentals_list"), {"sort": "-rental_date"}, **FRAGMENT
+        )
+        self.assertEqual(
+            response["X-Next-Page"], "?sort=-rental_date&page=2"
+        )
+
+    def test_last_page(self):
+        response = self.client.get(
+            reverse("rentals_list"), {"page": 4}, **FRAGMENT
+        )
+        self.assertEqual(response.content.count(b"<tr"), 50)
+        self.assertNotIn("X-Next-Page", response)
+
+    def test_full_page_without_the_header(self):
+        response = self.client.get(reverse("rentals_list"))
+        self.assertTemplateUsed(response, "rentals/list.html")
+        self.assertNotIn("X-Next-Page", response)
+        self.assertIn("X-Fragment", response["Vary"])
+
+
+class RentalReturnTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+        self.rental_id = next(
+            rental_id for rental_id, row in self.api.rentals.items()
+            if row["return_date"] is None
+        )
+        self.url = reverse("rental_return", args=[self.rental_id])
+
+    def test_fragment(self):
+        response = self.client.post(self.url, **FRAGMENT)
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, "rentals/_row.html")
+        self.assertEqual(response.content.count(b"<tr"), 1)
+        self.assertEqual(response.context["rental"].rental_id, self.rental_id)
+        self.assertIsNotNone(response.context["rental"].return_date)
+        self.assertIsNotNone(self.api.rentals[self.rental_id]["return_date"])
+
+    def test_redirect_without_the_header(self):
+        response = self.client.post(self.url)
+        self.assertRedirects(
+            response,
+            reverse("rental_detail", args=[self.rental_id]),
+            fetch_redirect_response=False,
+        )
+        self.assertIsNotNone(self.api.rentals[self.rental_id]["return_date"])
+
+    def test_anonymous(self):
+        self.client.logout()
+        response = self.client.post(self.url, **FRAGMENT)
+        self.assertRedirects(
+            response, reverse("login"), fetch_redirect_response=False
+        )
+        self.assertIsNone(self.api.rentals[self.rental_id]["return_date"])
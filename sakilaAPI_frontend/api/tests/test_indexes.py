@@ -0,0 +1,56 @@
+from django.test import SimpleTestCase
+
+from api.indexes import CustomerIndex, RentalIndex
+from api.records import Customer, RecordList
+from api.tests.utils import rental
+
+
+class SearchIndexTests(SimpleTestCase):
+    customers = RecordList([
+        Customer(1, 1, "MARY", "SMITH", "mary.smith@x.org", active=True),
+        Customer(2, 2, "Patricia", "Johnson", "pat@x.org", active=False),
+        Customer(3, 1, "Linda", "Williams", "linda@x.org", active=True),
+        Customer(4, 2, "Mario", None, None, active=True),
+    ])
+    rentals = RecordList([
+        rental(1, customer_id=1, rental_date="2005-05-24T22:53:30"),
+        rental(2, customer_id=2, rental_date="2005-05-25T10:00:00",
+                return_date="2005-05-26T10:00:00"),
+        rental(3, customer_id=1, rental_date="2005-06-01T09:00:00",
+                return_date="2005-06-03T09:00:00"),
+    ])
+
+    def ids(self, records):
+        return [record[0] for record in records]
+
+    def test_customer_search(self):
+        index = CustomerIndex(self.customers)
+        self.assertEqual(self.ids(index.search(name="mar")), [1, 4])
+        self.assertEqual(self.ids(index.search(name="john")), [2])
+        self.assertEqual(self.ids(index.search(name="linda wil")), [3])
+        self.assertEqual(self.ids(index.search(email="PAT")), [2])
+        self.assertEqual(self.ids(index.search(store_id=2, active=True)), [4])
+        self.assertEqual(self.ids(index.search(store_id=9)), [])
+        self.assertEqual(
+            self.ids(index.search(sort="-first_name")), [2, 1, 4, 3]
+        )
+
+    def test_rental_search(self):
+        index = RentalIndex(self.rentals)
+        self.assertEqual(self.ids(index.search(customer_id=1)), [1, 3])
+        self.assertEqual(self.ids(index.search(status="outstanding")), [1])
+        self.assertEqual(self.ids(index.search(status="returned")), [2, 3])
+        self.assertEqual(
+            self.ids(index.search(date_from="2005-05-25",
+                                  date_to="2005-05-31")),
+            [2],
+        )
+        self.assertEqual(self.ids(index.search(date_to="2005-05-24")), [1])
+        self.assertEqual(
+            self.ids(index.search(sort="-rental_date")), [3, 2, 1]
+        )
+
+    def test_index_is_kept_on_the_snapshot(self):
+        records = RecordList(self.customers)
+        index = CustomerIndex.for_snapshot(records)
+        self.assertIs(CustomerIndex.for_snapshot(records), index)
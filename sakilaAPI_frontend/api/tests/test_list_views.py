@@ -0,0 +1,121 @@
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api.pagination import OpenPage
+from api.tests.utils import StubAPIMixin
+
+
+class ListViewTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_requires_login(self):
+        self.client.get(reverse("logout"))
+        response = self.client.get(reverse("customers_list"))
+        self.assertRedirects(
+            response, reverse("login"), fetch_redirect_response=False
+        )
+
+    def test_customers_list(self):
+        response = self.client.get(reverse("customers_list"))
+        self.assertEqual(response.status_code, 200)
+        customers = response.context["customers"]
+        self.assertEqual(customers.paginator.count, 30)
+        self.assertEqual(
+            [customer.customer_id for customer in customers],
+            list(range(1, 31)),
+        )
+        self.assertContains(response, self.api.customers[1]["email"])
+
+    def test_rentals_pages(self):
+        response = self.client.get(reverse("rentals_list"), {"page": 2})
+        rentals = response.context["rentals"]
+        self.assertEqual(rentals.number, 2)
+        self.assertEqual(rentals.paginator.count, 200)
+        self.assertEqual(
+            [rental.rental_id for rental in rentals], list(range(51, 101))
+        )
+        self.assertEqual(rentals.window, [1, 2, 3, 4])
+        # One page of rentals and the customers shown on it.
+        self.assertIn('desc="2 calls"', response["Server-Timing"])
+        names = {
+            row[1].customer_id for row in response.context["rows"] if row[1]
+        }
+        self.assertEqual(names, {rental.customer_id for rental in rentals})
+
+    def test_page_out_of_range(self):
+        response = self.client.get(reverse("rentals_list"), {"page": 99})
+        self.assertEqual(response.context["rentals"].number, 4)
+
+    @override_settings(API_TOTAL_COUNT_HEADER="X-Not-Sent")
+    def test_without_total_the_list_is_not_counted(self):
+        calls = self.api.calls
+        response = self.client.get(reverse("rentals_list"), {"page": 2})
+        rentals = response.context["rentals"]
+        self.assertIsInstance(rentals, OpenPage)
+        self.assertTrue(rentals.has_next())
+        self.assertEqual(
+            [rental.rental_id for rental in rentals], list(range(51, 101))
+        )
+        self.assertEqual(self.api.calls - calls, 2)
+
+        # A short page still tells the total.
+        response = self.client.get(reverse("rentals_list"), {"page": 4})
+        self.assertEqual(response.context["rentals"].paginator.count, 200)
+
+    @override_settings(API_COUNT_FREE_PAGINATION=True)
+    def test_count_free_setting(self):
+        response = self.client.get(reverse("customers_list"))
+        self.assertIsInstance(response.context["customers"], OpenPage)
+        self.assertFalse(response.context["customers"].has_next())
+
+
+class ListSearchTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.login()
+
+    def test_customers_by_name_and_store(self):
+        response = self.client.get(
+            reverse("customers_list"), {"q": "mary", "store_id": 2}
+        )
+        expected = [
+            row["customer_id"] for row in self.api.customers.values()
+            if "MARY" in (row["first_name"], row["last_name"])
+            and row["store_id"] == 2
+        ]
+        customers = response.context["customers"]
+        self.assertTrue(expected)
+        self.assertEqual(
+            [customer.customer_id for customer in customers], expected
+        )
+
+    def test_rentals_by_customer_sorted(self):
+        response = self.client.get(
+            reverse("rentals_list"),
+            {"customer_id": 3, "sort": "-rental_date"},
+        )
+        dates = [
+            rental.rental_date for rental in response.context["rentals"]
+        ]
+        self.assertEqual(sorted(dates, reverse=True), dates)
+        self.assertEqual(len(dates), len(self.api.customer_rentals(3)))
+
+    def test_outstanding_rentals(self):
+        response = self.client.get(
+            reverse("rentals_list"), {"status": "outstanding"}
+        )
+        self.assertEqual(
+            {rental.rental_id for rental in response.context["rentals"]},
+            {
+                row["rental_id"] for row in self.api.rentals.values()
+                if row["return_date"] is None
+            },
+        )
+
+    def test_invalid_filters_are_ignored(self):
+        response = self.client.get(
+            reverse("customers_list"), {"store_id": "x"}
+        )
+        self.assertEqual(response.context["customers"].paginator.count, 30)
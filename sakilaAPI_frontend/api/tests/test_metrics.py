@@ -0,0 +1,140 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api import metrics
+from api.tests.utils import StubAPIMixin
+
+
+def _data(value, histogram=None):
+    return {
+        "counters": {("sakila_test_total", (("kind", "a"),)): value},
+        "histograms": {
+            ("sakila_test_seconds", ()): histogram
+            or [1] + [0] * (len(metrics.BUCKETS) - 1) + [0.002, 1],
+        },
+    }
+
+
+class ExpositionTests(SimpleTestCase):
+    def test_counters_and_histograms(self):
+        histogram = [0] * (len(metrics.BUCKETS) + 2)
+        histogram[0], histogram[2] = 2, 1
+        histogram[-2:] = [0.03, 3]
+        text = metrics.exposition({
+            "counters": {
+                ("sakila_cache_requests_total", (("result", "hit"),)): 4,
+            },
+            "histograms": {
+                ("sakila_upstream_request_seconds",
+                 (("endpoint", "/api/v1/customers"),)): histogram,
+            },
+        })
+        lines = text.splitlines()
+        self.assertIn("# TYPE sakila_cache_requests_total counter", lines)
+        self.assertIn('sakila_cache_requests_total{result="hit"} 4', lines)
+        self.assertIn(
+            "# TYPE sakila_upstream_request_seconds histogram", lines
+        )
+        bucket = 'sakila_upstream_request_seconds_bucket{endpoint=' \
+            '"/api/v1/customers",le="%s"} %d'
+        self.assertIn(bucket % ("0.005", 2), lines)
+        self.assertIn(bucket % ("0.01", 2), lines)
+        self.assertIn(bucket % ("0.025", 3), lines)
+        self.assertIn(bucket % ("+Inf", 3), lines)
+        self.assertIn(
+            'sakila_upstream_request_seconds_count{endpoint='
+            '"/api/v1/customers"} 3',
+            lines,
+        )
+
+    def test_label_values_are_escaped(self):
+        text = metrics.exposition({
+            "counters": {("x_total", (("path", 'a"b\\c\nd'),)): 1},
+            "histograms": {},
+        })
+        self.assertIn('x_total{path="a\\"b\\\\c\\nd"} 1', text)
+
+    def test_ids_are_folded_out_of_endpoints(self):
+        self.assertEqual(
+            metrics.endpoint_label("/api/v1/rentals/12/return"),
+            "/api/v1/rentals/{id}/return",
+        )
+
+
+class MetricsDirTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        override = override_settings(METRICS_DIR=self.dir)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def total(self, data):
+        return data["counters"].get(("sakila_test_total", (("kind", "a"),)))
+
+    def test_files_of_other_workers_are_added(self):
+        metrics._write(metrics._path(self.dir, 4001), _data(2))
+        metrics._write(metrics._path(self.dir, 4002), _data(3))
+        data = metrics.collect()
+        self.assertEqual(self.total(data), 5)
+        histogram = data["histograms"][("sakila_test_seconds", ())]
+        self.assertEqual(histogram[-1], 2)
+
+    def test_files_of_exited_workers_are_kept(self):
+        # No worker has pid 4001 here: its totals must still be reported.
+        metrics._write(metrics._path(self.dir, 4001), _data(2))
+        self.assertEqual(self.total(metrics.collect()), 2)
+        self.assertEqual(self.total(metrics.collect()), 2)
+        self.assertTrue(os.path.exists(metrics._path(self.dir, 4001)))
+
+    def test_mark_process_dead_keeps_the_totals(self):
+        metrics._write(metrics._path(self.dir, 4001), _data(2))
+        metrics._write(metrics._path(self.dir, 4002), _data(3))
+        metrics.mark_process_dead(4001, self.dir)
+        metrics.mark_process_dead(4002, self.dir)
+        metrics.mark_process_dead(4003, self.dir)
+        self.assertFalse(os.path.exists(metrics._path(self.dir, 4001)))
+        self.assertTrue(
+            os.path.exists(os.path.join(self.dir, metrics.ARCHIVE))
+        )
+        self.assertEqual(self.total(metrics.collect()), 5)
+
+    def test_partial_files_are_ignored(self):
+        path = metrics._path(self.dir, 4001)
+        with open(f"{path}.tmp", "w") as f:
+            f.write('{"counters": [')
+        with open(path, "w") as f:
+            f.write("{")
+        self.assertIsNone(self.total(metrics.collect()))
+
+    def test_own_metrics_are_flushed(self):
+        metrics.inc("sakila_test_total", kind="own")
+        data = metrics.collect()
+        self.assertGreaterEqual(
+            data["counters"][("sakila_test_total", (("kind", "own"),))], 1
+        )
+        self.assertTrue(
+            os.path.exists(metrics._path(self.dir, os.getpid()))
+        )
+
+
+class MetricsViewTests(StubAPIMixin, SimpleTestCase):
+    def test_upstream_and_render_metrics(self):
+        self.login()
+        self.client.get(reverse("customers_list"))
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        text = response.content.decode()
+        self.assertIn(
+            'sakila_upstream_requests_total{endpoint="/api/v1/customers"',
+            text,
+        )
+        self.assertIn(
+            'sakila_template_render_seconds_count{view="customers_list"}',
+            text,
+        )
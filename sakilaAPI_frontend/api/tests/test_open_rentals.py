@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api import open_rentals
+from api.async_client import AsyncAPIClient
+from api.open_rentals import OpenRentalIndex
+from api.tests.utils import StubAPIMixin, rental
+
+
+@override_settings(RENTAL_OVERDUE_DAYS=7)
+class OpenRentalIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = OpenRentalIndex([
+            rental(1, customer_id=1, rental_date="2005-05-26T00:00:00"),
+            rental(2, customer_id=1, rental_date="2005-05-24T00:00:00"),
+            rental(3, customer_id=2, return_date="2005-05-30T00:00:00"),
+        ])
+
+    def ids(self, rentals):
+        return [rental.rental_id for rental in rentals]
+
+    def test_built_from_open_rentals(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.index.count(1), 2)
+        self.assertEqual(self.index.count(2), 0)
+        self.assertEqual(self.ids(self.index.for_customer(1)), [2, 1])
+        self.assertEqual(self.ids(self.index.oldest()[:]), [2, 1])
+
+    def test_add_and_return(self):
+        recent = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.index.add(rental(4, customer_id=2, rental_date=recent))
+        self.assertEqual(self.index.count(2), 1)
+        self.assertEqual(self.index.overdue_count(), 2)
+        self.assertEqual(self.ids(self.index.oldest(overdue=True)[:]), [2, 1])
+        self.assertEqual(len(self.index.oldest()), 3)
+
+        self.index.mark_returned(2, recent)
+        self.assertEqual(self.ids(self.index.oldest()[:]), [1, 4])
+        self.assertEqual(self.index.overdue_count(1), 1)
+
+        # A rental that comes back returned leaves the index.
+        self.index.add(rental(4, customer_id=2, return_date=recent))
+        self.assertEqual(self.index.count(2), 0)
+        self.assertEqual(len(self.index), 1)
+
+    def test_returning_an_unknownrental(self):
+        self.index.mark_returned(99, "2005-06-01T00:00:00")
+        self.assertEqual(len(self.index), 2)
+
+
+class LiveIndexTests(StubAPIMixin, SimpleTestCase):
+    def open_ids(self):
+        return {
+            row["rental_id"] for row in self.api.rentals.values()
+            if row["return_date"] is None
+        }
+
+    def test_concurrent_first_builds_share_one(self):
+        builds = []
+        build = open_rentals._live.build
+
+        def counted(rentals):
+            builds.append(threading.get_ident())
+            return build(rentals)
+
+        async def run():
+            client = AsyncAPIClient("bench")
+            return await asyncio.gather(
+                *(open_rentals.aget(client) for _ in range(3))
+            )
+
+        with mock.patch.object(open_rentals._live, "build", counted):
+            indexes = asyncio.run(run())
+        self.assertEqual(len(builds), 1)
+        self.assertIs(indexes[0], indexes[2])
+        self.assertEqual(
+            {rental.rental_id for rental in indexes[0].oldest()},
+            self.open_ids(),
+        )
+
+    def test_outstanding_view_follows_writes(self):
+        self.login()
+        response = self.client.get(reverse("rentals_outstanding"))
+        self.assertEqual(response.context["open_count"], len(self.open_ids()))
+        built_at = open_rentals._live._built_at
+
+        self.client.post(reverse("rental_create"), {
+            "inventory_id": 1, "customer_id": 3, "staff_id": 1,
+        })
+        rental_id = max(self.api.rentals)
+        response = self.client.get(reverse("rentals_outstanding"))
+        self.assertEqual(
+            response.context["open_count"], len(self.open_ids())
+        )
+        self.assertIn(
+            rental_id,
+            [row[0].rental_id for row in response.context["rows"]],
+        )
+
+        self.client.post(reverse("rental_return", args=[rental_id]))
+        response = self.client.get(
+            reverse("rentals_outstanding"), {"overdue": "1"}
+        )
+        self.assertNotIn(
+            rental_id,
+            [row[0].rental_id for row in response.context["rows"]],
+        )
+        # Both writes were applied to the index without rebuilding it.
+        self.assertEqual(open_rentals._live._built_at, built_at)
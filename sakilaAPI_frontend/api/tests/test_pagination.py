@@ -0,0 +1,151 @@
+import asyncio
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from api.pagination import (
+    APIPaginator,
+    OpenPage,
+    WindowedPaginator,
+    clear_cached_counts,
+    page_window,
+    set_cached_count,
+)
+from api.tests.utils import StubAPIMixin
+
+
+class PageWindowTests(SimpleTestCase):
+    def test_known_last_page(self):
+        self.assertEqual(page_window(1, 1, False), [1])
+        self.assertEqual(page_window(1, 10, True), [1, 2, 3, None, 10])
+        self.assertEqual(page_window(4, 10, True),
+                         [1, 2, 3, 4, 5, 6, None, 10])
+        self.assertEqual(page_window(6, 10, True),
+                         [1, None, 4, 5, 6, 7, 8, None, 10])
+        self.assertEqual(page_window(10, 10, False), [1, None, 8, 9, 10])
+        self.assertEqual(page_window(8, 10, True), [1, None, 6, 7, 8, 9, 10])
+
+    def test_unknown_last_page(self):
+        self.assertEqual(page_window(1, None, False), [1])
+        self.assertEqual(page_window(1, None, True), [1, 2, None])
+        self.assertEqual(page_window(5, None, True),
+                         [1, None, 3, 4, 5, 6, None])
+        self.assertEqual(page_window(5, None, False), [1, None, 3, 4, 5])
+
+
+class WindowedPaginatorTests(SimpleTestCase):
+    def test_page_carries_its_window(self):
+        paginator = WindowedPaginator(range(1000), 10)
+        page = paginator.get_page(50)
+        self.assertEqual(page.window, [1, None, 48, 49, 50, 51, 52, None, 100])
+        self.assertEqual(page.last_number, 100)
+
+
+class PaginationLinksTests(StubAPIMixin, SimpleTestCase):
+    stub_rentals = 600
+
+    def test_only_the_window_is_linked(self):
+        self.login()
+        response = self.client.get(reverse("rentals_list"), {"page": 6})
+        content = response.content.decode()
+        for number in (1, 4, 5, 7, 8, 12):
+            self.assertIn(f'aria-label="Ir a página {number}"', content)
+        for number in (2, 3, 9, 10, 11):
+            self.assertNotIn(f'aria-label="Ir a página {number}"', content)
+        self.assertEqual(content.count("pagination-ellipsis"), 2)
+
+
+class APIPaginatorTests(SimpleTestCase):
+    count_key = ("tests", "/items")
+
+    def setUp(self):
+        clear_cached_counts()
+        self.addCleanup(clear_cached_counts)
+        self.items = list(range(1, 24))
+        self.calls = []
+        self.send_total = True
+
+    def fetch_page(self, offset, limit):
+        self.calls.append((offset, limit))
+        total = len(self.items) if self.send_total else None
+        return self.items[offset:offset + limit], total
+
+    async def afetch_page(self, offset, limit):
+        return self.fetch_page(offset, limit)
+
+    def paginator(self, fetch_page=None, **kwargs):
+        return APIPaginator(
+            fetch_page or self.fetch_page, 10, self.count_key, **kwargs
+        )
+
+    def test_first_page_in_one_request(self):
+        page = self.paginator().get_page(1)
+        self.assertEqual(list(page), list(range(1, 11)))
+        self.assertEqual(page.window, [1, 2, 3])
+        self.assertEqual(self.calls, [(0, 11)])
+
+    def test_known_count_is_reused(self):
+        set_cached_count(self.count_key, 23)
+        page = self.paginator().get_page(2)
+        self.assertEqual(list(page), list(range(11, 21)))
+        self.assertEqual(self.calls, [(10, 10)])
+
+    def test_last_page_is_short(self):
+        page = self.paginator().get_page(3)
+        self.assertEqual(list(page), [21, 22, 23])
+        self.assertFalse(page.has_next())
+
+    def test_out_of_range_numbers(self):
+        self.assertEqual(self.paginator().get_page(99).number, 3)
+        self.assertEqual(self.paginator().get_page(0).number, 1)
+        self.assertEqual(self.paginator().get_page("x").number, 1)
+
+    def test_empty_collection(self):
+        self.items = []
+        page = self.paginator().get_page(1)
+        self.assertEqual(list(page), [])
+        self.assertEqual(page.window, [1])
+
+    def test_without_a_total_the_page_is_open(self):
+        self.send_total = False
+        page = self.paginator().get_page(2)
+        self.assertIsInstance(page, OpenPage)
+        self.assertEqual(list(page), list(range(11, 21)))
+        self.assertTrue(page.has_next())
+        self.assertEqual(self.calls, [(10, 11)])
+
+        page = self.paginator().get_page(3)
+        self.assertFalse(page.has_next())
+        self.assertEqual(self.paginator().get_page(9).number, 1)
+
+    def test_count_free_pages(self):
+        paginator = self.paginator(count_free=True)
+        page = paginator.get_page(2)
+        self.assertEqual(list(page), list(range(11, 21)))
+        self.assertTrue(page.has_next())
+        self.assertIsNone(page.last_number)
+        self.assertEqual(page.window, [1, 2, 3, None])
+        self.assertEqual(self.calls, [(10, 11)])
+
+        page = paginator.get_page(3)
+        self.assertFalse(page.has_next())
+        self.assertEqual(page.end_index(), 23)
+
+    def test_count_free_past_the_end(self):
+        page = self.paginator(count_free=True).get_page(9)
+        self.assertEqual(page.number, 1)
+        self.assertEqual(list(page), list(range(1, 11)))
+
+    def test_async(self):
+        paginator = self.paginator(self.afetch_page)
+        page = asyncio.run(paginator.aget_page(3))
+        self.assertEqual(list(page), [21, 22, 23])
+        page = asyncio.run(self.paginator(self.afetch_page).aget_page(99))
+        self.assertEqual(page.number, 3)
+
+    def test_async_without_a_total(self):
+        self.send_total = False
+        page = asyncio.run(self.paginator(self.afetch_page).aget_page(1))
+        self.assertIsInstance(page, OpenPage)
+        self.assertTrue(page.has_next())
+        self.assertEqual(self.calls, [(0, 11)])
@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from api import models, replica
+from api.api_client import APIClient
+from api.tests.utils import StubAPIMixin
+
+
+@override_settings(REPLICA_READS=True, REPLICA_DELTA_PARAM="")
+class ReplicaSyncTests(StubAPIMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.api_client = APIClient("bench")
+
+    def test_full_sync(self):
+        results = replica.sync(self.api_client)
+        self.assertEqual(
+            results, {"customers": (30, 0), "rentals": (200, 0)}
+        )
+        self.assertEqual(models.Customer.objects.count(), 30)
+        state = models.ReplicaState.objects.get(name="rentals")
+        self.assertEqual(state.rows, 200)
+        self.assertTrue(state.etag)
+        self.assertTrue(replica.available("customers", "rentals"))
+
+    def test_unchanged_collection_is_not_read_again(self):
+        replica.sync(self.api_client)
+        self.assertEqual(
+            replica.sync(self.api_client),
+            {"customers": (0, 0), "rentals": (0, 0)},
+        )
+
+    def test_only_changes_are_written(self):
+        replica.sync(self.api_client)
+        self.api.customers[3]["first_name"] = "NUEVO"
+        del self.api.customers[4]
+        self.api.changed()
+        self.assertEqual(
+            replica.sync_collection(self.api_client, "customers"), (1, 1)
+        )
+        self.assertEqual(replica.customer(3).first_name, "NUEVO")
+        self.assertIsNone(replica.customer(4))
+
+    @override_settings(REPLICA_DELTA_PARAM="since")
+    def test_delta_sync_asks_for_newer_rows(self):
+        replica.sync(self.api_client)
+        high_water = models.ReplicaState.objects.get(
+            name="rentals"
+        ).high_water
+        with mock.patch.object(
+            self.api_client, "stream_changes",
+            wraps=self.api_client.stream_changes,
+        ) as stream_changes:
+            _, deleted = replica.sync_collection(self.api_client, "rentals")
+        self.assertEqual(
+            stream_changes.call_args.kwargs["params"], {"since": high_water}
+        )
+        self.assertEqual(deleted, 0)
+
+    def test_stale_replica_is_not_used(self):
+        replica.sync(self.api_client)
+        replica.mark_stale("rentals")
+        self.assertTrue(replica.available("customers"))
+        self.assertFalse(replica.available("customers", "rentals"))
+        with override_settings(REPLICA_READS=False):
+            self.assertFalse(replica.available("customers"))
+
+    def test_writes_reach_the_replica(self):
+        replica.sync(self.api_client)
+        self.api_client.update_customer(5, {"first_name": "EVA"})
+        self.assertEqual(replica.customer(5).first_name, "EVA")
+        self.api_client.delete_customer(6)
+        self.assertIsNone(replica.customer(6))
+
+    def test_views_read_from_the_replica(self):
+        replica.sync(self.api_client)
+        self.login()
+        calls = self.api.calls
+        response = self.client.get(reverse("customers_list"), {"q": "mary"})
+        customers = response.context["customers"]
+        self.assertEqual(self.api.calls, calls)
+        self.assertEqual(
+            {customer.customer_id for customer in customers},
+            {
+                row["customer_id"] for row in self.api.customers.values()
+                if "MARY" in (row["first_name"], row["last_name"])
+            },
+        )
+        response = self.client.get(reverse("customer_detail", args=[3]))
+        self.assertEqual(self.api.calls, calls)
+        self.assertEqual(
+            len(response.context["rentals"]),
+            len(self.api.customer_rentals(3)),
+        )
@@ -0,0 +1,128 @@
+import json
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api.api_client import APIClient
+from api.cache import ResponseCache
+from api.resilience import APIUnavailable, CircuitBreaker, breaker
+from api.tests.utils import StubAPIMixin, response
+
+
+@override_settings(API_RETRY_BACKOFF=0, API_RETRIES=2)
+class RetryTests(SimpleTestCase):
+    customer = {"customer_id": 7, "first_name": "ANA", "email": "a@b.c"}
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=0, max_bytes=1024 * 1024)
+        self.breaker = CircuitBreaker(threshold=3, reset_timeout=30)
+        for target, value in (
+            ("api.api_client.response_cache", self.cache),
+            ("api.api_client.breaker", self.breaker),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient("token")
+        patcher = mock.patch.object(self.client.session, "request")
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_a_get_after_503(self):
+        self.request.side_effect = [
+            response(503),
+            response(200, json.dumps(self.customer).encode()),
+        ]
+        self.assertEqual(self.client.get_customer(7).customer_id, 7)
+        self.assertEqual(self.request.call_count, 2)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_gives_up_after_the_retries(self):
+        self.request.side_effect = requests.exceptions.ConnectionError("down")
+        with self.assertRaises(APIUnavailable):
+            self.client.get_customer(7)
+        self.assertEqual(self.request.call_count, 3)
+        self.assertEqual(self.breaker.failures, 1)
+
+    def test_writes_are_not_retried(self):
+        self.request.side_effect = [response(503)]
+        with self.assertRaises(APIUnavailable):
+            self.client.return_rental(1)
+        self.assertEqual(self.request.call_count, 1)
+
+    def test_open_breaker_fails_fast(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+        with self.assertRaises(APIUnavailable):
+            self.client.get_customer(7)
+        self.request.assert_not_called()
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(threshold=2, reset_timeout=30)
+
+    def expire(self):
+        self.breaker.opened_at -= 31
+
+    def test_opens_after_threshold(self):
+        self.breaker.record_failure()
+        self.breaker.check()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(APIUnavailable):
+            self.breaker.check()
+        self.assertGreater(self.breaker.retry_after(), 1)
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_one_probe_after_the_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.expire()
+        self.breaker.check()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        # Only the first caller probes.
+        with self.assertRaises(APIUnavailable):
+            self.breaker.check()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.breaker.check()
+
+    def test_failed_probe_reopens(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.expire()
+        self.breaker.check()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(APIUnavailable):
+            self.breaker.check()
+
+    def test_lost_probe_is_replaced(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.expire()
+        self.breaker.check()
+        self.breaker.probe_started -= 31
+        self.breaker.check()
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+class UnavailableViewTests(StubAPIMixin, SimpleTestCase):
+    def test_open_breaker_shows_the_unavailable_page(self):
+        self.login()
+        for _ in range(breaker.threshold):
+            breaker.record_failure()
+        calls = self.api.calls
+        response = self.client.get(reverse("customers_list"))
+        self.assertEqual(response.status_code, 503)
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+        self.assertEqual(self.api.calls, calls)
@@ -0,0 +1,97 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api.api_client import APIClient
+from api.cache import ResponseCache, make_key, response_cache
+from api.records import Customer
+from api.resilience import CircuitBreaker
+from api.tests.utils import StubAPIMixin, response
+
+
+class RevalidatedTests(SimpleTestCase):
+    def test_revalidated_extends_the_entry(self):
+        cache = ResponseCache(ttl=60, max_bytes=100)
+        key = make_key("s", "a")
+        cache.set(key, "A", 1, etag='"1"')
+        cache.get(key).expires = 0
+        self.assertIsNone(cache.peek(key))
+        self.assertTrue(cache.revalidated(key))
+        self.assertEqual(cache.peek(key).payload, "A")
+        self.assertFalse(cache.revalidated(make_key("s", "b")))
+
+    def test_without_ttl_only_entries_with_validators_are_kept(self):
+        cache = ResponseCache(ttl=0, max_bytes=100)
+        cache.set(make_key("s", "a"), "A", 1)
+        cache.set(make_key("s", "b"), "B", 1, last_modified="Tue, 1 Jan")
+        self.assertIsNone(cache.get(make_key("s", "a")))
+        entry = cache.get(make_key("s", "b"))
+        self.assertFalse(entry.fresh)
+        self.assertEqual(entry.validators, {"If-Modified-Since": "Tue, 1 Jan"})
+
+
+class ConditionalGetTests(SimpleTestCase):
+    customer = {"customer_id": 7, "first_name": "ANA", "email": "a@b.c"}
+
+    def setUp(self):
+        self.cache = ResponseCache(ttl=0, max_bytes=1024 * 1024)
+        for target, value in (
+            ("api.api_client.response_cache", self.cache),
+            ("api.api_client.breaker", CircuitBreaker(3, 30)),
+        ):
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = APIClient("token")
+        patcher = mock.patch.object(self.client.session, "request")
+        self.request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_revalidates_with_etag(self):
+        body = json.dumps(self.customer).encode()
+        self.request.side_effect = [
+            response(200, body, {"ETag": '"v1"'}),
+            response(304),
+        ]
+        first = self.client.get_customer(7)
+        second = self.client.get_customer(7)
+        self.assertEqual(first, Customer.from_dict(self.customer))
+        self.assertIs(second, first)
+        headers = self.request.call_args_list[1].kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"v1"')
+        self.assertEqual(self.cache.revalidations, 1)
+
+    def test_changed_resource_replaces_the_entry(self):
+        changed = {**self.customer, "first_name": "EVA"}
+        self.request.side_effect = [
+            response(200, json.dumps(self.customer).encode(),
+                     {"ETag": '"v1"'}),
+            response(200, json.dumps(changed).encode(), {"ETag": '"v2"'}),
+        ]
+        self.client.get_customer(7)
+        self.assertEqual(self.client.get_customer(7).first_name, "EVA")
+        key = make_key(self.client.scope, "/api/v1/customers/7")
+        self.assertEqual(self.cache.get(key).etag, '"v2"')
+
+    def test_without_validators_nothing_is_sent(self):
+        body = json.dumps(self.customer).encode()
+        self.request.side_effect = [response(200, body), response(200, body)]
+        self.client.get_customer(7)
+        self.client.get_customer(7)
+        headers = self.request.call_args_list[1].kwargs["headers"]
+        self.assertNotIn("If-None-Match", headers)
+
+
+class StubRevalidationTests(StubAPIMixin, SimpleTestCase):
+    def test_expired_list_is_revalidated(self):
+        client = APIClient("token")
+        first = client.get_customers()
+        key = make_key(client.scope, "/api/v1/customers")
+        response_cache.get(key).expires = 0
+        revalidations = response_cache.revalidations
+        calls = self.api.calls
+        with mock.patch.object(response_cache, "max_stale", 0):
+            self.assertIs(client.get_customers(), first)
+        self.assertEqual(response_cache.revalidations, revalidations + 1)
+        self.assertEqual(self.api.calls, calls + 1)
@@ -0,0 +1,46 @@
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from api.tests.utils import StubAPIMixin
+
+
+class CacheSessionTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(
+            SESSION_ENGINE="django.contrib.sessions.backends.cache",
+            CACHES={
+                **settings.CACHES,
+                "sessions": {
+                    **settings.CACHES["sessions"],
+                    "LOCATION": directory.name,
+                },
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.addCleanup(caches["sessions"].close)
+
+    def stored(self, key):
+        return caches["sessions"].get(f"django.contrib.sessions.cache{key}")
+
+    def test_login_and_logout(self):
+        self.login()
+        key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.assertEqual(self.stored(key)["access_token"], "bench")
+        self.assertEqual(
+            self.client.get(reverse("customers_list")).status_code, 200
+        )
+
+        self.client.get(reverse("logout"))
+        self.assertIsNone(self.stored(key))
+        response = self.client.get(reverse("customers_list"))
+        self.assertRedirects(
+            response, reverse("login"), fetch_redirect_response=False
+        )
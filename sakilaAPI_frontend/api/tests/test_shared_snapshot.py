@@ -0,0 +1,116 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from api import shared_snapshot
+from api.api_client import APIClient
+from api.records import Customer, Rental
+from api.tests.utils import StubAPIMixin, rental
+
+
+class SharedSnapshotTests(SimpleTestCase):
+    rows = [
+        rental(3, customer_id=2, return_date="2005-06-01T10:00:00"),
+        rental(1, customer_id=2),
+        Rental(2, None, None, None, None, None, "ünïcode"),
+        rental(5, customer_id=1),
+    ]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(SHARED_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        shared_snapshot._mapped.clear()
+        self.addCleanup(shared_snapshot._mapped.clear)
+        self.path = shared_snapshot.path("rentals")
+        shared_snapshot.write(
+            self.path, Rental, self.rows, etag='"e1"', indexes=("customer_id",)
+        )
+
+    def test_round_trip(self):
+        snapshot = shared_snapshot.Snapshot(self.path, Rental)
+        expected = sorted(self.rows)
+        self.assertEqual(len(snapshot), 4)
+        self.assertEqual(snapshot.etag, '"e1"')
+        self.assertEqual(snapshot[:], expected)
+        self.assertEqual(snapshot[1:3], expected[1:3])
+        self.assertEqual(snapshot[-1], expected[-1])
+        with self.assertRaises(IndexError):
+            snapshot[4]
+
+    def test_lookups(self):
+        snapshot = shared_snapshot.Snapshot(self.path, Rental)
+        self.assertEqual(snapshot.get(2), self.rows[2])
+        self.assertIsNone(snapshot.get(4))
+        self.assertEqual(set(snapshot.get_many([1, 4, 5])), {1, 5})
+        self.assertEqual(
+            [r.rental_id for r in snapshot.where("customer_id", 2)], [1, 3]
+        )
+        self.assertEqual(snapshot.where("customer_id", 9), [])
+
+    def test_wrong_record(self):
+        with self.assertRaises(ValueError):
+            shared_snapshot.Snapshot(self.path, Customer)
+
+    def test_writes_bound_the_snapshot_life(self):
+        self.assertEqual(len(shared_snapshot.current("rentals")), 4)
+        shared_snapshot.invalidate(["/api/v1/rentals"])
+        self.assertEqual(len(shared_snapshot.current("rentals")), 4)
+        mtime = os.stat(self.path).st_mtime
+        self.assertLessEqual(
+            time.time() - mtime,
+            settings.SHARED_SNAPSHOT_MAX_AGE,
+        )
+        # Later writes don't push the refresh back.
+        shared_snapshot.invalidate(["/api/v1/rentals"])
+        self.assertEqual(os.stat(self.path).st_mtime, mtime)
+
+        with override_settings(SHARED_SNAPSHOT_WRITE_STALENESS=0):
+            shared_snapshot.invalidate(["/api/v1/rentals"])
+        self.assertIsNone(shared_snapshot.current("rentals"))
+
+    def test_other_collections_are_left_alone(self):
+        mtime = os.stat(self.path).st_mtime
+        shared_snapshot.invalidate(["/api/v1/customers"])
+        self.assertEqual(os.stat(self.path).st_mtime, mtime)
+
+    def test_rewrite_is_picked_up(self):
+        shared_snapshot.current("rentals")
+        shared_snapshot.write(self.path, Rental, self.rows[:1])
+        with override_settings(SHARED_SNAPSHOT_CHECK_INTERVAL=0):
+            self.assertEqual(len(shared_snapshot.current("rentals")), 1)
+
+
+class SnapshotRefreshTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(SHARED_SNAPSHOT_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        shared_snapshot._mapped.clear()
+        self.addCleanup(shared_snapshot._mapped.clear)
+        self.api_client = APIClient("bench")
+
+    def test_refresh_and_write(self):
+        self.assertEqual(
+            shared_snapshot.refresh(self.api_client, "rentals"), 200
+        )
+        self.assertIsNone(shared_snapshot.refresh(self.api_client, "rentals"))
+        calls = self.api.calls
+
+        self.api_client.create_rental(
+            {"inventory_id": 1, "customer_id": 3, "staff_id": 1}
+        )
+        snapshot = shared_snapshot.current("rentals")
+        self.assertEqual(len(snapshot), 200)
+        self.assertEqual(self.api.calls, calls + 1)
+        self.assertEqual(
+            shared_snapshot.refresh(self.api_client, "rentals"), 201
+        )
@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from api.api_client import APIClient
+from api.singleflight import AsyncSingleFlight, SingleFlight
+from api.tests.utils import StubAPIMixin
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_calls_share_one_fetch(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return "result"
+
+        results = []
+
+        def call():
+            results.append(flight.do("key", fetch, timeout=5))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait(5)
+        followers = [threading.Thread(target=call) for _ in range(3)]
+        for thread in followers:
+            thread.start()
+        # Give the followers time to find the call in flight.
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["result"] * 4)
+
+    def test_error_is_shared(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fetch():
+            started.set()
+            release.wait(5)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("key", fetch, timeout=5)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(errors), 2)
+        self.assertIs(errors[0], errors[1])
+
+    def test_follower_fetches_after_timeout(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        leader = threading.Thread(target=flight.do, args=("key", slow, 5))
+        leader.start()
+        started.wait(5)
+        self.assertEqual(flight.do("key", lambda: "own", timeout=0), "own")
+        release.set()
+        leader.join(5)
+
+    def test_sequential_calls_fetch_again(self):
+        flight = SingleFlight()
+        self.assertEqual(flight.do("key", lambda: 1, timeout=5), 1)
+        self.assertEqual(flight.do("key", lambda: 2, timeout=5), 2)
+
+    def test_async(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "result"
+
+        async def run():
+            return await asyncio.gather(
+                *(flight.do("key", fetch, timeout=5) for _ in range(4))
+            )
+
+        self.assertEqual(asyncio.run(run()), ["result"] * 4)
+        self.assertEqual(len(calls), 1)
+
+
+class CoalescedClientTests(StubAPIMixin, SimpleTestCase):
+    def test_concurrent_reads_make_one_request(self):
+        self.api.latency = 0.2
+        barrier = threading.Barrier(4)
+        results = []
+
+        def read():
+            barrier.wait(5)
+            results.append(APIClient("token").get_customers())
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_users_are_not_coalesced(self):
+        self.api.latency = 0.1
+        threads = [
+            threading.Thread(target=APIClient(token).get_customers)
+            for token in ("first", "second")
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.api.calls, 2)
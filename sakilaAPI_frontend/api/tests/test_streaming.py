@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+from django.test import SimpleTestCase
+
+from api.api_client import APIClient
+from api.records import Rental
+from api.streaming import aiter_json_array, iter_json_array
+from api.tests.utils import StubAPIMixin
+
+
+class StreamingTests(SimpleTestCase):
+    items = [
+        {"id": 1, "name": "Ñandú", "price": 12.5},
+        {"id": 23, "name": "a,b]c", "tags": [1, 2]},
+        -500,
+        "texto",
+        None,
+        True,
+    ]
+
+    def setUp(self):
+        self.data = json.dumps(self.items, ensure_ascii=False).encode()
+
+    def test_every_split_point(self):
+        # Cuts inside strings, numbers and multi-byte characters.
+        for cut in range(len(self.data) + 1):
+            chunks = [self.data[:cut], self.data[cut:]]
+            self.assertEqual(list(iter_json_array(chunks)), self.items, cut)
+
+    def test_one_byte_chunks(self):
+        chunks = [self.data[i:i + 1] for i in range(len(self.data))]
+        self.assertEqual(list(iter_json_array(chunks)), self.items)
+
+    def test_number_at_chunk_end(self):
+        self.assertEqual(list(iter_json_array([b"[12", b"34, 5", b"]"])),
+                         [1234, 5])
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array([b" [ ", b"]"])), [])
+
+    def test_stops_at_closing_bracket(self):
+        chunks = iter([b"[1]", b"garbage"])
+        self.assertEqual(list(iter_json_array(chunks)), [1])
+        self.assertEqual(next(chunks), b"garbage")
+
+    def test_truncated(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"id": 1}, {"id"']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b"[1, 2"]))
+
+    def test_not_an_array(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"id": 1}']))
+
+    def test_async(self):
+        async def chunks():
+            for i in range(0, len(self.data), 3):
+                yield self.data[i:i + 3]
+
+        async def collect():
+            return [item async for item in aiter_json_array(chunks())]
+
+        self.assertEqual(asyncio.run(collect()), self.items)
+
+
+class StreamedListTests(StubAPIMixin, SimpleTestCase):
+    def test_iter_rentals(self):
+        rentals = APIClient("token").iter_rentals()
+        first = next(rentals)
+        self.assertIsInstance(first, Rental)
+        self.assertEqual(
+            [first.rental_id] + [rental.rental_id for rental in rentals],
+            list(self.api.rentals),
+        )
@@ -0,0 +1,64 @@
+import io
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from api.api_client import APIClient
+from api.cache import ResponseCache, make_key, response_cache
+from api.tests.utils import StubAPIMixin
+
+
+class WarmCacheTests(StubAPIMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "warm.pickle")
+        call_command("warm_cache", token="bench", output=self.path,
+                     stdout=io.StringIO())
+        self.seeds = ResponseCache(ttl=30, max_bytes=1024 * 1024)
+        self.assertGreater(self.seeds.load_seeds(self.path), 0)
+        patcher = mock.patch("api.api_client.response_cache", self.seeds)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = self.api.calls
+
+    def test_same_token_revalidates_the_seed(self):
+        customers = APIClient("bench").get_customers()
+        self.assertEqual(len(customers), 30)
+        self.assertEqual(self.seeds.revalidations, 1)
+
+    def test_other_users_download_their_own_copy(self):
+        APIClient("other").get_customers()
+        self.assertEqual(self.seeds.revalidations, 0)
+        self.assertEqual(self.api.calls, self.calls + 1)
+
+    def test_writes_drop_the_seeds(self):
+        APIClient("bench").create_customer({
+            "store_id": 1, "first_name": "ANA", "last_name": "RUIZ",
+            "email": "ana@x.org", "address_id": 5, "active": True,
+        })
+        key = make_key(APIClient("bench").scope, "/api/v1/customers")
+        self.assertIsNone(self.seeds.seed(key))
+
+
+class StaleWhileRevalidateTests(StubAPIMixin, SimpleTestCase):
+    def test_expired_list_is_served_and_refreshed(self):
+        client = APIClient("token")
+        first = client.get_customers()
+        key = make_key(client.scope, "/api/v1/customers")
+        response_cache.get(key).expires = time.monotonic() - 1
+        calls = self.api.calls
+        stale_hits = response_cache.stale_hits
+
+        self.assertIs(client.get_customers(), first)
+        deadline = time.monotonic() + 5
+        while response_cache.peek(key) is None:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(self.api.calls, calls + 1)
+        self.assertEqual(response_cache.stale_hits, stale_hits + 1)
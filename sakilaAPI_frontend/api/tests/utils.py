@@ -0,0 +1,96 @@
+import threading
+import time
+
+import requests
+from django.test import override_settings
+from django.urls import reverse
+
+from api import live
+from api.bench.stub import StubAPI, serve
+from api.cache import response_cache
+from api.pagination import clear_cached_counts
+from api.records import Rental
+from api.resilience import breaker
+
+
+class StubAPIMixin:
+    # Runs the bench stub of sakilaAPI in a thread for each test and points
+    # the clients at it, with the per-process caches emptied.
+    stub_customers = 30
+    stub_rentals = 200
+    stub_paginate = True
+
+    def setUp(self):
+        super().setUp()
+        self.api = StubAPI(
+            self.stub_customers, self.stub_rentals, paginate=self.stub_paginate
+        )
+        server = serve(0, self.api)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        override = override_settings(
+            API_BASE_URL=f"http://127.0.0.1:{server.server_port}",
+            SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies",
+            STORAGES={
+                "default": {
+                    "BACKEND": "django.core.files.storage.FileSystemStorage",
+                },
+                "staticfiles": {
+                    "BACKEND": (
+                        "django.contrib.staticfiles.storage.StaticFilesStorage"
+                    ),
+                },
+            },
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.reset()
+        self.addCleanup(self.reset)
+
+    def reset(self):
+        # A rebuild started by the last test must not land in the next one.
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and any(
+            structure._rebuilding for structure in live._registry
+        ):
+            time.sleep(0.01)
+        response_cache.clear()
+        clear_cached_counts()
+        breaker.record_success()
+        for structure in live._registry:
+            structure.value = None
+            structure._built_at = 0.0
+
+    def login(self):
+        response = self.client.post(
+            reverse("login"), {"username": "test", "password": "test"}
+        )
+        self.assertRedirects(
+            response, reverse("home"), fetch_redirect_response=False
+        )
+
+
+def response(status, body=b"", headers=None):
+    # A finished requests.Response, for patching Session.request.
+    response = requests.Response()
+    response.status_code = status
+    response.reason = "Test"
+    response._content = body
+    response._content_consumed = True
+    response.headers.update(headers or {})
+    response.url = "http://sakila.test/"
+    return response
+
+
+def rental(rental_id, customer_id=1, rental_date="2005-05-24T22:53:30",
+           return_date=None, staff_id=1):
+    return Rental(
+        rental_id=rental_id,
+        rental_date=rental_date,
+        inventory_id=rental_id * 10,
+        customer_id=customer_id,
+        return_date=return_date,
+        staff_id=staff_id,
+    )
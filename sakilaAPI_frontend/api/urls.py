@@ -1,12 +1,25 @@
+from django.conf import settings
 from django.urls import path
-from api import views
+from api import metrics
+
+if settings.API_ASYNC_VIEWS:
+    from api import async_views as views
+else:
+    from api import views
 
 urlpatterns = [
     path("", views.home, name="home"),
     path("login/", views.login, name="login"),
     path("register/", views.register, name="register"),
     path("logout/", views.logout, name="logout"),
+    path("cache/stats/", views.cache_stats, name="cache_stats"),
+    path("metrics", metrics.metrics_view, name="metrics"),
     path("customers/", views.customers_list, name="customers_list"),
+    path(
+        "customers/export/",
+        views.customers_export,
+        name="customers_export"
+    ),
     path(
         "customers/<int:customer_id>/",
         views.customer_detail,
@@ -28,6 +41,16 @@ urlpatterns = [
         name="customer_delete"
     ),
     path("rentals/", views.rentals_list, name="rentals_list"),
+    path(
+        "rentals/export/",
+        views.rentals_export,
+        name="rentals_export"
+    ),
+    path(
+        "rentals/outstanding/",
+        views.rentals_outstanding,
+        name="rentals_outstanding"
+    ),
     path(
         "rentals/<int:rental_id>/",
         views.rental_detail,
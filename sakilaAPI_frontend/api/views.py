@@ -1,50 +1,233 @@
-from django.shortcuts import render, redirect
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import patch_vary_headers
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
+from api import dashboard, open_rentals, replica, shared_snapshot
 from api.api_client import APIClient
+from api.cache import response_cache
+from api.exports import check_format, export_response
+from api.indexes import CustomerIndex, RentalIndex
+from api.lookups import resolve_customers
+from api.metrics import render
+from api.pagination import APIPaginator, WindowedPaginator
+from api.records import Customer, Rental
+from api.resilience import APIUnavailable
 from api.forms import (
     LoginForm,
     RegisterForm,
     CustomerForm,
     RentalForm,
+    CustomerFilterForm,
+    RentalFilterForm,
 )
-from datetime import datetime
+from datetime import date, datetime
+from functools import partial
 
-def format_datetime(iso_string):
-    if not iso_string:
+def get_token_from_session(request):
+    return request.session.get("access_token")
+
+def get_criteria(filters):
+    criteria = {}
+    for name, value in filters.cleaned_data.items():
+        if value is None or value == "":
+            continue
+        if name == "sort" and value == filters.fields[name].choices[0][0]:
+            # The default order is sakilaAPI's, so the unfiltered pages
+            # can still be paged upstream.
+            continue
+        if isinstance(value, date):
+            value = value.isoformat()
+        criteria[name] = value
+    return criteria
+
+def wants_fragment(request):
+    # Sent by static/js/fragments.js when it only needs the table rows.
+    return request.headers.get("X-Fragment") == "1"
+
+def render_list(request, template_name, fragment_name, context, page):
+    # The full page, or just the rows of `page` with the URL of the next
+    # one in X-Next-Page, for "Cargar más" and infinite scroll.
+    if wants_fragment(request):
+        response = render(request, fragment_name, context)
+        if page.has_next():
+            query = request.GET.copy()
+            query["page"] = page.next_page_number()
+            response["X-Next-Page"] = f"?{query.urlencode()}"
+    else:
+        response = render(request, template_name, context)
+    patch_vary_headers(response, ("X-Fragment",))
+    return response
+
+# The helpers below hold everything but the I/O of each view, so that
+# api/async_views.py only differs from this module in how it waits.
+
+def find_customers(customers, criteria):
+    index = CustomerIndex.for_snapshot(customers)
+    return index.search(
+        name=criteria.get("q"),
+        email=criteria.get("email"),
+        store_id=criteria.get("store_id"),
+        active=criteria.get("active"),
+        sort=criteria.get("sort", "customer_id"),
+    )
+
+def find_rentals(rentals, criteria):
+    index = RentalIndex.for_snapshot(rentals)
+    return index.search(
+        customer_id=criteria.get("customer_id"),
+        inventory_id=criteria.get("inventory_id"),
+        status=criteria.get("status"),
+        date_from=criteria.get("date_from"),
+        date_to=criteria.get("date_to"),
+        sort=criteria.get("sort", "rental_id"),
+    )
+
+def api_paginator(client, get_page, per_page, endpoint):
+    return APIPaginator(
+        get_page,
+        per_page,
+        count_key=(client.scope, endpoint),
+        count_free=settings.API_COUNT_FREE_PAGINATION,
+    )
+
+def customer_data(form):
+    return {
+        "store_id": form.cleaned_data["store_id"],
+        "first_name": form.cleaned_data["first_name"],
+        "last_name": form.cleaned_data["last_name"],
+        "email": form.cleaned_data["email"] or None,
+        "address_id": form.cleaned_data["address_id"],
+        "active": form.cleaned_data["active"],
+    }
+
+def customer_initial(customer):
+    return {
+        "store_id": customer.store_id,
+        "first_name": customer.first_name,
+        "last_name": customer.last_name,
+        "email": customer.email,
+        "address_id": customer.address_id,
+        "active": customer.active,
+    }
+
+def rental_data(form):
+    return {
+        "rental_date": datetime.now().isoformat(),
+        "inventory_id": (
+            form.cleaned_data["inventory_id"]
+        ),
+        "customer_id": form.cleaned_data["customer_id"],
+        "staff_id": form.cleaned_data["staff_id"],
+    }
+
+def delete_error(error):
+    error_msg = str(error)
+    if "409" in error_msg or "existing rentals" in error_msg:
+        return "No se puede eliminar este cliente, ya que tiene reservas activas asociadas."
+    return f"Error: {error_msg}"
+
+def home_context(stats, customers):
+    return {
+        "stats": stats,
+        "top_customers": [
+            (customers.get(customer_id), customer_id, count)
+            for customer_id, count in stats["top_customers"]
+        ],
+    }
+
+def rental_rows(rentals, customers):
+    return [
+        (rental, customers.get(rental.customer_id))
+        for rental in rentals
+    ]
+
+def snapshot_customer(token, customer_id):
+    # (customer, rentals) from the shared snapshot, or None.
+    customers = shared_snapshot.current("customers", token)
+    rentals = shared_snapshot.current("rentals", token)
+    if customers is None or rentals is None:
         return None
-    try:
-        dt = datetime.fromisoformat(
-            iso_string.replace("Z", "+00:00")
-        )
-        return dt.strftime("%d/%m/%Y %H:%M")
-    except:
-        return iso_string
-
-def format_rentals(rentals):
-    for rental in rentals:
-        if rental.get("rental_date"):
-            rental["rental_date"] = format_datetime(
-                rental["rental_date"]
-            )
-        if rental.get("return_date"):
-            rental["return_date"] = format_datetime(
-                rental["return_date"]
-            )
-    return rentals
+    customer = customers.get(customer_id)
+    if customer is None:
+        return None
+    return customer, rentals.where("customer_id", customer_id)
 
-def format_customer(customer):
-    if customer.get("create_date"):
-        customer["create_date"] = format_datetime(
-            customer["create_date"]
-        )
-    return customer
+def snapshot_rental(token, rental_id):
+    # (rental, customer) from the shared snapshot, or None.
+    rentals = shared_snapshot.current("rentals", token)
+    customers = shared_snapshot.current("customers", token)
+    if rentals is None or customers is None:
+        return None
+    rental = rentals.get(rental_id)
+    if rental is None:
+        return None
+    return rental, customers.get(rental.customer_id)
+
+def customer_context(token, customer_id, customer, rentals):
+    index = open_rentals.peek(token)
+    return {
+        "customer": customer,
+        "rentals": rentals,
+        "open_count": (
+            index.count(customer_id) if index is not None else None
+        ),
+        "overdue_count": (
+            index.overdue_count(customer_id)
+            if index is not None else None
+        ),
+    }
+
+def outstanding_context(index, rentals, customers, overdue):
+    return {
+        "rentals": rentals,
+        "rows": rental_rows(rentals, customers),
+        "overdue": overdue,
+        "open_count": len(index),
+        "overdue_count": index.overdue_count(),
+        "cutoff": open_rentals.overdue_cutoff(),
+    }
+
+def returned_rental(rental_id, result):
+    # The rental just returned, from sakilaAPI's response when it has the
+    # whole rental; None if it has to be read again.
+    rental = Rental.from_dict({**result, "rental_id": rental_id})
+    if rental.rental_date is None or rental.customer_id is None:
+        return None
+    return rental
 
-def get_token_from_session(request):
-    return request.session.get("access_token")
+def returned_row(client, rental_id, result):
+    rental = returned_rental(rental_id, result) or client.get_rental(rental_id)
+    customer = resolve_customers(
+        client, [rental.customer_id]
+    ).get(rental.customer_id)
+    return {"rental": rental, "customer": customer}
+
+def search_customers(client, criteria):
+    return find_customers(client.get_customers(), criteria)
+
+def search_rentals(client, criteria):
+    return find_rentals(client.get_rentals(), criteria)
 
 def home(request):
-    return render(request, "home.html")
+    token = get_token_from_session(request)
+    if not token:
+        return render(request, "home.html")
+
+    try:
+        client = APIClient(token)
+        stats = dashboard.get(client).summary()
+        customers = resolve_customers(
+            client, (customer_id for customer_id, _ in stats["top_customers"])
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return render(request, "home.html")
+
+    return render(request, "home.html", home_context(stats, customers))
 
 @require_http_methods(["GET", "POST"])
 def login(request):
@@ -65,6 +248,8 @@ def login(request):
                 )
                 messages.success(request, "Sesión iniciada correctamente")
                 return redirect("home")
+            except APIUnavailable:
+                raise
             except Exception as e:
                 messages.error(request, f"Error: {str(e)}")
     else:
@@ -88,12 +273,21 @@ def register(request):
                     "Usuario registrado correctamente. Ya puedes iniciar sesión"
                 )
                 return redirect("login")
+            except APIUnavailable:
+                raise
             except Exception as e:
                 messages.error(request, f"Error: {str(e)}")
     else:
         form = RegisterForm()
     return render(request, "register.html", {"form": form})
 
+def cache_stats(request):
+    token = get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    return JsonResponse(response_cache.stats())
+
 def logout(request):
     request.session.flush()
     messages.success(request, "Sesión cerrada correctamente. ¡Hasta pronto!")
@@ -101,51 +295,107 @@ def logout(request):
 
 
 def customers_list(request):
-    from django.core.paginator import Paginator
-
     token = get_token_from_session(request)
     if not token:
         messages.warning(request, "Acceso denegado. Por favor, inicia sesión con tu usuario")
         return redirect("login")
 
+    filters = CustomerFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+
     try:
         client = APIClient(token)
-        customers_list = client.get_customers()
-
-        for customer in customers_list:
-            format_customer(customer)
-
-        paginator = Paginator(customers_list, 100)
+        snapshot = None
+        if not criteria:
+            snapshot = shared_snapshot.current("customers", token)
+        if snapshot is not None:
+            paginator = WindowedPaginator(snapshot, 100)
+        elif replica.available("customers"):
+            paginator = WindowedPaginator(replica.customers(criteria), 100)
+        elif criteria:
+            paginator = WindowedPaginator(
+                search_customers(client, criteria), 100
+            )
+        else:
+            paginator = api_paginator(
+                client,
+                client.get_customers_page,
+                100,
+                "/api/v1/customers",
+            )
         page_number = request.GET.get('page')
         customers = paginator.get_page(page_number)
 
-        return render(
+        return render_list(
             request,
             "customers/list.html",
-            {"customers": customers}
+            "customers/_rows.html",
+            {"customers": customers, "filters": filters},
+            customers,
         )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("home")
 
-def customer_detail(request, customer_id):
+def customers_export(request):
     token = get_token_from_session(request)
     if not token:
         return redirect("login")
 
+    filters = CustomerFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+    fmt = request.GET.get("format", "csv")
+    check_format(fmt)
+
     try:
         client = APIClient(token)
-        customer = client.get_customer(customer_id)
-        format_customer(customer)
-        rentals = client.get_customer_rentals(customer_id)
+        if criteria:
+            customers = search_customers(client, criteria)
+        else:
+            customers = client.iter_customers()
+        return export_response(
+            customers,
+            Customer,
+            fmt,
+            "clientes",
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("customers_list")
 
-        format_rentals(rentals)
+def customer_detail(request, customer_id):
+    token = get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        customer = rentals = None
+        found = snapshot_customer(token, customer_id)
+        if found is not None:
+            customer, rentals = found
+        elif replica.available("customers", "rentals"):
+            customer = replica.customer(customer_id)
+            rentals = replica.customer_rentals(customer_id)
+        if customer is None:
+            client = APIClient(token)
+            customer, rentals = client.gather(
+                partial(client.get_customer, customer_id),
+                partial(client.get_customer_rentals, customer_id),
+            )
 
         return render(
             request,
             "customers/detail.html",
-            {"customer": customer, "rentals": rentals}
+            customer_context(token, customer_id, customer, rentals),
         )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("customers_list")
@@ -161,17 +411,11 @@ def customer_create(request):
         if form.is_valid():
             try:
                 client = APIClient(token)
-                data = {
-                    "store_id": form.cleaned_data["store_id"],
-                    "first_name": form.cleaned_data["first_name"],
-                    "last_name": form.cleaned_data["last_name"],
-                    "email": form.cleaned_data["email"] or None,
-                    "address_id": form.cleaned_data["address_id"],
-                    "active": form.cleaned_data["active"],
-                }
-                client.create_customer(data)
+                client.create_customer(customer_data(form))
                 messages.success(request, "Cliente creado correctamente")
                 return redirect("customers_list")
+            except APIUnavailable:
+                raise
             except Exception as e:
                 messages.error(request, f"Error: {str(e)}")
     else:
@@ -188,40 +432,28 @@ def customer_update(request, customer_id):
 
     try:
         client = APIClient(token)
-        customer = client.get_customer(customer_id)
 
         if request.method == "POST":
             form = CustomerForm(request.POST)
             if form.is_valid():
-                data = {
-                    "store_id": form.cleaned_data["store_id"],
-                    "first_name": form.cleaned_data["first_name"],
-                    "last_name": form.cleaned_data["last_name"],
-                    "email": form.cleaned_data["email"] or None,
-                    "address_id": form.cleaned_data["address_id"],
-                    "active": form.cleaned_data["active"],
-                }
-                client.update_customer(customer_id, data)
+                client.update_customer(customer_id, customer_data(form))
                 messages.success(request, "Cliente actualizado correctamente")
                 return redirect(
                     "customer_detail",
                     customer_id=customer_id
                 )
+            customer = client.get_customer(customer_id)
         else:
-            form = CustomerForm(initial={
-                "store_id": customer["store_id"],
-                "first_name": customer["first_name"],
-                "last_name": customer["last_name"],
-                "email": customer["email"],
-                "address_id": customer["address_id"],
-                "active": customer["active"],
-            })
+            customer = client.get_customer(customer_id)
+            form = CustomerForm(initial=customer_initial(customer))
 
         return render(
             request,
             "customers/form.html",
             {"form": form, "customer": customer}
         )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("customers_list")
@@ -235,88 +467,164 @@ def customer_delete(request, customer_id):
 
     try:
         client = APIClient(token)
-        customer = client.get_customer(customer_id)
 
         if request.method == "POST":
             try:
                 client.delete_customer(customer_id)
                 messages.success(request, "Cliente eliminado")
                 return redirect("customers_list")
+            except APIUnavailable:
+                raise
             except Exception as e:
-                error_msg = str(e)
-                if "409" in error_msg or "existing rentals" in error_msg:
-                    messages.error(
-                        request,
-                        "No se puede eliminar este cliente, ya que tiene reservas activas asociadas."
-                    )
-                    return redirect("customers_list")
-                else:
-                    messages.error(request, f"Error: {error_msg}")
-                    return redirect("customers_list")
-                return render(
-                    request,
-                    "customers/delete.html",
-                    {"customer": customer}
-                )
+                messages.error(request, delete_error(e))
+                return redirect("customers_list")
 
+        customer = client.get_customer(customer_id)
         return render(
             request,
             "customers/delete.html",
             {"customer": customer}
         )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("customers_list")
 
 def rentals_list(request):
-    from django.core.paginator import Paginator
-
     token = get_token_from_session(request)
     if not token:
         return redirect("login")
 
+    filters = RentalFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+
     try:
         client = APIClient(token)
-        rentals_list = client.get_rentals()
-
-        format_rentals(rentals_list)
-
-        paginator = Paginator(rentals_list, 50)
+        snapshot = customers_snapshot = local = None
+        if not criteria:
+            snapshot = shared_snapshot.current("rentals", token)
+            customers_snapshot = shared_snapshot.current("customers", token)
+        if snapshot is not None:
+            paginator = WindowedPaginator(snapshot, 50)
+        elif replica.available("rentals", "customers"):
+            local = True
+            paginator = WindowedPaginator(replica.rentals(criteria), 50)
+        elif criteria:
+            paginator = WindowedPaginator(
+                search_rentals(client, criteria), 50
+            )
+        else:
+            paginator = api_paginator(
+                client,
+                client.get_rentals_page,
+                50,
+                "/api/v1/rentals",
+            )
         page_number = request.GET.get('page')
         rentals = paginator.get_page(page_number)
-
-        return render(
+        customer_ids = (rental.customer_id for rental in rentals)
+        if customers_snapshot is not None:
+            customers = customers_snapshot.get_many(customer_ids)
+        elif local:
+            customers = replica.customers_by_id(customer_ids)
+        else:
+            customers = resolve_customers(client, customer_ids)
+        return render_list(
             request,
             "rentals/list.html",
-            {"rentals": rentals}
+            "rentals/_rows.html",
+            {
+                "rentals": rentals,
+                "rows": rental_rows(rentals, customers),
+                "filters": filters,
+            },
+            rentals,
         )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("home")
 
-def rental_detail(request, rental_id):
+def rentals_export(request):
     token = get_token_from_session(request)
     if not token:
         return redirect("login")
 
+    filters = RentalFilterForm(request.GET)
+    filters.is_valid()
+    criteria = get_criteria(filters)
+    fmt = request.GET.get("format", "csv")
+    check_format(fmt)
+
     try:
         client = APIClient(token)
-        rental = client.get_rental(rental_id)
+        if criteria:
+            rentals = search_rentals(client, criteria)
+        else:
+            rentals = client.iter_rentals()
+        return export_response(
+            rentals,
+            Rental,
+            fmt,
+            "reservas",
+        )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
 
-        if rental.get("rental_date"):
-            rental["rental_date"] = format_datetime(
-                rental["rental_date"]
-            )
-        if rental.get("return_date"):
-            rental["return_date"] = format_datetime(
-                rental["return_date"]
-            )
+def rental_detail(request, rental_id):
+    token = get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    try:
+        found = snapshot_rental(token, rental_id)
+        if found is not None:
+            rental, customer = found
+        else:
+            client = APIClient(token)
+            rental = client.get_rental(rental_id)
+            customer = resolve_customers(
+                client, [rental.customer_id]
+            ).get(rental.customer_id)
 
         return render(
             request,
             "rentals/detail.html",
-            {"rental": rental}
+            {"rental": rental, "customer": customer}
         )
+    except APIUnavailable:
+        raise
+    except Exception as e:
+        messages.error(request, f"Error: {str(e)}")
+        return redirect("rentals_list")
+
+def rentals_outstanding(request):
+    token = get_token_from_session(request)
+    if not token:
+        return redirect("login")
+
+    overdue = request.GET.get("overdue") == "1"
+    try:
+        client = APIClient(token)
+        index = open_rentals.get(client)
+        paginator = WindowedPaginator(index.oldest(overdue=overdue), 50)
+        rentals = paginator.get_page(request.GET.get('page'))
+        customers = resolve_customers(
+            client, (rental.customer_id for rental in rentals)
+        )
+        return render(
+            request,
+            "rentals/outstanding.html",
+            outstanding_context(index, rentals, customers, overdue),
+        )
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("rentals_list")
@@ -332,17 +640,11 @@ def rental_create(request):
         if form.is_valid():
             try:
                 client = APIClient(token)
-                data = {
-                    "rental_date": datetime.now().isoformat(),
-                    "inventory_id": (
-                        form.cleaned_data["inventory_id"]
-                    ),
-                    "customer_id": form.cleaned_data["customer_id"],
-                    "staff_id": form.cleaned_data["staff_id"],
-                }
-                client.create_rental(data)
+                client.create_rental(rental_data(form))
                 messages.success(request, "Reserva creada correctamente")
                 return redirect("rentals_list")
+            except APIUnavailable:
+                raise
             except Exception as e:
                 messages.error(request, f"Error: {str(e)}")
     else:
@@ -358,9 +660,17 @@ def rental_return(request, rental_id):
 
     try:
         client = APIClient(token)
-        client.return_rental(rental_id)
+        result = client.return_rental(rental_id)
+        if wants_fragment(request):
+            return render(
+                request,
+                "rentals/_row.html",
+                returned_row(client, rental_id, result),
+            )
         messages.success(request, "Reserva devuelta correctamente")
         return redirect("rental_detail", rental_id=rental_id)
+    except APIUnavailable:
+        raise
     except Exception as e:
         messages.error(request, f"Error: {str(e)}")
         return redirect("rentals_list")
\ No newline at end of file
@@ -0,0 +1,12 @@
+# gunicorn reads this file when it is started from this directory.
+import os
+
+
+def child_exit(server, worker):
+    # Keeps the metrics of the worker that exited in METRICS_DIR's archive
+    # file (see api.metrics).
+    directory = os.getenv("METRICS_DIR")
+    if directory:
+        from api.metrics import mark_process_dead
+
+        mark_process_dead(worker.pid, directory)
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -33,6 +34,46 @@ ALLOWED_HOSTS = ['*']
 
 # Application definition
 
+# With USE_DATABASE=False the app runs without admin, auth, contenttypes
+# or any database: every request is served from the session cookie and
+# sakilaAPI.
+USE_DATABASE = os.getenv("USE_DATABASE", "True") == "True"
+
+# Sessions only hold the sakilaAPI token and the username. "cache" keeps
+# them in a file cache shared by every worker, "db" in the django_session
+# table and "signed_cookies" in the cookie itself, which is signed but not
+# encrypted: the token can be read by anyone holding the cookie. The
+# default stays "db" while there is a database, so upgrading doesn't log
+# everyone out. The file cache lists its directory each time a session is
+# saved (to cull it), which is only at login and logout here.
+SESSION_BACKEND = os.getenv(
+    "SESSION_BACKEND", "db" if USE_DATABASE else "cache"
+)
+if SESSION_BACKEND == "db" and not USE_DATABASE:
+    raise ImproperlyConfigured(
+        "SESSION_BACKEND=db requires USE_DATABASE=True"
+    )
+SESSION_ENGINE = {
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "cache": "django.contrib.sessions.backends.cache",
+    "db": "django.contrib.sessions.backends.db",
+}[SESSION_BACKEND]
+SESSION_CACHE_ALIAS = "sessions"
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv(
+            "SESSION_CACHE_DIR", str(BASE_DIR / '.sessions')
+        ),
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -42,16 +83,31 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'api'
 ]
+if not USE_DATABASE:
+    INSTALLED_APPS = [
+        app for app in INSTALLED_APPS if app not in (
+            'django.contrib.admin',
+            'django.contrib.auth',
+            'django.contrib.contenttypes',
+            'django.contrib.sessions',
+        )
+    ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.resilience.APIUnavailableMiddleware',
 ]
+if not USE_DATABASE:
+    MIDDLEWARE.remove('django.contrib.auth.middleware.AuthenticationMiddleware')
 
 ROOT_URLCONF = 'sakilaAPI_frontend.urls'
 
@@ -65,10 +121,15 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'api.context_processors.assets',
             ],
         },
     },
 ]
+if not USE_DATABASE:
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.contrib.auth.context_processors.auth'
+    )
 
 WSGI_APPLICATION = 'sakilaAPI_frontend.wsgi.application'
 
@@ -82,6 +143,8 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+if not USE_DATABASE:
+    DATABASES = {}
 
 
 # Password validation
@@ -119,9 +182,136 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic stores hashed, pre-compressed (gzip and, with the brotli
+# package, br) copies that WhiteNoise serves with a one-year max-age.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Serve Bulma, Inter and Font Awesome from our own static files instead of
+# their CDNs. Download them first with `python manage.py vendor_assets`.
+SELF_HOSTED_ASSETS = os.getenv("SELF_HOSTED_ASSETS", "False") == "True"
+
+# Compression of dynamic responses (HTML, JSON and the CSV/NDJSON exports)
+COMPRESS_RESPONSES = os.getenv("COMPRESS_RESPONSES", "True") == "True"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))
 
 # API Configuration
 API_BASE_URL = os.getenv(
     "API_BASE_URL",
     "http://localhost:8000"
-)
\ No newline at end of file
+)
+
+# Timeouts (seconds), retries of idempotent GETs and the circuit breaker
+# that fails fast while sakilaAPI is down
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "3.05"))
+API_READ_TIMEOUT = float(os.getenv("API_READ_TIMEOUT", "10"))
+API_RETRIES = int(os.getenv("API_RETRIES", "2"))
+API_RETRY_BACKOFF = float(os.getenv("API_RETRY_BACKOFF", "0.1"))
+API_RETRY_BACKOFF_MAX = float(os.getenv("API_RETRY_BACKOFF_MAX", "1"))
+API_BREAKER_THRESHOLD = int(os.getenv("API_BREAKER_THRESHOLD", "5"))
+API_BREAKER_RESET_TIMEOUT = float(os.getenv("API_BREAKER_RESET_TIMEOUT", "30"))
+
+# Connection pool shared by every APIClient in the process
+API_POOL_CONNECTIONS = int(os.getenv("API_POOL_CONNECTIONS", "4"))
+API_POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", "20"))
+API_POOL_BLOCK = os.getenv("API_POOL_BLOCK", "False") == "True"
+
+# Threads used by APIClient.gather() to run independent calls concurrently,
+# and the separate threads for background work (stale-while-revalidate
+# refreshes, shared snapshot refreshes, open-rental and dashboard rebuilds)
+API_FANOUT_WORKERS = int(os.getenv("API_FANOUT_WORKERS", "8"))
+API_BACKGROUND_WORKERS = int(os.getenv("API_BACKGROUND_WORKERS", "2"))
+
+# Serve the async views (api/async_views.py) instead of the sync ones. Only
+# useful under an ASGI server such as uvicorn; each event loop keeps its own
+# httpx connection pool of up to API_ASYNC_MAX_CONNECTIONS connections,
+# closed when the loop shuts down.
+API_ASYNC_VIEWS = os.getenv("API_ASYNC_VIEWS", "False") == "True"
+API_ASYNC_MAX_CONNECTIONS = int(os.getenv("API_ASYNC_MAX_CONNECTIONS", "100"))
+
+# Server-side pagination of sakilaAPI collections
+API_PAGE_OFFSET_PARAM = os.getenv("API_PAGE_OFFSET_PARAM", "skip")
+API_PAGE_LIMIT_PARAM = os.getenv("API_PAGE_LIMIT_PARAM", "limit")
+API_TOTAL_COUNT_HEADER = os.getenv("API_TOTAL_COUNT_HEADER", "X-Total-Count")
+API_COUNT_TTL = int(os.getenv("API_COUNT_TTL", "60"))
+API_COUNT_FREE_PAGINATION = (
+    os.getenv("API_COUNT_FREE_PAGINATION", "False") == "True"
+)
+
+# Per-user cache of sakilaAPI reads, invalidated by the client's writes
+API_CACHE_TTL = int(os.getenv("API_CACHE_TTL", "30"))
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Expired collection reads are served for up to API_CACHE_MAX_STALE more
+# seconds while a background refresh fetches the new version
+API_CACHE_MAX_STALE = int(os.getenv("API_CACHE_MAX_STALE", "300"))
+
+# File written by the warm_cache command and loaded by every worker
+API_CACHE_WARM_FILE = os.getenv("API_CACHE_WARM_FILE", "")
+
+# Identical GETs issued concurrently by the same user share one upstream
+# request; followers wait at most API_COALESCE_TIMEOUT seconds for it
+API_COALESCE = os.getenv("API_COALESCE", "True") == "True"
+API_COALESCE_TIMEOUT = float(os.getenv("API_COALESCE_TIMEOUT", "5"))
+
+# Local SQLite replica of customers and rentals, filled by
+# `python manage.py sync_replica`. With REPLICA_READS the list and detail
+# views read from it while its last sync is at most REPLICA_MAX_STALENESS
+# seconds old. REPLICA_DELTA_PARAM is the query parameter sakilaAPI would
+# take to only return rows updated since a last_update value; empty means
+# every sync downloads the collections (skipped on a 304). The replica is
+# shared by every user, which assumes sakilaAPI shows the same data to all.
+REPLICA_READS = os.getenv("REPLICA_READS", "False") == "True"
+REPLICA_MAX_STALENESS = int(os.getenv("REPLICA_MAX_STALENESS", "120"))
+REPLICA_DELTA_PARAM = os.getenv("REPLICA_DELTA_PARAM", "")
+REPLICA_FULL_SYNC_INTERVAL = int(
+    os.getenv("REPLICA_FULL_SYNC_INTERVAL", "3600")
+)
+
+# Days after which an unreturned rental is shown as overdue, and how often
+# each worker rebuilds its index of open rentals (api/open_rentals.py) to
+# pick up rentals created or returned through other workers. Like the
+# replica, the index is shared by every user (see api/live.py).
+RENTAL_OVERDUE_DAYS = int(os.getenv("RENTAL_OVERDUE_DAYS", "7"))
+OPEN_RENTALS_REBUILD_INTERVAL = int(
+    os.getenv("OPEN_RENTALS_REBUILD_INTERVAL", "600")
+)
+
+# Same for the rental aggregates of the dashboard on home (api/dashboard.py),
+# which are also shared by every user.
+DASHBOARD_REBUILD_INTERVAL = int(
+    os.getenv("DASHBOARD_REBUILD_INTERVAL", "600")
+)
+
+# Column-oriented copy of customers and rentals that every worker maps
+# read-only (api/shared_snapshot.py), refreshed by
+# `python manage.py refresh_shared_snapshot` or by the first worker that
+# finds it older than SHARED_SNAPSHOT_MAX_AGE seconds. Empty disables it.
+# Like the replica, it is shared by every user. A write through this app
+# leaves it current for at most SHARED_SNAPSHOT_WRITE_STALENESS seconds.
+SHARED_SNAPSHOT_DIR = os.getenv("SHARED_SNAPSHOT_DIR", "")
+SHARED_SNAPSHOT_MAX_AGE = int(os.getenv("SHARED_SNAPSHOT_MAX_AGE", "300"))
+SHARED_SNAPSHOT_WRITE_STALENESS = int(
+    os.getenv("SHARED_SNAPSHOT_WRITE_STALENESS", "30")
+)
+SHARED_SNAPSHOT_CHECK_INTERVAL = float(
+    os.getenv("SHARED_SNAPSHOT_CHECK_INTERVAL", "1")
+)
+
+# Bytes read from the socket at a time when decoding list responses
+API_STREAM_CHUNK_SIZE = int(os.getenv("API_STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+# Prometheus metrics. With several gunicorn workers, point METRICS_DIR at a
+# directory shared by all of them so /metrics reports the whole server.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
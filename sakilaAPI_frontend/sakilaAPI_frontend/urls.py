@@ -1,7 +1,11 @@
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path("", include("api.urls")),
-]
\ No newline at end of file
+]
+
+if settings.USE_DATABASE:
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
\ No newline at end of file